@@ -1,20 +1,31 @@
 import hashlib
 import hmac
+import json
 from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
 from planner.service import (
     build_today_plan,
     publish_plan,
     get_latest_plan,
-    replan_incremental,
+    request_replan,
     get_plan_metrics,
+    insert_new_task,
 )
-from planner.dtos import PlanResultDTO
+from planner.dtos import PlanResultDTO, TaskDTO
+from planner.worker_pool import SolverQueueFullError
 from storage.history import get_recent_plans
 import config
 
 app = FastAPI()
 
 
+@app.exception_handler(SolverQueueFullError)
+async def solver_queue_full(
+    request: Request, exc: SolverQueueFullError
+) -> JSONResponse:
+    return JSONResponse(status_code=503, content={"detail": "solver busy"})
+
+
 @app.post("/agent/run")
 async def run_agent() -> dict[str, int]:
     plan = await build_today_plan()
@@ -34,7 +45,7 @@ async def plan_preview() -> PlanResultDTO:
 
 
 @app.get("/agent/plan/metrics")
-async def plan_metrics() -> dict[str, float | int]:
+async def plan_metrics() -> dict[str, float | int | str]:
     metrics = get_plan_metrics()
     if metrics is None:
         raise HTTPException(status_code=404)
@@ -57,18 +68,30 @@ async def _verify_signature(request: Request) -> bytes:
     return body
 
 
+def _parse_task(body: bytes) -> TaskDTO | None:
+    try:
+        payload = json.loads(body)
+        return TaskDTO.model_validate({"kind": "pickup", **payload})
+    except (ValueError, TypeError):
+        return None
+
+
 @app.post("/webhooks/pickup_created")
 async def pickup_created(request: Request) -> dict[str, object]:
-    await _verify_signature(request)
-    await replan_incremental()
-    return {"status": "ok", "replanned": True}
+    body = await _verify_signature(request)
+    task = _parse_task(body)
+    if task is not None and get_latest_plan() is not None:
+        inserted = await insert_new_task(task)
+        return {"status": "ok", "inserted": inserted}
+    request_replan()
+    return {"status": "ok", "inserted": False}
 
 
 @app.post("/webhooks/vehicle_status_changed")
 async def vehicle_status_changed(request: Request) -> dict[str, object]:
     await _verify_signature(request)
-    await replan_incremental()
-    return {"status": "ok", "replanned": True}
+    request_replan()
+    return {"status": "ok", "replan_scheduled": True}
 
 
 @app.get("/agent/plan/history")
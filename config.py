@@ -26,8 +26,83 @@ WEBHOOK_SECRET: str = os.getenv("WEBHOOK_SECRET", "")
 
 # Planner settings
 USE_MULTI_DEPOT: bool = os.getenv("USE_MULTI_DEPOT", "false").lower() == "true"
+# depot of each vehicle office with USE_MULTI_DEPOT, e.g. "north=40.45:-3.69";
+# offices not listed start from DEPOT_LAT/DEPOT_LON
+OFFICE_DEPOTS: str = os.getenv("OFFICE_DEPOTS", "")
 AVERAGE_SPEED_KMPH: int = int(os.getenv("AVERAGE_SPEED_KMPH", "40"))
+# speeds by hour of day, e.g. "7-9=25,16-19=28"; other hours use the average
+SPEED_PROFILE: str = os.getenv("SPEED_PROFILE", "")
 SERVICE_TIME_MINUTES_DEFAULT: int = int(os.getenv("SERVICE_TIME_MINUTES_DEFAULT", "5"))
 SOLVER_TIMEOUT_SECONDS: int = int(os.getenv("SOLVER_TIMEOUT_SECONDS", "30"))
+# search time grows with the task count between these bounds
+SOLVER_MIN_SECONDS: float = float(os.getenv("SOLVER_MIN_SECONDS", "1"))
+SOLVER_SECONDS_PER_TASK: float = float(os.getenv("SOLVER_SECONDS_PER_TASK", "0.05"))
+# stop once the best cost improves by less than this over the window; 0 disables
+SOLVER_PLATEAU_SECONDS: float = float(os.getenv("SOLVER_PLATEAU_SECONDS", "5"))
+SOLVER_PLATEAU_IMPROVEMENT_PCT: float = float(
+    os.getenv("SOLVER_PLATEAU_IMPROVEMENT_PCT", "0.5")
+)
+# from this many tasks on, successors are limited to the nearest tasks; 0 disables
+SOLVER_NEIGHBORS_MIN_TASKS: int = int(os.getenv("SOLVER_NEIGHBORS_MIN_TASKS", "1000"))
+SOLVER_NEIGHBORS: int = int(os.getenv("SOLVER_NEIGHBORS", "20"))
+SOLVER_NEIGHBORS_FIRST_SOLUTION: str = os.getenv(
+    "SOLVER_NEIGHBORS_FIRST_SOLUTION", "LOCAL_CHEAPEST_INSERTION"
+)
 SOLVER_FIRST_SOLUTION: str = os.getenv("SOLVER_FIRST_SOLUTION", "PATH_CHEAPEST_ARC")
 SOLVER_METAHEURISTIC: str = os.getenv("SOLVER_METAHEURISTIC", "GUIDED_LOCAL_SEARCH")
+# improvement pass of the fallback heuristic; 0 seconds disables it
+LOCAL_SEARCH_SECONDS: float = float(os.getenv("LOCAL_SEARCH_SECONDS", "2"))
+LOCAL_SEARCH_MAX_TASKS: int = int(os.getenv("LOCAL_SEARCH_MAX_TASKS", "3000"))
+# "haversine" (straight lines at AVERAGE_SPEED_KMPH) or "road_graph"
+TRAVEL_COST_PROVIDER: str = os.getenv("TRAVEL_COST_PROVIDER", "haversine")
+# preprocessed .npz road graph read by the road_graph provider
+ROAD_GRAPH_PATH: str = os.getenv("ROAD_GRAPH_PATH", "")
+# distances between recurring locations kept per process, including the
+# day's matrix kept between solves; memory grows with the locations held, to
+# 16 bytes per pair (144 MB at 3000); 0 disables
+MATRIX_CACHE_SIZE: int = int(os.getenv("MATRIX_CACHE_SIZE", "3000"))
+# decimals of lat/lon that identify a location (5 is about a metre)
+MATRIX_CACHE_PRECISION: int = int(os.getenv("MATRIX_CACHE_PRECISION", "5"))
+# directory the cache is saved to after full solves and on shutdown, and
+# loaded from on start; empty keeps it in memory only
+MATRIX_CACHE_DIR: str = os.getenv("MATRIX_CACHE_DIR", "")
+# matrix store built by scripts/build_matrix_store.py; empty disables
+MATRIX_STORE_DIR: str = os.getenv("MATRIX_STORE_DIR", "")
+# days up to this many locations, and MATRIX_CACHE_SIZE, keep their matrix
+# between solves; 0 disables
+INCREMENTAL_MATRIX_MAX_LOCATIONS: int = int(
+    os.getenv("INCREMENTAL_MATRIX_MAX_LOCATIONS", "3000")
+)
+# drop tasks no vehicle can serve and tighten windows before solving
+SOLVER_PRESOLVE: bool = os.getenv("SOLVER_PRESOLVE", "true").lower() == "true"
+# solve tasks at the same place as one stop
+SOLVER_AGGREGATE: bool = os.getenv("SOLVER_AGGREGATE", "true").lower() == "true"
+# decimals of lat/lon that make tasks co-located (4 is about 10 metres)
+SOLVER_AGGREGATE_PRECISION: int = int(os.getenv("SOLVER_AGGREGATE_PRECISION", "4"))
+SOLVER_WORKERS: int = int(os.getenv("SOLVER_WORKERS", "2"))
+SOLVER_QUEUE_SIZE: int = int(os.getenv("SOLVER_QUEUE_SIZE", "8"))
+# publish a heuristic plan at once and refine it with OR-Tools in the
+# background; the fast plan gets PLAN_FAST_FIRST_SECONDS of local search
+PLAN_FAST_FIRST: bool = os.getenv("PLAN_FAST_FIRST", "false").lower() == "true"
+PLAN_FAST_FIRST_SECONDS: float = float(os.getenv("PLAN_FAST_FIRST_SECONDS", "0.5"))
+# percent shorter a refined plan must be to replace the fast one, unless it
+# schedules more tasks
+PLAN_REFINE_MIN_IMPROVEMENT_PCT: float = float(
+    os.getenv("PLAN_REFINE_MIN_IMPROVEMENT_PCT", "1")
+)
+# seed the morning solve with the last plan of the same weekday
+PLAN_SEED: bool = os.getenv("PLAN_SEED", "true").lower() == "true"
+# decimals of lat/lon at which a past task stands for today's tasks at the
+# same place (4 is about 10 metres)
+PLAN_SEED_PRECISION: int = int(os.getenv("PLAN_SEED_PRECISION", "4"))
+REPLAN_TIME_FRACTION: float = float(os.getenv("REPLAN_TIME_FRACTION", "0.25"))
+PLAN_DRIFT_THRESHOLD: float = float(os.getenv("PLAN_DRIFT_THRESHOLD", "0.1"))
+REPLAN_DEBOUNCE_SECONDS: float = float(os.getenv("REPLAN_DEBOUNCE_SECONDS", "2"))
+# "off", "office", "spatial" or "vehicle" (sweep tasks to vehicles, then
+# route each vehicle on its own)
+SOLVER_DECOMPOSE: str = os.getenv("SOLVER_DECOMPOSE", "off")
+SOLVER_DECOMPOSE_MIN_TASKS: int = int(os.getenv("SOLVER_DECOMPOSE_MIN_TASKS", "500"))
+SOLVER_DECOMPOSE_MAX_TASKS: int = int(os.getenv("SOLVER_DECOMPOSE_MAX_TASKS", "300"))
+# comma separated FIRST_SOLUTION:METAHEURISTIC pairs run side by side on
+# days that are not decomposed; partitions use the first pair
+SOLVER_PORTFOLIO: str = os.getenv("SOLVER_PORTFOLIO", "")
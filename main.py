@@ -6,6 +6,7 @@ from api.http_client import close_http_client, init_http_client
 from api.vehicles import get_vehicles
 from api.crews import get_crews
 from api.routes import router as routes_router
+from planner.service import persist_matrix_cache, shutdown_solver_pool
 from storage.history import init_db as init_history_db
 from storage.routes import init_db as init_routes_db
 import scheduler
@@ -41,6 +42,8 @@ async def startup() -> None:
 async def shutdown() -> None:
     await close_http_client()
     await scheduler.shutdown()
+    shutdown_solver_pool()
+    persist_matrix_cache()
 
 
 @app.get("/health")
@@ -0,0 +1,158 @@
+"""Merge co-located tasks into single stops and expand plans back."""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import NamedTuple, Sequence
+
+from api.dtos import VehicleDTO
+from planner.dtos import PlanResultDTO, TaskDTO, TimeWindow, VehiclePlanDTO
+from planner.metrics import coord_array, quantize
+from planner.problem import format_time, parse_time
+import config
+
+
+class Aggregated(NamedTuple):
+    tasks: list[TaskDTO]
+    # id of a merged task -> the tasks it stands for, in service order
+    members: dict[str, list[TaskDTO]]
+
+
+def _service(task: TaskDTO) -> int:
+    return task.service_minutes or config.SERVICE_TIME_MINUTES_DEFAULT
+
+
+def _window(group: list[TaskDTO], horizon: tuple[int, int]) -> tuple[int, int]:
+    """Begin times of a merged ``group`` that keep every member in its window.
+
+    Members are served back to back, so member ``k`` begins ``offset_k``
+    minutes (the service of the members before it) after the merged task.
+    """
+
+    start, end = horizon
+    offset = 0
+    for task in group:
+        ws, we = horizon
+        if task.window:
+            ws, we = parse_time(task.window.start), parse_time(task.window.end)
+        start, end = max(start, ws - offset), min(end, we - offset)
+        offset += _service(task)
+    return start, end
+
+
+def _merge(group: list[TaskDTO], horizon: tuple[int, int]) -> TaskDTO:
+    window = None
+    if any(t.window for t in group):
+        start, end = _window(group, horizon)
+        window = TimeWindow(start=format_time(start), end=format_time(end))
+    return group[0].model_copy(
+        update={
+            "window": window,
+            "size": sum(t.size for t in group),
+            "service_minutes": sum(_service(t) for t in group),
+        }
+    )
+
+
+def _fits(group: list[TaskDTO], horizon: tuple[int, int], largest: int) -> bool:
+    if sum(t.size for t in group) > largest:
+        return False
+    start, end = _window(group, horizon)
+    return start <= end
+
+
+def aggregate(tasks: Sequence[TaskDTO], vehicles: Sequence[VehicleDTO]) -> Aggregated:
+    """Merge tasks at the same place, to ``SOLVER_AGGREGATE_PRECISION`` decimals.
+
+    Tasks at one place are taken in window order and added to a merged task
+    while it still fits the largest vehicle and leaves a non-empty window;
+    a task that does not fit starts the next one. A merged task keeps the
+    id and location of its first member, adds up demand and service time
+    and intersects the members' windows.
+    """
+
+    horizon = (
+        parse_time(config.PLANNING_HORIZON_START),
+        parse_time(config.PLANNING_HORIZON_END),
+    )
+    largest = max((v.capacity for v in vehicles), default=0)
+    places: dict[tuple[int, int], list[TaskDTO]] = defaultdict(list)
+    keys = quantize(
+        coord_array([t.location for t in tasks]), config.SOLVER_AGGREGATE_PRECISION
+    )
+    for (lat, lon), task in zip(keys.tolist(), tasks):
+        places[(lat, lon)].append(task)
+
+    merged: dict[str, TaskDTO] = {}
+    members: dict[str, list[TaskDTO]] = {}
+    for place in places.values():
+        if len(place) == 1:
+            continue
+        place.sort(key=lambda t: parse_time(t.window.start) if t.window else 0)
+        group = [place[0]]
+        for task in place[1:]:
+            if _fits(group + [task], horizon, largest):
+                group.append(task)
+                continue
+            if len(group) > 1:
+                members[group[0].id] = group
+            group = [task]
+        if len(group) > 1:
+            members[group[0].id] = group
+    for group in members.values():
+        merged[group[0].id] = _merge(group, horizon)
+    absorbed = {t.id for g in members.values() for t in g[1:]}
+    reduced = [merged.get(t.id, t) for t in tasks if t.id not in absorbed]
+    return Aggregated(reduced, members)
+
+
+def merged_routes(
+    routes: dict[str, list[str]], members: dict[str, list[TaskDTO]]
+) -> dict[str, list[str]]:
+    """``routes`` of task ids rewritten onto merged task ids."""
+
+    merged_id = {t.id: g[0].id for g in members.values() for t in g}
+    return {
+        vehicle_id: list(dict.fromkeys(merged_id.get(t, t) for t in order))
+        for vehicle_id, order in routes.items()
+    }
+
+
+def expand_plan(plan: PlanResultDTO, members: dict[str, list[TaskDTO]]) -> None:
+    """Replace merged tasks in ``plan`` by their members, in place.
+
+    Each member gets the merged task's ETA plus the service time of the
+    members before it.
+    """
+
+    if not members:
+        return
+    plans = []
+    for vp in plan.vehicle_plans:
+        order: list[str] = []
+        etas: list[str] = []
+        for task_id, eta in zip(vp.tasks_order, vp.eta):
+            if task_id not in members:
+                order.append(task_id)
+                etas.append(eta)
+                continue
+            begin = parse_time(eta)
+            for task in members[task_id]:
+                order.append(task.id)
+                etas.append(format_time(begin))
+                begin += _service(task)
+        plans.append(
+            VehiclePlanDTO(
+                vehicle_id=vp.vehicle_id,
+                tasks_order=order,
+                eta=etas,
+                total_minutes=vp.total_minutes,
+                total_km=vp.total_km,
+            )
+        )
+    plan.vehicle_plans = plans
+    unscheduled: list[str] = []
+    for task_id in plan.unscheduled:
+        group = members.get(task_id)
+        unscheduled += [t.id for t in group] if group else [task_id]
+    plan.unscheduled = sorted(unscheduled)
@@ -0,0 +1,313 @@
+"""Split large days into independent subproblems and stitch the plans back."""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import datetime
+import json
+import logging
+import math
+from typing import NamedTuple
+
+import numpy as np
+import numpy.typing as npt
+
+from api.dtos import VehicleDTO
+from planner.dtos import Coord, PlanResultDTO, TaskDTO, VehiclePlanDTO
+from planner.insertion import insert_task, remove_task
+from planner.metrics import coord_array
+import config
+
+logger = logging.getLogger(__name__)
+
+# a task is on a boundary when another partition's centroid is at most this
+# much farther away than its own
+_BOUNDARY_RATIO = 1.25
+
+
+class Partition(NamedTuple):
+    tasks: list[TaskDTO]
+    vehicles: list[VehicleDTO]
+
+
+def _planar(points: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+    """Equirectangular projection, good enough for clustering within a city."""
+
+    out = points.copy()
+    out[:, 1] *= math.cos(math.radians(float(points[:, 0].mean())))
+    return out
+
+
+def _nearest(
+    points: npt.NDArray[np.float64], centers: npt.NDArray[np.float64]
+) -> npt.NDArray[np.int64]:
+    d = ((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+    return np.asarray(d.argmin(axis=1), dtype=np.int64)
+
+
+def kmeans(
+    points: npt.NDArray[np.float64], k: int, iterations: int = 20
+) -> npt.NDArray[np.int64]:
+    """Deterministic k-means++ / Lloyd labels for ``points``."""
+
+    rng = np.random.default_rng(0)
+    centers = [points[int(rng.integers(len(points)))]]
+    for _ in range(1, k):
+        d = ((points[:, None, :] - np.array(centers)[None, :, :]) ** 2).sum(axis=2)
+        weights = d.min(axis=1)
+        total = weights.sum()
+        if total == 0:
+            centers.append(points[int(rng.integers(len(points)))])
+        else:
+            centers.append(points[int(rng.choice(len(points), p=weights / total))])
+    c = np.array(centers)
+    labels = _nearest(points, c)
+    for _ in range(iterations):
+        for j in range(k):
+            members = points[labels == j]
+            if len(members):
+                c[j] = members.mean(axis=0)
+        new_labels = _nearest(points, c)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+    return labels
+
+
+def _share_vehicles(
+    vehicles: list[VehicleDTO], groups: list[list[TaskDTO]]
+) -> list[list[VehicleDTO]]:
+    """Hand out vehicles so each group's capacity share tracks its demand.
+
+    Every non-empty group gets a vehicle first, largest demand first, so a
+    small outlying cluster is never left without one when there are at
+    least as many vehicles as groups.
+    """
+
+    demand = [sum(t.size for t in g) for g in groups]
+    shares: list[list[VehicleDTO]] = [[] for _ in groups]
+    capacity = [0] * len(groups)
+    fleet = sorted(vehicles, key=lambda v: -v.capacity)
+    occupied = sorted((i for i, g in enumerate(groups) if g), key=lambda i: -demand[i])
+    for j, vehicle in zip(occupied, fleet):
+        shares[j].append(vehicle)
+        capacity[j] += vehicle.capacity
+    for vehicle in fleet[len(occupied) :]:
+        # the part with the largest uncovered demand gets the next vehicle
+        j = max(range(len(groups)), key=lambda i: demand[i] - capacity[i])
+        shares[j].append(vehicle)
+        capacity[j] += vehicle.capacity
+    return shares
+
+
+def partition_spatial(
+    tasks: list[TaskDTO], vehicles: list[VehicleDTO], parts: int
+) -> list[Partition]:
+    parts = max(1, min(parts, len(vehicles), len(tasks)))
+    if parts == 1:
+        return [Partition(list(tasks), list(vehicles))]
+    labels = kmeans(_planar(coord_array([t.location for t in tasks])), parts)
+    groups: list[list[TaskDTO]] = [[] for _ in range(parts)]
+    for task, label in zip(tasks, labels.tolist()):
+        groups[label].append(task)
+    shares = _share_vehicles(vehicles, groups)
+    return [Partition(g, v) for g, v in zip(groups, shares) if g or v]
+
+
+def partition_by_office(
+    tasks: list[TaskDTO],
+    vehicles: list[VehicleDTO],
+    depots: dict[str, Coord] | None = None,
+) -> list[Partition]:
+    """One partition per vehicle office.
+
+    Tasks without an office, or whose office has no vehicles, join the
+    partition whose office depot is nearest when ``depots`` maps offices to
+    depots, or else the one whose tasks' centroid is nearest.
+    """
+
+    by_office: dict[str, list[VehicleDTO]] = defaultdict(list)
+    for vehicle in vehicles:
+        by_office[vehicle.office].append(vehicle)
+    offices = list(by_office)
+    if not offices:
+        return [Partition(list(tasks), [])]
+    groups: dict[str, list[TaskDTO]] = {o: [] for o in offices}
+    orphans: list[TaskDTO] = []
+    for task in tasks:
+        if task.office in groups:
+            groups[task.office].append(task)
+        else:
+            orphans.append(task)
+    if orphans and depots:
+        centers = coord_array([depots[o] for o in offices])
+        points = coord_array([t.location for t in orphans])
+        for task, label in zip(orphans, _nearest(points, centers).tolist()):
+            groups[offices[label]].append(task)
+    elif orphans:
+        centers = np.array(
+            [
+                (
+                    coord_array([t.location for t in groups[o]]).mean(axis=0)
+                    if groups[o]
+                    else [np.inf, np.inf]
+                )
+                for o in offices
+            ]
+        )
+        if np.isinf(centers).all():
+            labels = [0] * len(orphans)
+        else:
+            points = coord_array([t.location for t in orphans])
+            labels = _nearest(points, centers).tolist()
+        for task, label in zip(orphans, labels):
+            groups[offices[label]].append(task)
+    return [Partition(groups[o], by_office[o]) for o in offices]
+
+
+def partition_by_vehicle(
+    tasks: list[TaskDTO], vehicles: list[VehicleDTO], depot: Coord
+) -> list[Partition]:
+    """One single-vehicle partition per vehicle, by a capacity-aware sweep.
+
+    Tasks are ordered by bearing from ``depot``, starting after the widest
+    empty sector, and handed out in that order so each vehicle's load
+    tracks its share of the fleet's capacity. Whatever is left once every
+    share is full stays with the last vehicle.
+    """
+
+    if not tasks or not vehicles:
+        return [Partition(list(tasks), list(vehicles))]
+    points = _planar(
+        np.vstack([coord_array([depot]), coord_array([t.location for t in tasks])])
+    )
+    offsets = points[1:] - points[0]
+    angles = np.arctan2(offsets[:, 0], offsets[:, 1])
+    order = np.argsort(angles)
+    gaps = np.diff(np.append(angles[order], angles[order[0]] + 2 * math.pi))
+    order = np.roll(order, -int(gaps.argmax()) - 1)
+
+    demand = sum(t.size for t in tasks)
+    fill = min(1.0, demand / max(1, sum(v.capacity for v in vehicles)))
+    groups: list[list[TaskDTO]] = [[] for _ in vehicles]
+    j, load = 0, 0
+    for i in order.tolist():
+        task = tasks[i]
+        while (
+            j < len(vehicles) - 1
+            and groups[j]
+            and load + task.size > vehicles[j].capacity * fill
+        ):
+            j, load = j + 1, 0
+        groups[j].append(task)
+        load += task.size
+    return [Partition(g, [v]) for g, v in zip(groups, vehicles) if g]
+
+
+def partition(
+    tasks: list[TaskDTO], vehicles: list[VehicleDTO], mode: str, depot: Coord
+) -> list[Partition]:
+    if mode == "office":
+        return partition_by_office(tasks, vehicles)
+    if mode == "vehicle":
+        return partition_by_vehicle(tasks, vehicles, depot)
+    parts = math.ceil(len(tasks) / max(1, config.SOLVER_DECOMPOSE_MAX_TASKS))
+    return partition_spatial(tasks, vehicles, parts)
+
+
+def merge_plans(
+    depot: Coord, plans: list[PlanResultDTO], vehicles: list[VehicleDTO]
+) -> PlanResultDTO:
+    """Combine partition plans, keeping the original vehicle order."""
+
+    by_vehicle = {vp.vehicle_id: vp for p in plans for vp in p.vehicle_plans}
+    vehicle_plans = [
+        by_vehicle.get(v.id)
+        or VehiclePlanDTO(
+            vehicle_id=v.id, tasks_order=[], eta=[], total_minutes=0, total_km=0.0
+        )
+        for v in vehicles
+    ]
+    unscheduled = sorted(t for p in plans for t in p.unscheduled)
+    generated = datetime.utcnow().isoformat(timespec="seconds") + "Z"
+    return PlanResultDTO(
+        generated_at=generated,
+        depot=depot,
+        vehicle_plans=vehicle_plans,
+        unscheduled=unscheduled,
+        objective_minutes=sum(vp.total_minutes for vp in vehicle_plans),
+    )
+
+
+def rebalance_boundary(
+    plan: PlanResultDTO,
+    tasks: list[TaskDTO],
+    vehicles: list[VehicleDTO],
+    partitions: list[list[str]],
+    closed_routes: bool,
+    depots: dict[str, Coord] | None = None,
+    within_office: bool = False,
+) -> PlanResultDTO:
+    """Post-merge pass across partition borders.
+
+    Unscheduled tasks are offered to every vehicle, then each task lying near
+    another partition is moved there if that lowers the objective.
+    ``partitions`` lists the vehicle ids of each partition and ``depots``
+    the depot of vehicles not starting at ``plan.depot``. With
+    ``within_office`` tasks stay with their office's vehicles: unscheduled
+    ones are only offered to them, unless no vehicle has the task's office,
+    and moves only go to partitions of the same office.
+    """
+
+    by_id = {t.id: t for t in tasks}
+    office_of = {v.id: v.office for v in vehicles}
+    offices = set(office_of.values())
+    for task_id in list(plan.unscheduled):
+        task = by_id[task_id]
+        offered = vehicles
+        if within_office and task.office in offices:
+            offered = [v for v in vehicles if v.office == task.office]
+        inserted = insert_task(plan, task, by_id, offered, closed_routes, depots)
+        if inserted is not None:
+            plan = inserted
+
+    part_of = {vid: i for i, vids in enumerate(partitions) for vid in vids}
+    part_office = [office_of.get(vids[0]) if vids else None for vids in partitions]
+    members: list[list[str]] = [[] for _ in partitions]
+    for vp in plan.vehicle_plans:
+        if vp.vehicle_id in part_of:
+            members[part_of[vp.vehicle_id]].extend(vp.tasks_order)
+    routed = [i for i, m in enumerate(members) if m]
+    if len(routed) < 2:
+        return plan
+    centers = np.array(
+        [coord_array([by_id[t].location for t in members[i]]).mean(0) for i in routed]
+    )
+    moved = 0
+    for own_slot, i in enumerate(routed):
+        points = coord_array([by_id[t].location for t in members[i]])
+        d = np.sqrt(((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2))
+        own = d[:, own_slot].copy()
+        d[:, own_slot] = np.inf
+        if within_office:
+            # partitions of other offices start from another depot
+            for slot, j in enumerate(routed):
+                if part_office[j] != part_office[i]:
+                    d[:, slot] = np.inf
+        for task_id, row, own_d in zip(members[i], d, own):
+            target = routed[int(row.argmin())]
+            if row.min() > _BOUNDARY_RATIO * own_d:
+                continue
+            others = [v for v in vehicles if part_of.get(v.id) == target]
+            removed = remove_task(plan, task_id, by_id, closed_routes, depots)
+            candidate = insert_task(
+                removed, by_id[task_id], by_id, others, closed_routes, depots
+            )
+            if (
+                candidate is not None
+                and candidate.objective_minutes < plan.objective_minutes
+            ):
+                plan = candidate
+                moved += 1
+    logger.info(json.dumps({"event": "boundary_rebalanced", "moved": moved}))
+    return plan
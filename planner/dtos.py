@@ -1,5 +1,5 @@
 from typing import Literal
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class Coord(BaseModel):
@@ -21,6 +21,7 @@ class TaskDTO(BaseModel):
     window: TimeWindow | None
     size: int
     service_minutes: int | None = None
+    office: str | None = None
     model_config = ConfigDict(extra="ignore")
 
 
@@ -39,4 +40,6 @@ class PlanResultDTO(BaseModel):
     vehicle_plans: list[VehiclePlanDTO]
     unscheduled: list[str]
     objective_minutes: int
+    # solver diagnostics surfaced in plan metrics; never serialized
+    stats: dict[str, float | int | str] = Field(default_factory=dict, exclude=True)
     model_config = ConfigDict(extra="ignore")
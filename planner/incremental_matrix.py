@@ -0,0 +1,76 @@
+"""Travel matrices over named locations, updated one location at a time."""
+
+from __future__ import annotations
+
+from typing import Hashable, NamedTuple, Sequence
+
+from planner.dtos import Coord
+from planner.metrics import TravelMatrices, coord_array
+from planner.travel import MatrixCache
+
+
+class Synced(NamedTuple):
+    # locations kept at the same place and added or moved since the last sync
+    kept: int
+    added: int
+    # distinct locations the matrix cache already held or had to compute
+    hits: int
+    misses: int
+
+
+class IncrementalMatrix:
+    """Pairwise travel costs between live locations, kept across solves.
+
+    Locations are tracked by key, their costs live in ``cache``: adding a
+    location computes only its row and column against the cached ones, and
+    a location the cache already holds, from an earlier day or another
+    key, costs nothing. The cache must hold at least as many locations as
+    are live for them all to stay cached.
+    """
+
+    def __init__(self, cache: MatrixCache) -> None:
+        self.cache = cache
+        self._coords: dict[Hashable, Coord] = {}
+
+    def __len__(self) -> int:
+        return len(self._coords)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._coords
+
+    def add(self, items: Sequence[tuple[Hashable, Coord]]) -> tuple[int, int]:
+        """Add locations by key, replacing live ones.
+
+        Returns the cache's (hits, misses) for them.
+        """
+
+        self._coords.update(items)
+        if not items:
+            return 0, 0
+        return self.cache.add(coord_array([c for _, c in items]))
+
+    def remove(self, key: Hashable) -> None:
+        self._coords.pop(key, None)
+
+    def sync(self, items: Sequence[tuple[Hashable, Coord]]) -> Synced:
+        """Make ``items`` the live locations.
+
+        Locations whose key is live at the same coordinates are kept, moved
+        ones are looked up again and the rest dropped.
+        """
+
+        wanted = dict(items)
+        for key in [k for k in self._coords if k not in wanted]:
+            self.remove(key)
+        new = [(k, c) for k, c in wanted.items() if self._coords.get(k) != c]
+        self._coords.update(new)
+        hits, misses = (0, 0)
+        if wanted:
+            # every live location is looked up, so none is evicted first
+            hits, misses = self.cache.add(coord_array(list(wanted.values())))
+        return Synced(len(wanted) - len(new), len(new), hits, misses)
+
+    def matrices(self, keys: Sequence[Hashable]) -> TravelMatrices:
+        """Kilometres and minutes between ``keys``, in that order."""
+
+        return self.cache.matrices(coord_array([self._coords[k] for k in keys]))
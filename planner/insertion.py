@@ -0,0 +1,269 @@
+"""Cheapest feasible insertion of a single task into an existing plan."""
+
+from __future__ import annotations
+
+from datetime import datetime
+import math
+
+import numpy as np
+import numpy.typing as npt
+
+from api.dtos import VehicleDTO
+from planner.dtos import Coord, PlanResultDTO, TaskDTO, VehiclePlanDTO
+from planner.metrics import coord_array
+from planner.problem import format_time, parse_time
+from planner.speed_profile import SpeedProfile, speed_profile
+from planner.travel import TravelCostProvider, matrix_cache, travel_cost_provider
+import config
+
+
+class _Route:
+    """Schedule of one vehicle plan with a start node 0 and an end node m+1."""
+
+    def __init__(
+        self,
+        depot: Coord,
+        stops: list[TaskDTO],
+        closed: bool,
+        horizon: tuple[int, int],
+        provider: TravelCostProvider,
+        profile: SpeedProfile,
+    ) -> None:
+        start, end = horizon
+        self.depot = depot
+        self.stops = stops
+        self.closed = closed
+        coords = coord_array([depot] + [t.location for t in stops] + [depot])
+        self.coords = coords
+        self.ws = [start] + [_window(t, horizon)[0] for t in stops] + [start]
+        self.we: list[float] = (
+            [start]
+            + [_window(t, horizon)[1] for t in stops]
+            + [end if closed else math.inf]
+        )
+        self.service = [0] + [_service(t) for t in stops] + [0]
+        leg_km, leg_min = _legs(provider, coords[:-1], coords[1:])
+        if not closed:
+            # an open route ends wherever its last stop is
+            leg_km[-1] = 0.0
+            leg_min[-1] = 0
+        self.leg_km = leg_km
+        self.arrival = [start]
+        self.begin = [start]
+        for k, travel in enumerate(leg_min):
+            depart = self.begin[k] + self.service[k]
+            arrival = depart + profile.travel(travel, depart)
+            self.arrival.append(arrival)
+            self.begin.append(max(arrival, self.ws[k + 1]))
+
+    def feasible(self) -> bool:
+        return all(b <= we for b, we in zip(self.begin, self.we))
+
+    def end_push(self, node: int, push: int) -> int | None:
+        """Shift ``node`` later by ``push`` and return the resulting end shift.
+
+        Waiting time at later stops absorbs the delay, so propagation stops as
+        soon as the push reaches zero. Legs keep their travel times, even if
+        a later departure falls in another speed profile bucket. Returns None
+        if a window is violated.
+        """
+
+        last = len(self.begin) - 1
+        while push > 0:
+            if self.begin[node] + push > self.we[node]:
+                return None
+            if node == last:
+                return push
+            node += 1
+            push = max(0, push - (self.begin[node] - self.arrival[node]))
+        return 0
+
+
+def _service(task: TaskDTO) -> int:
+    return task.service_minutes or config.SERVICE_TIME_MINUTES_DEFAULT
+
+
+def _window(task: TaskDTO, horizon: tuple[int, int]) -> tuple[int, int]:
+    if task.window:
+        return parse_time(task.window.start), parse_time(task.window.end)
+    return horizon
+
+
+def _costs() -> TravelCostProvider:
+    """The matrix cache when enabled, otherwise the travel cost provider.
+
+    Insertion looks up the legs of every route it tries; through the cache
+    only locations it has not seen, usually just the new task, reach the
+    provider.
+    """
+
+    cache = matrix_cache()
+    return travel_cost_provider() if cache is None else cache
+
+
+def _legs(
+    provider: TravelCostProvider,
+    origins: npt.NDArray[np.float64],
+    destinations: npt.NDArray[np.float64],
+) -> tuple[npt.NDArray[np.float64], list[int]]:
+    """Kilometres and minutes from each origin to the destination in its row."""
+
+    matrices = provider.matrix(origins, destinations)
+    pairs = np.arange(len(origins))
+    return matrices.km[pairs, pairs], matrices.minutes[pairs, pairs].tolist()
+
+
+def insert_task(
+    plan: PlanResultDTO,
+    task: TaskDTO,
+    tasks: dict[str, TaskDTO],
+    vehicles: list[VehicleDTO],
+    closed_routes: bool,
+    depots: dict[str, Coord] | None = None,
+) -> PlanResultDTO | None:
+    """Insert ``task`` where it increases route duration the least.
+
+    ``tasks`` must hold every task already in ``plan``. ``closed_routes``
+    tells whether routes return to the depot (OR-Tools) or end at their last
+    stop (heuristic solver). ``depots`` maps vehicle ids to their own depot;
+    other vehicles use ``plan.depot``. Returns None when no vehicle can take
+    the task without breaking capacity or a time window.
+    """
+
+    horizon = (
+        parse_time(config.PLANNING_HORIZON_START),
+        parse_time(config.PLANNING_HORIZON_END),
+    )
+    ws_new, we_new = _window(task, horizon)
+    svc_new = _service(task)
+    capacities = {v.id: v.capacity for v in vehicles}
+    new_coord = coord_array([task.location])
+    provider = _costs()
+    profile = speed_profile()
+
+    best: tuple[int, float, int, int, _Route] | None = None
+    for vi, vp in enumerate(plan.vehicle_plans):
+        capacity = capacities.get(vp.vehicle_id)
+        if capacity is None or any(t not in tasks for t in vp.tasks_order):
+            continue
+        stops = [tasks[t] for t in vp.tasks_order]
+        if sum(t.size for t in stops) + task.size > capacity:
+            continue
+        depot = (depots or {}).get(vp.vehicle_id, plan.depot)
+        route = _Route(depot, stops, closed_routes, horizon, provider, profile)
+        if not route.feasible():
+            continue
+        # travel costs may differ by direction, so legs into and out of the
+        # new task are looked up separately
+        to_new = provider.matrix(route.coords, new_coord)
+        from_new = provider.matrix(new_coord, route.coords)
+        km_to, min_to = to_new.km[:, 0], to_new.minutes[:, 0].tolist()
+        km_from, min_from = from_new.km[0], from_new.minutes[0].tolist()
+        if not closed_routes:
+            km_from[-1] = 0.0
+            min_from[-1] = 0
+        for k in range(len(stops) + 1):
+            depart = route.begin[k] + route.service[k]
+            arrival = depart + profile.travel(min_to[k], depart)
+            begin = max(arrival, ws_new)
+            if begin > we_new:
+                continue
+            depart = begin + svc_new
+            next_arrival = depart + profile.travel(min_from[k + 1], depart)
+            push = max(0, next_arrival - route.begin[k + 1])
+            delta = route.end_push(k + 1, push)
+            if delta is None:
+                continue
+            added_km = float(km_to[k] + km_from[k + 1] - route.leg_km[k])
+            if best is None or (delta, added_km) < (best[0], best[1]):
+                best = (delta, added_km, vi, k, route)
+    if best is None:
+        return None
+
+    _, _, vi, k, route = best
+    stops = route.stops[:k] + [task] + route.stops[k:]
+    unscheduled = [t for t in plan.unscheduled if t != task.id]
+    return _replace_route(
+        plan, vi, stops, unscheduled, closed_routes, horizon, route.depot
+    )
+
+
+def remove_task(
+    plan: PlanResultDTO,
+    task_id: str,
+    tasks: dict[str, TaskDTO],
+    closed_routes: bool,
+    depots: dict[str, Coord] | None = None,
+) -> PlanResultDTO:
+    """Take ``task_id`` off its route and list it as unscheduled."""
+
+    horizon = (
+        parse_time(config.PLANNING_HORIZON_START),
+        parse_time(config.PLANNING_HORIZON_END),
+    )
+    for vi, vp in enumerate(plan.vehicle_plans):
+        if task_id in vp.tasks_order:
+            stops = [tasks[t] for t in vp.tasks_order if t != task_id]
+            unscheduled = sorted(plan.unscheduled + [task_id])
+            depot = (depots or {}).get(vp.vehicle_id, plan.depot)
+            return _replace_route(
+                plan, vi, stops, unscheduled, closed_routes, horizon, depot
+            )
+    return plan
+
+
+def reschedule(
+    plan: PlanResultDTO,
+    tasks: dict[str, TaskDTO],
+    closed_routes: bool,
+    depots: dict[str, Coord] | None = None,
+) -> PlanResultDTO:
+    """``plan`` with the times of every route recomputed for ``closed_routes``.
+
+    Task orders stay as they are. ``depots`` is as for :func:`insert_task`.
+    """
+
+    horizon = (
+        parse_time(config.PLANNING_HORIZON_START),
+        parse_time(config.PLANNING_HORIZON_END),
+    )
+    updated = plan
+    for vi, vp in enumerate(plan.vehicle_plans):
+        depot = (depots or {}).get(vp.vehicle_id, plan.depot)
+        stops = [tasks[t] for t in vp.tasks_order]
+        updated = _replace_route(
+            updated, vi, stops, plan.unscheduled, closed_routes, horizon, depot
+        )
+    return updated
+
+
+def _replace_route(
+    plan: PlanResultDTO,
+    vi: int,
+    stops: list[TaskDTO],
+    unscheduled: list[str],
+    closed_routes: bool,
+    horizon: tuple[int, int],
+    depot: Coord,
+) -> PlanResultDTO:
+    """``plan`` with route ``vi`` serving ``stops``, keeping its stats."""
+
+    updated = _Route(depot, stops, closed_routes, horizon, _costs(), speed_profile())
+    vp = plan.vehicle_plans[vi]
+    plans = list(plan.vehicle_plans)
+    plans[vi] = VehiclePlanDTO(
+        vehicle_id=vp.vehicle_id,
+        tasks_order=[t.id for t in stops],
+        eta=[format_time(b) for b in updated.begin[1:-1]],
+        total_minutes=updated.begin[-1] - horizon[0],
+        total_km=round(float(updated.leg_km.sum()), 2),
+    )
+    generated = datetime.utcnow().isoformat(timespec="seconds") + "Z"
+    return PlanResultDTO(
+        generated_at=generated,
+        depot=plan.depot,
+        vehicle_plans=plans,
+        unscheduled=unscheduled,
+        objective_minutes=sum(p.total_minutes for p in plans),
+        stats=dict(plan.stats),
+    )
@@ -0,0 +1,280 @@
+"""Local search that polishes routes built by the fallback heuristic."""
+
+from __future__ import annotations
+
+import json
+import logging
+import math
+import time
+from typing import Sequence
+
+import numpy as np
+import numpy.typing as npt
+
+from planner.speed_profile import TimedMatrices
+
+logger = logging.getLogger(__name__)
+
+# candidate positions per stop: next to its nearest stops only
+_NEIGHBORS = 10
+
+
+class LocalSearch:
+    """First-improvement 2-opt, or-opt, relocate and swap over open routes.
+
+    Node 0 is the depot every route starts from; routes hold the other nodes
+    in visiting order and end at their last stop. Moves are scored by the
+    change in travel minutes, read straight from ``minutes``. Time windows
+    are kept through each route's begin times (forward) and latest feasible
+    begin times (backward), so checking a move only walks the stops it puts
+    in new positions. With ``timed`` matrices begin times use the matrix of
+    each leg's departure time and latest times the slowest leg of the day,
+    which keeps every accepted move feasible.
+    """
+
+    def __init__(
+        self,
+        routes: Sequence[Sequence[int]],
+        capacities: Sequence[int],
+        minutes: npt.NDArray[np.int64],
+        windows: Sequence[tuple[int, int] | None],
+        service: Sequence[int],
+        sizes: Sequence[int],
+        start: int,
+        timed: TimedMatrices | None = None,
+    ) -> None:
+        self.t: list[list[int]] = minutes.tolist()
+        self._timed: list[list[list[int]]] | None = None
+        self.t_late = self.t
+        if timed is not None and len(timed.minutes) > 1:
+            self._timed = [m.tolist() for m in timed.minutes]
+            self._slot = timed.slot
+            self.t_late = timed.slowest().tolist()
+        # 2-opt reverses segments, which changes their cost unless a -> b
+        # always takes as long as b -> a
+        self.symmetric = bool(np.array_equal(minutes, minutes.T))
+        self.ws = [w[0] if w else 0 for w in windows]
+        self.we = [w[1] if w else math.inf for w in windows]
+        self.service = list(service)
+        self.size = list(sizes)
+        self.capacity = list(capacities)
+        self.start = start
+        self.routes = [list(r) for r in routes]
+        self.begin: list[list[int]] = [[] for _ in self.routes]
+        self.latest: list[list[float]] = [[] for _ in self.routes]
+        self.load = [0] * len(self.routes)
+        self.route_of: dict[int, int] = {}
+        self.pos: dict[int, int] = {}
+        for r in range(len(self.routes)):
+            self._refresh(r)
+        k = min(_NEIGHBORS, len(minutes) - 2)
+        if k > 0:
+            travel = minutes[1:, 1:].copy()
+            np.fill_diagonal(travel, np.iinfo(np.int64).max)
+            nearest = np.argpartition(travel, k - 1, axis=1)[:, :k] + 1
+            self.neighbors: list[list[int]] = [[]] + nearest.tolist()
+        else:
+            self.neighbors = [[] for _ in range(len(minutes))]
+        self.moves = 0
+
+    def _travel(self, a: int, b: int, depart: int) -> int:
+        if self._timed is None:
+            return self.t[a][b]
+        return self._timed[self._slot(depart)][a][b]
+
+    def _refresh(self, r: int) -> None:
+        nodes = self.routes[r]
+        t, ws, we, service = self.t_late, self.ws, self.we, self.service
+        begin: list[int] = []
+        prev, ready = 0, self.start
+        for n in nodes:
+            b = max(ws[n], ready + self._travel(prev, n, ready))
+            begin.append(b)
+            prev, ready = n, b + service[n]
+        latest: list[float] = [0.0] * len(nodes)
+        limit = math.inf
+        for i in range(len(nodes) - 1, -1, -1):
+            n = nodes[i]
+            if i + 1 < len(nodes):
+                limit = latest[i + 1] - service[n] - t[n][nodes[i + 1]]
+            latest[i] = min(we[n], limit)
+        self.begin[r] = begin
+        self.latest[r] = latest
+        self.load[r] = sum(self.size[n] for n in nodes)
+        for i, n in enumerate(nodes):
+            self.route_of[n] = r
+            self.pos[n] = i
+
+    def _node(self, r: int, i: int) -> int:
+        """Node at position ``i`` of route ``r``; the depot before position 0."""
+
+        return self.routes[r][i] if i >= 0 else 0
+
+    def _fits(self, r: int, p: int, seq: Sequence[int], q: int) -> bool:
+        """Whether ``seq`` can run between positions ``p`` and ``q`` of ``r``.
+
+        Stops up to ``p`` keep their begin times, stops from ``q`` on must
+        still begin by their latest feasible time.
+        """
+
+        nodes = self.routes[r]
+        travel = self._travel
+        if p >= 0:
+            prev = nodes[p]
+            ready = self.begin[r][p] + self.service[prev]
+        else:
+            prev, ready = 0, self.start
+        for n in seq:
+            b = max(self.ws[n], ready + travel(prev, n, ready))
+            if b > self.we[n]:
+                return False
+            prev, ready = n, b + self.service[n]
+        if q < len(nodes):
+            nxt = nodes[q]
+            arrival = ready + travel(prev, nxt, ready)
+            return max(self.ws[nxt], arrival) <= self.latest[r][q]
+        return True
+
+    def _arc(self, a: int, r: int, j: int) -> int:
+        """Minutes from ``a`` to position ``j`` of route ``r``, 0 past the end."""
+
+        return self.t[a][self.routes[r][j]] if j < len(self.routes[r]) else 0
+
+    def _two_opt(self, u: int) -> bool:
+        r, i = self.route_of[u], self.pos[u]
+        nodes = self.routes[r]
+        t = self.t
+        if i + 1 >= len(nodes):
+            return False
+        x = nodes[i + 1]
+        for v in self.neighbors[u]:
+            if self.route_of.get(v) != r or self.pos[v] <= i + 1:
+                continue
+            j = self.pos[v]
+            # u -> x ... v -> y  becomes  u -> v ... x -> y
+            delta = t[u][v] - t[u][x]
+            if j + 1 < len(nodes):
+                y = nodes[j + 1]
+                delta += t[x][y] - t[v][y]
+            segment = nodes[i + 1 : j + 1][::-1]
+            if not self.symmetric:
+                delta += sum(t[a][b] - t[b][a] for a, b in zip(segment, segment[1:]))
+            if delta >= 0:
+                continue
+            if self._fits(r, i, segment, j + 1):
+                nodes[i + 1 : j + 1] = segment
+                self._refresh(r)
+                return True
+        return False
+
+    def _or_opt(self, u: int) -> bool:
+        r, i = self.route_of[u], self.pos[u]
+        nodes = self.routes[r]
+        t = self.t
+        for length in (1, 2, 3):
+            if i + length > len(nodes):
+                break
+            seg = nodes[i : i + length]
+            prev = self._node(r, i - 1)
+            removed = t[prev][seg[0]] + self._arc(seg[-1], r, i + length)
+            removed -= self._arc(prev, r, i + length)
+            for v in self.neighbors[u]:
+                if self.route_of.get(v) != r:
+                    continue
+                j = self.pos[v]
+                if i - 1 <= j < i + length:
+                    continue
+                # put the segment right after v
+                added = t[v][seg[0]] + self._arc(seg[-1], r, j + 1)
+                added -= self._arc(v, r, j + 1)
+                if added - removed >= 0:
+                    continue
+                if j < i:
+                    middle = nodes[j + 1 : i]
+                    new, a, b = seg + middle, j + 1, i + length
+                else:
+                    middle = nodes[i + length : j + 1]
+                    new, a, b = middle + seg, i, j + 1
+                if self._fits(r, a - 1, new, b):
+                    nodes[a:b] = new
+                    self._refresh(r)
+                    return True
+        return False
+
+    def _relocate(self, u: int) -> bool:
+        ra, i = self.route_of[u], self.pos[u]
+        t = self.t
+        prev = self._node(ra, i - 1)
+        saved = t[prev][u] + self._arc(u, ra, i + 1) - self._arc(prev, ra, i + 1)
+        if saved <= 0 or not self._fits(ra, i - 1, [], i + 1):
+            return False
+        for v in self.neighbors[u]:
+            rb = self.route_of.get(v)
+            if rb is None or rb == ra:
+                continue
+            if self.load[rb] + self.size[u] > self.capacity[rb]:
+                continue
+            j = self.pos[v]
+            # after v, or before it
+            for p in (j, j - 1):
+                before = self._node(rb, p)
+                added = t[before][u] + self._arc(u, rb, p + 1)
+                added -= self._arc(before, rb, p + 1)
+                if added - saved >= 0 or not self._fits(rb, p, [u], p + 1):
+                    continue
+                del self.routes[ra][i]
+                self.routes[rb].insert(p + 1, u)
+                self._refresh(ra)
+                self._refresh(rb)
+                return True
+        return False
+
+    def _swap(self, u: int) -> bool:
+        ra, i = self.route_of[u], self.pos[u]
+        t = self.t
+        pa = self._node(ra, i - 1)
+        for v in self.neighbors[u]:
+            rb = self.route_of.get(v)
+            if rb is None or rb == ra:
+                continue
+            if self.load[ra] - self.size[u] + self.size[v] > self.capacity[ra]:
+                continue
+            if self.load[rb] - self.size[v] + self.size[u] > self.capacity[rb]:
+                continue
+            j = self.pos[v]
+            pb = self._node(rb, j - 1)
+            delta = t[pa][v] - t[pa][u] + self._arc(v, ra, i + 1)
+            delta -= self._arc(u, ra, i + 1)
+            delta += t[pb][u] - t[pb][v] + self._arc(u, rb, j + 1)
+            delta -= self._arc(v, rb, j + 1)
+            if delta >= 0:
+                continue
+            if self._fits(ra, i - 1, [v], i + 1) and self._fits(rb, j - 1, [u], j + 1):
+                self.routes[ra][i] = v
+                self.routes[rb][j] = u
+                self._refresh(ra)
+                self._refresh(rb)
+                return True
+        return False
+
+    def run(self, time_budget: float) -> list[list[int]]:
+        """Apply improving moves until none is left or the budget runs out."""
+
+        deadline = time.monotonic() + time_budget
+        improved = True
+        while improved:
+            improved = False
+            for u in [n for route in self.routes for n in route]:
+                if time.monotonic() > deadline:
+                    improved = False
+                    break
+                if (
+                    self._two_opt(u)
+                    or self._or_opt(u)
+                    or self._relocate(u)
+                    or self._swap(u)
+                ):
+                    self.moves += 1
+                    improved = True
+        logger.info(json.dumps({"event": "local_search_done", "moves": self.moves}))
+        return self.routes
@@ -0,0 +1,186 @@
+"""Precomputed travel matrix for recurring locations, shared read-only on disk.
+
+A store directory holds versions built by ``scripts/build_matrix_store.py``
+and a ``current`` file naming the one in use. Each version has:
+
+- ``meta.json``: the quantization precision and the key of the travel cost
+  provider the matrices were computed with;
+- ``locations.npy``: distinct quantized ``[lat, lon]`` keys, whose row
+  number is the location's id in the matrices. Rebuilds keep the previous
+  version's rows and append new locations, so ids stay stable;
+- ``minutes.npy`` (uint16) and ``meters.npy`` (uint32): square matrices.
+
+The matrices are memory-mapped read-only, so every process opening the same
+version shares one page-cached copy.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+from pathlib import Path
+import tempfile
+
+import numpy as np
+import numpy.typing as npt
+
+from planner.metrics import TravelMatrices, quantize
+from planner.travel import TravelCostProvider, provider_matrices, travel_cost_provider
+import config
+
+logger = logging.getLogger(__name__)
+
+_MAX_MINUTES = np.iinfo(np.uint16).max
+_MAX_METERS = np.iinfo(np.uint32).max
+
+
+class MatrixStore:
+    """One version of a store directory, opened read-only."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        meta = json.loads((path / "meta.json").read_text())
+        self.precision = int(meta["precision"])
+        self.provider = str(meta["provider"])
+        self.keys = np.load(path / "locations.npy")
+        self._row = {(a, b): i for i, (a, b) in enumerate(self.keys.tolist())}
+        self.minutes = np.load(path / "minutes.npy", mmap_mode="r")
+        self.meters = np.load(path / "meters.npy", mmap_mode="r")
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def rows(self, points: npt.NDArray[np.float64]) -> npt.NDArray[np.int64]:
+        """Location id of each ``[lat, lon]`` row, -1 where it is not stored."""
+
+        wanted = quantize(points, self.precision).tolist()
+        return np.array([self._row.get((a, b), -1) for a, b in wanted], dtype=np.int64)
+
+    def matrices(
+        self, points: npt.NDArray[np.float64], provider: TravelCostProvider
+    ) -> TravelMatrices:
+        """Matrices between ``points``; unknown ones are asked of ``provider``.
+
+        ``hits`` and ``misses`` count points found in and missing from the
+        store.
+        """
+
+        rows = self.rows(points)
+        known = rows >= 0
+        missing = ~known
+        block = np.ix_(rows[known], rows[known])
+        if not missing.any():
+            km = self.meters[block] / 1000.0
+            minutes = self.minutes[block].astype(np.int64)
+        else:
+            inside = np.ix_(known, known)
+            n = len(points)
+            km = np.empty((n, n), dtype=np.float64)
+            minutes = np.empty((n, n), dtype=np.int64)
+            km[inside] = self.meters[block] / 1000.0
+            minutes[inside] = self.minutes[block]
+            out, back = provider_matrices(provider, points[missing], points)
+            km[missing, :] = out.km
+            km[:, missing] = back.km.T
+            minutes[missing, :] = out.minutes
+            minutes[:, missing] = back.minutes.T
+        hits = int(known.sum())
+        return TravelMatrices(
+            km=km, minutes=minutes, hits=hits, misses=len(points) - hits
+        )
+
+
+def build_store(
+    points: npt.NDArray[np.float64],
+    directory: Path,
+    precision: int,
+    provider: TravelCostProvider,
+    block_rows: int = 1024,
+) -> Path:
+    """Write a new version for ``points`` under ``directory`` and make it current.
+
+    Locations of the current version keep their ids. Rows are computed
+    ``block_rows`` at a time straight into the memory-mapped output, so
+    memory stays bounded for large location sets.
+    """
+
+    keys = np.zeros((0, 2), dtype=np.int64)
+    current = _current(directory)
+    if current is not None:
+        previous = MatrixStore(current)
+        if previous.precision == precision:
+            keys = previous.keys
+    known = {(a, b) for a, b in keys.tolist()}
+    added = [
+        key
+        for key in dict.fromkeys(map(tuple, quantize(points, precision).tolist()))
+        if key not in known
+    ]
+    keys = np.vstack([keys, np.array(added, dtype=np.int64).reshape(-1, 2)])
+    coords = keys / 10.0**precision
+    directory.mkdir(parents=True, exist_ok=True)
+    path = Path(tempfile.mkdtemp(prefix="v", dir=directory))
+    n = len(keys)
+    np.save(path / "locations.npy", keys)
+    minutes = np.lib.format.open_memmap(
+        path / "minutes.npy", mode="w+", dtype=np.uint16, shape=(n, n)
+    )
+    meters = np.lib.format.open_memmap(
+        path / "meters.npy", mode="w+", dtype=np.uint32, shape=(n, n)
+    )
+    for first in range(0, n, block_rows):
+        part = provider.matrix(coords[first : first + block_rows], coords)
+        rows = slice(first, first + len(part.km))
+        minutes[rows] = part.minutes.clip(max=_MAX_MINUTES)
+        meters[rows] = np.floor(part.km * 1000 + 0.5).clip(max=_MAX_METERS)
+    minutes.flush()
+    meters.flush()
+    del minutes, meters
+    meta = {"precision": precision, "provider": provider.key, "locations": n}
+    (path / "meta.json").write_text(json.dumps(meta))
+    # readers follow ``current``, so switch it in one step
+    pointer = directory / f"current.{os.getpid()}.tmp"
+    pointer.write_text(path.name)
+    os.replace(pointer, directory / "current")
+    return path
+
+
+def _current(directory: Path) -> Path | None:
+    try:
+        return directory / (directory / "current").read_text().strip()
+    except FileNotFoundError:
+        return None
+
+
+_store: MatrixStore | None = None
+
+
+def matrix_store() -> MatrixStore | None:
+    """The current version under ``MATRIX_STORE_DIR``.
+
+    None when unset, empty, or built with another travel cost provider than
+    the configured one.
+    """
+
+    global _store
+    if not config.MATRIX_STORE_DIR:
+        return None
+    path = _current(Path(config.MATRIX_STORE_DIR))
+    if path is None:
+        return None
+    if _store is None or _store.path != path:
+        _store = MatrixStore(path)
+    key = travel_cost_provider().key
+    if _store.provider != key:
+        logger.info(
+            json.dumps(
+                {
+                    "event": "matrix_store_stale",
+                    "store_provider": _store.provider,
+                    "provider": key,
+                }
+            )
+        )
+        return None
+    return _store
@@ -1,25 +1,44 @@
 import math
+from typing import NamedTuple, Sequence
+
+import numpy as np
+import numpy.typing as npt
+
 from planner.dtos import Coord
 import config
 
+EARTH_RADIUS_KM = 6371.0
 
-def distance_km(a: Coord, b: Coord) -> float:
-    r = 6371.0
-    phi1 = math.radians(a.lat)
-    phi2 = math.radians(b.lat)
-    dphi = math.radians(b.lat - a.lat)
-    dlambda = math.radians(b.lon - a.lon)
-    d = (
-        2
-        * r
-        * math.asin(
-            math.sqrt(
-                math.sin(dphi / 2) ** 2
-                + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
-            )
-        )
+
+class TravelMatrices(NamedTuple):
+    """Pairwise kilometres and whole travel minutes between a set of points.
+
+    ``hits`` and ``misses`` count the locations a cache or store already
+    held and had to compute while building them.
+    """
+
+    km: npt.NDArray[np.float64]
+    minutes: npt.NDArray[np.int64]
+    hits: int = 0
+    misses: int = 0
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle kilometres between two points given in degrees."""
+
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = math.radians(lat2 - lat1)
+    dlambda = math.radians(lon2 - lon1)
+    h = (
+        math.sin(dphi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
     )
-    return d
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(h))
+
+
+def distance_km(a: Coord, b: Coord) -> float:
+    return haversine_km(a.lat, a.lon, b.lat, b.lon)
 
 
 def travel_minutes(a: Coord, b: Coord, speed_kmph: int) -> int:
@@ -30,3 +49,83 @@ def travel_minutes(a: Coord, b: Coord, speed_kmph: int) -> int:
 
 def haversine_minutes(a: Coord, b: Coord) -> int:
     return travel_minutes(a, b, config.AVERAGE_SPEED_KMPH)
+
+
+def coord_array(coords: Sequence[Coord]) -> npt.NDArray[np.float64]:
+    """Return an ``(n, 2)`` array of ``[lat, lon]`` degrees."""
+
+    arr = np.empty((len(coords), 2), dtype=np.float64)
+    for i, c in enumerate(coords):
+        arr[i, 0] = c.lat
+        arr[i, 1] = c.lon
+    return arr
+
+
+def distance_matrix_km(
+    origins: npt.NDArray[np.float64],
+    destinations: npt.NDArray[np.float64] | None = None,
+) -> npt.NDArray[np.float64]:
+    """Haversine distances between ``[lat, lon]`` rows in one batched pass.
+
+    Returns an ``(len(origins), len(destinations))`` matrix; ``destinations``
+    defaults to ``origins`` for the usual square matrix.
+    """
+
+    if destinations is None:
+        destinations = origins
+    lat1 = np.radians(origins[:, 0])[:, None]
+    lon1 = np.radians(origins[:, 1])[:, None]
+    lat2 = np.radians(destinations[:, 0])[None, :]
+    lon2 = np.radians(destinations[:, 1])[None, :]
+    h = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    # rounding can push h a hair above 1 for antipodal points
+    np.clip(h, 0.0, 1.0, out=h)
+    return np.asarray(2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(h)), dtype=np.float64)
+
+
+def paired_distance_km(
+    origins: npt.NDArray[np.float64], destinations: npt.NDArray[np.float64]
+) -> npt.NDArray[np.float64]:
+    """Haversine distance from each origin row to the destination row it pairs with."""
+
+    lat1 = np.radians(origins[:, 0])
+    lat2 = np.radians(destinations[:, 0])
+    dlon = np.radians(destinations[:, 1] - origins[:, 1])
+    h = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    )
+    np.clip(h, 0.0, 1.0, out=h)
+    return np.asarray(2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(h)), dtype=np.float64)
+
+
+def minutes_matrix(
+    km: npt.NDArray[np.float64], speed_kmph: int
+) -> npt.NDArray[np.int64]:
+    """Round kilometres to whole travel minutes, as :func:`travel_minutes` does."""
+
+    return np.floor(km / speed_kmph * 60 + 0.5).astype(np.int64)
+
+
+def quantize(points: npt.NDArray[np.float64], precision: int) -> npt.NDArray[np.int64]:
+    """``[lat, lon]`` rows as integers in units of ``10**-precision`` degrees."""
+
+    return np.round(points * 10.0**precision).astype(np.int64)
+
+
+def build_matrices(
+    coords: Sequence[Coord] | npt.NDArray[np.float64], speed_kmph: int | None = None
+) -> TravelMatrices:
+    """Build the square distance and travel-time matrices for ``coords``.
+
+    ``coords`` may already be an ``(n, 2)`` array of ``[lat, lon]`` rows.
+    """
+
+    if speed_kmph is None:
+        speed_kmph = config.AVERAGE_SPEED_KMPH
+    points = coords if isinstance(coords, np.ndarray) else coord_array(coords)
+    km = distance_matrix_km(points)
+    return TravelMatrices(km=km, minutes=minutes_matrix(km, speed_kmph))
@@ -0,0 +1,108 @@
+"""Drop tasks no vehicle can serve and tighten the windows of the rest."""
+
+from __future__ import annotations
+
+from typing import NamedTuple, Sequence
+
+from api.dtos import VehicleDTO
+from planner.dtos import Coord, TaskDTO, TimeWindow
+from planner.metrics import TravelMatrices, coord_array
+from planner.problem import format_time, parse_time
+from planner.speed_profile import speed_profile
+from planner.travel import provider_matrices, travel_cost_provider
+import config
+
+# reason codes of dropped tasks
+EXCEEDS_CAPACITY = "exceeds_capacity"
+WINDOW_INVALID = "window_invalid"
+WINDOW_OUTSIDE_HORIZON = "window_outside_horizon"
+WINDOW_UNREACHABLE = "window_unreachable"
+
+
+class Presolved(NamedTuple):
+    tasks: list[TaskDTO]
+    # task id -> reason code
+    dropped: dict[str, str]
+    tightened: int
+
+
+def presolve(
+    tasks: Sequence[TaskDTO],
+    vehicles: Sequence[VehicleDTO],
+    depots: Sequence[Coord],
+    closed_routes: bool,
+    matrices: TravelMatrices | None = None,
+) -> Presolved:
+    """Reduce the day to tasks some vehicle can serve, with tighter windows.
+
+    A task is dropped when it is larger than every vehicle, when its window
+    ends before it starts or lies outside the planning horizon, or when no
+    vehicle can reach it from a depot before the window closes. Windows
+    then start no earlier than the first possible arrival and, on
+    ``closed_routes``, end early enough to drive back to a depot by the end
+    of the horizon. Tasks without a window keep none, so solvers still time
+    them as windowless; on ``closed_routes`` they are only dropped when no
+    vehicle can reach them and return within the horizon. Travel uses the
+    fastest speed of the day, so nothing a solver could schedule is dropped.
+    ``matrices`` may carry costs between ``depots`` followed by ``tasks``;
+    otherwise the depot rows are computed.
+    """
+
+    if not tasks:
+        return Presolved([], {}, 0)
+    horizon_start = parse_time(config.PLANNING_HORIZON_START)
+    horizon_end = parse_time(config.PLANNING_HORIZON_END)
+    depot_count = len(depots)
+    if matrices is None:
+        out, back = provider_matrices(
+            travel_cost_provider(),
+            coord_array(depots),
+            coord_array([t.location for t in tasks]),
+        )
+    else:
+        task_nodes = slice(depot_count, None)
+        out = TravelMatrices(
+            km=matrices.km[:depot_count, task_nodes],
+            minutes=matrices.minutes[:depot_count, task_nodes],
+        )
+        back = TravelMatrices(
+            km=matrices.km[task_nodes, :depot_count].T,
+            minutes=matrices.minutes[task_nodes, :depot_count].T,
+        )
+    profile = speed_profile()
+    reach = profile.matrices(out).fastest().min(axis=0).tolist()
+    home = profile.matrices(back).fastest().min(axis=0).tolist()
+    largest = max((v.capacity for v in vehicles), default=None)
+
+    kept: list[TaskDTO] = []
+    dropped: dict[str, str] = {}
+    tightened = 0
+    for i, task in enumerate(tasks):
+        service = task.service_minutes or config.SERVICE_TIME_MINUTES_DEFAULT
+        if task.window:
+            ws, we = parse_time(task.window.start), parse_time(task.window.end)
+        else:
+            ws, we = horizon_start, horizon_end
+        earliest = max(ws, horizon_start + reach[i])
+        latest = we
+        if closed_routes:
+            latest = min(we, horizon_end - service - home[i])
+        # open routes have no end time, so tasks without a window fit anytime
+        bounded = task.window is not None or closed_routes
+        # a synthetic window would make solvers treat the task as windowed
+        tighten = task.window is not None and (earliest, latest) != (ws, we)
+        if largest is not None and task.size > largest:
+            dropped[task.id] = EXCEEDS_CAPACITY
+        elif we < ws:
+            dropped[task.id] = WINDOW_INVALID
+        elif we < horizon_start or (closed_routes and ws > horizon_end):
+            dropped[task.id] = WINDOW_OUTSIDE_HORIZON
+        elif bounded and earliest > latest:
+            dropped[task.id] = WINDOW_UNREACHABLE
+        elif tighten:
+            window = TimeWindow(start=format_time(earliest), end=format_time(latest))
+            kept.append(task.model_copy(update={"window": window}))
+            tightened += 1
+        else:
+            kept.append(task)
+    return Presolved(kept, dropped, tightened)
@@ -0,0 +1,141 @@
+"""One-time compilation of a planning day into flat arrays for the solvers."""
+
+from __future__ import annotations
+
+from datetime import date, datetime
+from pathlib import Path
+from typing import NamedTuple, Sequence
+
+import numpy as np
+import numpy.typing as npt
+
+from api.dtos import VehicleDTO
+from planner.dtos import Coord, TaskDTO
+from planner.matrix_store import matrix_store
+from planner.metrics import TravelMatrices, coord_array
+from planner.travel import cost_matrices, travel_cost_provider
+import config
+
+
+def parse_time(value: str) -> int:
+    h, m = value.split(":")
+    return int(h) * 60 + int(m)
+
+
+def format_time(minutes: int) -> str:
+    h = minutes // 60
+    m = minutes % 60
+    return f"{h:02d}:{m:02d}"
+
+
+def horizon_date(moment: datetime | None = None) -> date:
+    """Date of the planning horizon ``moment`` falls on, now by default.
+
+    ``PLANNING_HORIZON_*`` are local clock times, so this is the local date,
+    which early in the morning can differ from the UTC one.
+    """
+
+    return (moment or datetime.now()).astimezone().date()
+
+
+class Problem(NamedTuple):
+    """Tasks and vehicles as struct-of-arrays, times in minutes of the day.
+
+    Task arrays are indexed like ``task_ids`` and ``capacities`` like
+    ``vehicle_ids``. Tasks without a window get the planning horizon and a
+    False ``windowed`` flag. ``matrices`` optionally carries precomputed
+    travel costs between ``locations``, or ``matrices_path`` names them as
+    saved by :func:`save_matrices`.
+    """
+
+    depots: list[Coord]
+    depot_coords: npt.NDArray[np.float64]
+    task_ids: list[str]
+    task_coords: npt.NDArray[np.float64]
+    windows: npt.NDArray[np.int64]
+    windowed: npt.NDArray[np.bool_]
+    demands: npt.NDArray[np.int64]
+    service: npt.NDArray[np.int64]
+    vehicle_ids: list[str]
+    capacities: npt.NDArray[np.int64]
+    horizon_start: int
+    horizon_end: int
+    matrices: TravelMatrices | None = None
+    matrices_path: str | None = None
+
+    @property
+    def locations(self) -> npt.NDArray[np.float64]:
+        """Depots followed by tasks, as ``[lat, lon]`` rows."""
+
+        return np.vstack([self.depot_coords, self.task_coords])
+
+
+def save_matrices(matrices: TravelMatrices, path: Path) -> str:
+    """Save ``matrices`` as ``<path>.km.npy`` and ``<path>.minutes.npy``.
+
+    Every process that solves the problem maps the same files read-only, so
+    a large day is written once rather than pickled into each job.
+    """
+
+    np.save(f"{path}.km.npy", matrices.km)
+    np.save(f"{path}.minutes.npy", matrices.minutes)
+    return str(path)
+
+
+def travel_matrices(problem: Problem) -> TravelMatrices:
+    """Matrices between ``problem.locations``.
+
+    Reuses ``problem.matrices`` or ``problem.matrices_path`` if set, then
+    reads the shared matrix store if one is configured, and otherwise asks
+    the travel cost provider through the matrix cache.
+    """
+
+    if problem.matrices is not None:
+        return problem.matrices
+    if problem.matrices_path is not None:
+        return TravelMatrices(
+            km=np.load(f"{problem.matrices_path}.km.npy", mmap_mode="r"),
+            minutes=np.load(f"{problem.matrices_path}.minutes.npy", mmap_mode="r"),
+        )
+    store = matrix_store()
+    if store is not None:
+        return store.matrices(problem.locations, travel_cost_provider())
+    return cost_matrices(problem.locations)
+
+
+def compile_problem(
+    depots: Sequence[Coord],
+    tasks: Sequence[TaskDTO],
+    vehicles: Sequence[VehicleDTO],
+    matrices: TravelMatrices | None = None,
+    matrices_path: str | None = None,
+) -> Problem:
+    horizon_start = parse_time(config.PLANNING_HORIZON_START)
+    horizon_end = parse_time(config.PLANNING_HORIZON_END)
+    windows = np.empty((len(tasks), 2), dtype=np.int64)
+    windowed = np.zeros(len(tasks), dtype=np.bool_)
+    for i, task in enumerate(tasks):
+        if task.window:
+            windows[i] = parse_time(task.window.start), parse_time(task.window.end)
+            windowed[i] = True
+        else:
+            windows[i] = horizon_start, horizon_end
+    return Problem(
+        depots=list(depots),
+        depot_coords=coord_array(depots),
+        task_ids=[t.id for t in tasks],
+        task_coords=coord_array([t.location for t in tasks]),
+        windows=windows,
+        windowed=windowed,
+        demands=np.array([t.size for t in tasks], dtype=np.int64),
+        service=np.array(
+            [t.service_minutes or config.SERVICE_TIME_MINUTES_DEFAULT for t in tasks],
+            dtype=np.int64,
+        ),
+        vehicle_ids=[v.id for v in vehicles],
+        capacities=np.array([v.capacity for v in vehicles], dtype=np.int64),
+        horizon_start=horizon_start,
+        horizon_end=horizon_end,
+        matrices=matrices,
+        matrices_path=matrices_path,
+    )
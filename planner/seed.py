@@ -0,0 +1,72 @@
+"""Initial routes for today's solve taken from a past plan of recurring stops."""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import NamedTuple, Sequence
+
+from api.dtos import VehicleDTO
+from planner.dtos import Coord, PlanResultDTO, TaskDTO
+from planner.metrics import coord_array, quantize
+import config
+
+
+class Seed(NamedTuple):
+    # vehicle id -> today's task ids in the past plan's order
+    routes: dict[str, list[str]]
+    seeded: int
+
+
+def _places(coords: Sequence[Coord]) -> list[tuple[int, int]]:
+    if not coords:
+        return []
+    keys = quantize(coord_array(coords), config.PLAN_SEED_PRECISION)
+    return [(lat, lon) for lat, lon in keys.tolist()]
+
+
+def seed_routes(
+    plan: PlanResultDTO,
+    locations: dict[str, Coord],
+    tasks: Sequence[TaskDTO],
+    vehicles: Sequence[VehicleDTO],
+) -> Seed:
+    """Routes of a past ``plan`` mapped onto today's ``tasks``.
+
+    A past task stands for today's task with the same id or, failing that,
+    for today's tasks at its place in ``locations``, to
+    ``PLAN_SEED_PRECISION`` decimals. Each of today's tasks is seeded
+    once, on routes of vehicles still in ``vehicles`` and only while the
+    vehicle has room for it.
+    """
+
+    by_id = {t.id: t for t in tasks}
+    at_place: dict[tuple[int, int], list[TaskDTO]] = defaultdict(list)
+    for place, task in zip(_places([t.location for t in tasks]), tasks):
+        at_place[place].append(task)
+    past = [t for t in locations if t not in by_id]
+    place_of = dict(zip(past, _places([locations[t] for t in past])))
+    capacities = {v.id: v.capacity for v in vehicles}
+
+    used: set[str] = set()
+    routes: dict[str, list[str]] = {}
+    for vp in plan.vehicle_plans:
+        capacity = capacities.get(vp.vehicle_id)
+        if capacity is None:
+            continue
+        route: list[str] = []
+        load = 0
+        for past_id in vp.tasks_order:
+            if past_id in by_id:
+                matches = [by_id[past_id]]
+            elif past_id in place_of:
+                matches = at_place[place_of[past_id]]
+            else:
+                continue
+            for task in matches:
+                if task.id in used or load + task.size > capacity:
+                    continue
+                used.add(task.id)
+                route.append(task.id)
+                load += task.size
+        routes[vp.vehicle_id] = route
+    return Seed(routes, len(used))
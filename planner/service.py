@@ -1,18 +1,42 @@
 from api.crews import get_crews
+from api.dtos import VehicleDTO
 from api.http_client import request
 from api.vehicles import get_vehicles
 from api.errors import ApiError
-from planner.dtos import Coord, PlanResultDTO
+from planner.aggregate import Aggregated, aggregate, expand_plan, merged_routes
+from planner.decompose import (
+    Partition,
+    merge_plans,
+    partition,
+    partition_by_office,
+    rebalance_boundary,
+)
+from planner.dtos import Coord, PlanResultDTO, TaskDTO
+from planner.incremental_matrix import IncrementalMatrix, Synced
+from planner.insertion import insert_task, reschedule
+from planner.metrics import TravelMatrices
+from planner.presolve import Presolved, presolve
+from planner.problem import Problem, compile_problem, horizon_date, save_matrices
+from planner.seed import Seed, seed_routes
 from planner.solver import solve_plan
 from planner.stops_api import get_today_stops
-from storage.history import save_plan
+from planner.travel import matrix_cache, save_matrix_cache
+from planner.worker_pool import SolverPool
+from storage.history import get_weekday_plan, save_plan
+import asyncio
 import config
 import json
+import sqlite3
+import tempfile
+import threading
 import time
 import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Hashable, Sequence, TypeVar
 
 try:
-    from planner.solver_ortools import solve_plan_ortools
+    from planner.solver_ortools import solve_plan_ortools, time_budget_seconds
 
     _HAS_ORTOOLS = True
 except Exception:  # pragma: no cover
@@ -29,52 +53,643 @@ except Exception:  # pragma: no cover
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
 if _HAS_ORTOOLS:
     logger.info(json.dumps({"event": "solver_selected", "solver": "ortools"}))
 else:
     logger.info(json.dumps({"event": "solver_selected", "solver": "heuristic"}))
 
 _latest_plan: PlanResultDTO | None = None
-_latest_metrics: dict[str, float | int] | None = None
+_latest_metrics: dict[str, float | int | str] | None = None
+_latest_tasks: dict[str, TaskDTO] = {}
+_latest_vehicles: list[VehicleDTO] = []
+# minutes added to the plan by cheap insertions since the last full solve
+_drift_minutes = 0
+_solver_pool = SolverPool(config.SOLVER_WORKERS, config.SOLVER_QUEUE_SIZE)
+# travel costs between the depots and the day's stops, updated between solves
+_matrix: IncrementalMatrix | None = None
+# _matrix and its cache are updated off the event loop
+_matrix_lock = threading.Lock()
+# background OR-Tools search improving a fast-first plan
+_refinement: asyncio.Task[None] | None = None
 
 
-async def build_today_plan() -> PlanResultDTO:
-    vehicles = await get_vehicles()
-    await get_crews()
-    stops = await get_today_stops()
+def _office_depots() -> dict[str, Coord]:
+    """``OFFICE_DEPOTS`` as office -> depot; empty without ``USE_MULTI_DEPOT``."""
+
+    depots: dict[str, Coord] = {}
+    if not config.USE_MULTI_DEPOT:
+        return depots
+    for entry in filter(None, (p.strip() for p in config.OFFICE_DEPOTS.split(","))):
+        try:
+            office, at = entry.split("=")
+            lat, lon = (float(x) for x in at.split(":"))
+        except ValueError:
+            raise ValueError(f"invalid office depot entry: {entry!r}") from None
+        depots[office.strip()] = Coord(lat=lat, lon=lon)
+    return depots
+
+
+def _default_depot() -> Coord:
+    return Coord(lat=config.DEPOT_LAT, lon=config.DEPOT_LON)
+
+
+def _depots() -> list[Coord]:
+    """The default depot followed by every other office depot."""
+
+    depots = [_default_depot()]
+    for depot in _office_depots().values():
+        if depot not in depots:
+            depots.append(depot)
+    return depots
+
+
+def _vehicle_depots(vehicles: Sequence[VehicleDTO]) -> dict[str, Coord]:
+    """Vehicle id -> office depot, for vehicles not using the default depot."""
+
+    offices = _office_depots()
+    return {v.id: offices[v.office] for v in vehicles if v.office in offices}
+
+
+def _fleet_depot(vehicles: Sequence[VehicleDTO]) -> Coord:
+    """Depot of a fleet from a single office."""
+
+    if not vehicles:
+        return _default_depot()
+    return _office_depots().get(vehicles[0].office, _default_depot())
+
+
+def _depot_key(depot: Coord) -> Hashable:
+    return ("depot", depot.lat, depot.lon)
+
+
+def _sync_matrix(stops: list[TaskDTO]) -> Synced | None:
+    """Bring :data:`_matrix` to the depots and ``stops``.
+
+    Returns None when the day is not tracked: when it has more locations
+    than ``INCREMENTAL_MATRIX_MAX_LOCATIONS`` or the matrix cache holds, or
+    with ``MATRIX_STORE_DIR`` set, as workers then read distances from the
+    shared store. The matrix starts over with the cache, which changes with
+    the travel cost provider. Computing new locations can take seconds, so
+    this runs in a thread.
+    """
+
+    global _matrix
+    locations: list[tuple[Hashable, Coord]] = [(_depot_key(c), c) for c in _depots()]
+    locations += [(t.id, t.location) for t in stops]
+    with _matrix_lock:
+        cache = matrix_cache()
+        if (
+            cache is None
+            or config.MATRIX_STORE_DIR
+            or len(locations)
+            > min(config.INCREMENTAL_MATRIX_MAX_LOCATIONS, cache.capacity)
+        ):
+            _matrix = None
+            return None
+        if _matrix is None or _matrix.cache is not cache:
+            _matrix = IncrementalMatrix(cache)
+        synced = _matrix.sync(locations)
+    logger.info(json.dumps({"event": "matrix_synced", **synced._asdict()}))
+    return synced
+
+
+def _track_location(task: TaskDTO) -> None:
+    """Add ``task`` to :data:`_matrix` while it has room for it."""
+
+    with _matrix_lock:
+        if _matrix is not None and len(_matrix) < min(
+            config.INCREMENTAL_MATRIX_MAX_LOCATIONS, _matrix.cache.capacity
+        ):
+            _matrix.add([(task.id, task.location)])
+
+
+def _with_matrix_lock(fn: Callable[..., T], *args: Any) -> T:
+    """Call ``fn`` holding :data:`_matrix_lock`.
+
+    Insertion looks legs up in the matrix cache, which a solve may be
+    syncing in another thread.
+    """
+
+    with _matrix_lock:
+        return fn(*args)
+
+
+def _day_matrices(depots: list[Coord], stops: list[TaskDTO]) -> TravelMatrices | None:
+    """Rows of :data:`_matrix` for ``depots`` then ``stops``, if all are tracked."""
+
+    keys: list[Hashable] = [_depot_key(c) for c in depots]
+    keys += [t.id for t in stops]
+    with _matrix_lock:
+        if _matrix is None or any(k not in _matrix for k in keys):
+            return None
+        return _matrix.matrices(keys)
+
+
+def _compile_day(
+    depots: list[Coord],
+    stops: list[TaskDTO],
+    vehicles: list[VehicleDTO],
+    directory: str,
+) -> Problem:
+    """The day's problem, its tracked matrices saved for workers to map.
+
+    Workers map the saved matrices instead of unpickling a copy per job.
+    """
+
+    matrices = _day_matrices(depots, stops)
+    path = None
+    if matrices is not None:
+        path = save_matrices(matrices, Path(directory) / "day")
+    return compile_problem(depots, stops, vehicles, matrices_path=path)
+
+
+def _portfolio() -> list[tuple[str, str]]:
+    """``SOLVER_PORTFOLIO`` as (first solution, metaheuristic) pairs."""
+
+    pairs = []
+    for entry in config.SOLVER_PORTFOLIO.split(","):
+        if entry.strip():
+            first, _, meta = entry.strip().partition(":")
+            pairs.append((first, meta or config.SOLVER_METAHEURISTIC))
+    return pairs
+
+
+def _plan_rank(plan: PlanResultDTO) -> tuple[int, int]:
+    return len(plan.unscheduled), plan.objective_minutes
+
+
+class _ProgressPublisher:
+    """Publishes a running solve's improving plans as the latest plan."""
+
+    def __init__(
+        self,
+        stops: list[TaskDTO],
+        dropped: dict[str, str],
+        members: dict[str, list[TaskDTO]],
+    ) -> None:
+        self.stops = stops
+        self.dropped = dropped
+        self.members = members
+        self.best: float | None = None
+        self.done = False
+
+    def __call__(self, plan: PlanResultDTO) -> None:
+        global _latest_plan, _latest_metrics, _latest_tasks
+        objective = float(plan.stats.get("objective", plan.objective_minutes))
+        if self.done or (self.best is not None and objective >= self.best):
+            return
+        self.best = objective
+        expand_plan(plan, self.members)
+        _add_dropped(plan, self.dropped)
+        _latest_plan = plan
+        _latest_tasks = {t.id: t for t in self.stops}
+        _latest_metrics = _plan_metrics(
+            plan, len(self.stops), int(plan.stats.get("elapsed_ms", 0))
+        )
+        _latest_metrics["partial"] = 1
+        logger.info(
+            json.dumps(
+                {
+                    "event": "plan_improved",
+                    "objective": objective,
+                    "elapsed_ms": plan.stats.get("elapsed_ms"),
+                }
+            )
+        )
+
+
+async def _solve_portfolio(
+    problem: Problem,
+    job_id: str | None,
+    initial_routes: dict[str, list[str]] | None,
+    time_limit_seconds: float | None,
+    configs: list[tuple[str, str]],
+    on_progress: _ProgressPublisher | None,
+) -> PlanResultDTO:
+    # every configuration needs its own core to share the same deadline
+    configs = configs[: max(1, config.SOLVER_WORKERS)]
+    plans = await asyncio.gather(
+        *(
+            _solver_pool.run(
+                solve_plan_ortools,
+                problem,
+                initial_routes,
+                time_limit_seconds,
+                first,
+                meta,
+                job_id=f"{job_id}:{i}" if job_id else None,
+                on_progress=on_progress,
+            )
+            for i, (first, meta) in enumerate(configs)
+        )
+    )
+    best = min(plans, key=_plan_rank)
+    best.stats["portfolio_size"] = len(configs)
     logger.info(
         json.dumps(
-            {"event": "planner_start", "tasks": len(stops), "vehicles": len(vehicles)}
+            {
+                "event": "portfolio_winner",
+                "solver_config": best.stats.get("solver_config"),
+                "objectives": [p.objective_minutes for p in plans],
+            }
         )
     )
-    start_time = time.time()
+    return best
+
+
+async def _solve_single(
+    stops: list[TaskDTO],
+    vehicles: list[VehicleDTO],
+    job_id: str | None,
+    initial_routes: dict[str, list[str]] | None,
+    time_limit_seconds: float | None,
+    on_progress: _ProgressPublisher | None = None,
+    heuristic: bool = False,
+    portfolio: bool = False,
+) -> PlanResultDTO:
+    if not vehicles:
+        # OR-Tools aborts the whole worker process on a model without vehicles
+        logger.info(json.dumps({"event": "solver_no_vehicles", "tasks": len(stops)}))
+        return PlanResultDTO(
+            generated_at=datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            depot=_default_depot(),
+            vehicle_plans=[],
+            unscheduled=sorted(t.id for t in stops),
+            objective_minutes=0,
+        )
+    with tempfile.TemporaryDirectory(prefix="planner-") as directory:
+        # compiled once and shared by every solver run on this day; every
+        # vehicle here belongs to the same office
+        depots = [_fleet_depot(vehicles)]
+        problem = await asyncio.to_thread(
+            _compile_day, depots, stops, vehicles, directory
+        )
+        return await _run_solver(
+            problem,
+            stops,
+            vehicles,
+            job_id,
+            initial_routes,
+            time_limit_seconds,
+            on_progress,
+            heuristic,
+            portfolio,
+        )
+
+
+async def _run_solver(
+    problem: Problem,
+    stops: list[TaskDTO],
+    vehicles: list[VehicleDTO],
+    job_id: str | None,
+    initial_routes: dict[str, list[str]] | None,
+    time_limit_seconds: float | None,
+    on_progress: _ProgressPublisher | None,
+    heuristic: bool,
+    portfolio: bool,
+) -> PlanResultDTO:
+    if heuristic and _HAS_ORTOOLS:
+        plan = await _solver_pool.run(
+            solve_plan, problem, config.PLAN_FAST_FIRST_SECONDS, job_id=job_id
+        )
+        # heuristic routes end at their last stop, OR-Tools ones at the depot
+        by_id = {t.id: t for t in stops}
+        depots = _vehicle_depots(vehicles)
+        return await asyncio.to_thread(
+            _with_matrix_lock, reschedule, plan, by_id, True, depots
+        )
     if _HAS_ORTOOLS:
-        if config.USE_MULTI_DEPOT:
-            depots = [Coord(lat=config.DEPOT_LAT, lon=config.DEPOT_LON)]
+        # partitions already fill the pool, so only a whole day fans out
+        configs = _portfolio() if portfolio else _portfolio()[:1]
+        if len(configs) > 1:
+            return await _solve_portfolio(
+                problem,
+                job_id,
+                initial_routes,
+                time_limit_seconds,
+                configs,
+                on_progress,
+            )
+        first, meta = configs[0] if configs else (None, None)
+        return await _solver_pool.run(
+            solve_plan_ortools,
+            problem,
+            initial_routes,
+            time_limit_seconds,
+            first,
+            meta,
+            job_id=job_id,
+            on_progress=on_progress,
+        )
+    return await _solver_pool.run(solve_plan, problem, job_id=job_id)
+
+
+async def _gather_limited(calls: Sequence[Awaitable[T]]) -> list[T]:
+    """Await ``calls`` with at most ``SOLVER_WORKERS`` of them in the pool."""
+
+    limit = asyncio.Semaphore(max(1, config.SOLVER_WORKERS))
+
+    async def limited(call: Awaitable[T]) -> T:
+        async with limit:
+            return await call
+
+    return list(await asyncio.gather(*(limited(c) for c in calls)))
+
+
+def _partitions(stops: list[TaskDTO], vehicles: list[VehicleDTO]) -> list[Partition]:
+    """Subproblems of a day, one or more per office with ``USE_MULTI_DEPOT``.
+
+    Offices share no vehicles, so each is solved on its own; an office with
+    at least ``SOLVER_DECOMPOSE_MIN_TASKS`` tasks is split further per
+    ``SOLVER_DECOMPOSE``.
+    """
+
+    mode = config.SOLVER_DECOMPOSE
+    if not config.USE_MULTI_DEPOT:
+        return partition(stops, vehicles, mode, _default_depot())
+    depots = {v.office: _fleet_depot([v]) for v in vehicles}
+    split = mode not in ("off", "office")
+    parts = []
+    for part in partition_by_office(stops, vehicles, depots):
+        if not split or len(part.tasks) < config.SOLVER_DECOMPOSE_MIN_TASKS:
+            parts.append(part)
         else:
-            depots = [Coord(lat=config.DEPOT_LAT, lon=config.DEPOT_LON)]
-        plan = solve_plan_ortools(depots, stops, vehicles)
+            depot = _fleet_depot(part.vehicles)
+            parts += partition(part.tasks, part.vehicles, mode, depot)
+    return parts
+
+
+async def _solve_decomposed(
+    stops: list[TaskDTO],
+    vehicles: list[VehicleDTO],
+    job_id: str | None,
+    initial_routes: dict[str, list[str]] | None,
+    time_limit_seconds: float | None,
+    heuristic: bool = False,
+) -> PlanResultDTO:
+    parts = [p for p in _partitions(stops, vehicles) if p.tasks]
+    logger.info(json.dumps({"event": "solver_decomposed", "partitions": len(parts)}))
+    calls = []
+    for i, part in enumerate(parts):
+        hint = None
+        if initial_routes is not None:
+            hint = {v.id: initial_routes.get(v.id, []) for v in part.vehicles}
+        calls.append(
+            _solve_single(
+                part.tasks,
+                part.vehicles,
+                f"{job_id}:{i}" if job_id else None,
+                hint,
+                time_limit_seconds,
+                heuristic=heuristic,
+            )
+        )
+    plans = await _gather_limited(calls)
+    merged = merge_plans(_default_depot(), plans, vehicles)
+    plan = await _solver_pool.run(
+        rebalance_boundary,
+        merged,
+        stops,
+        vehicles,
+        [[v.id for v in p.vehicles] for p in parts],
+        _HAS_ORTOOLS,
+        _vehicle_depots(vehicles),
+        config.USE_MULTI_DEPOT,
+        job_id=f"{job_id}:merge" if job_id else None,
+    )
+    plan.stats["partitions"] = len(parts)
+    if config.USE_MULTI_DEPOT:
+        plan.stats["offices"] = len({v.office for v in vehicles})
+    reasons = {str(p.stats["solver_stop_reason"]) for p in plans if p.stats}
+    if reasons:
+        plan.stats["solver_stop_reason"] = ",".join(sorted(reasons))
+    for key in ("matrix_cache_hits", "matrix_cache_misses"):
+        if any(key in p.stats for p in plans):
+            plan.stats[key] = sum(int(p.stats.get(key, 0)) for p in plans)
+    return plan
+
+
+def _presolve(stops: list[TaskDTO], vehicles: list[VehicleDTO]) -> Presolved:
+    if not config.SOLVER_PRESOLVE:
+        return Presolved(stops, {}, 0)
+    depots = _depots()
+    reduced = presolve(
+        stops, vehicles, depots, _HAS_ORTOOLS, _day_matrices(depots, stops)
+    )
+    if reduced.dropped or reduced.tightened:
+        logger.info(
+            json.dumps(
+                {
+                    "event": "presolve",
+                    "dropped": reduced.dropped,
+                    "tightened": reduced.tightened,
+                }
+            )
+        )
+    return reduced
+
+
+def _aggregate(tasks: list[TaskDTO], vehicles: list[VehicleDTO]) -> Aggregated:
+    if not config.SOLVER_AGGREGATE:
+        return Aggregated(tasks, {})
+    grouped = aggregate(tasks, vehicles)
+    if grouped.members:
+        logger.info(
+            json.dumps(
+                {
+                    "event": "tasks_aggregated",
+                    "tasks": len(tasks),
+                    "stops": len(grouped.tasks),
+                }
+            )
+        )
+    return grouped
+
+
+def _add_dropped(plan: PlanResultDTO, dropped: dict[str, str]) -> None:
+    """List tasks dropped by presolve as unscheduled in ``plan``."""
+
+    if dropped:
+        plan.unscheduled = sorted({*plan.unscheduled, *dropped})
+
+
+async def solve(
+    stops: list[TaskDTO],
+    vehicles: list[VehicleDTO],
+    job_id: str | None = None,
+    initial_routes: dict[str, list[str]] | None = None,
+    time_limit_seconds: float | None = None,
+    heuristic: bool = False,
+    publish_progress: bool = True,
+) -> PlanResultDTO:
+    """Run the configured solver in the worker pool without blocking the loop.
+
+    Tasks no vehicle can serve are left unscheduled (``SOLVER_PRESOLVE``)
+    and co-located tasks are solved as one stop (``SOLVER_AGGREGATE``).
+    Large days and days with several offices are split into partitions
+    solved in parallel; a day solved whole publishes each improving
+    OR-Tools solution unless ``publish_progress`` is False.
+
+    ``initial_routes`` and ``time_limit_seconds`` only apply to OR-Tools.
+    ``heuristic`` uses the quick heuristic even when OR-Tools is available.
+    """
+
+    synced = await asyncio.to_thread(_sync_matrix, stops)
+    reduced = _presolve(stops, vehicles)
+    grouped = _aggregate(reduced.tasks, vehicles)
+    tasks = grouped.tasks
+    if initial_routes is not None and grouped.members:
+        initial_routes = merged_routes(initial_routes, grouped.members)
+    offices = {v.office for v in vehicles}
+    if (config.USE_MULTI_DEPOT and len(offices) > 1) or (
+        config.SOLVER_DECOMPOSE != "off"
+        and len(tasks) >= config.SOLVER_DECOMPOSE_MIN_TASKS
+    ):
+        plan = await _solve_decomposed(
+            tasks, vehicles, job_id, initial_routes, time_limit_seconds, heuristic
+        )
     else:
-        depot = Coord(lat=config.DEPOT_LAT, lon=config.DEPOT_LON)
-        plan = solve_plan(depot, stops, vehicles)
-    runtime_ms = int((time.time() - start_time) * 1000)
-    if _METRIC_RUNS:
-        _METRIC_RUNS.inc()
-    if _METRIC_RUNTIME:
-        _METRIC_RUNTIME.observe(runtime_ms)
-    global _latest_plan, _latest_metrics
-    _latest_plan = plan
+        publisher = None
+        if publish_progress:
+            publisher = _ProgressPublisher(stops, reduced.dropped, grouped.members)
+        try:
+            plan = await _solve_single(
+                tasks,
+                vehicles,
+                job_id,
+                initial_routes,
+                time_limit_seconds,
+                publisher,
+                heuristic,
+                portfolio=True,
+            )
+        finally:
+            if publisher is not None:
+                publisher.done = True
+    expand_plan(plan, grouped.members)
+    _add_dropped(plan, reduced.dropped)
+    if config.SOLVER_PRESOLVE:
+        plan.stats["presolve_dropped"] = len(reduced.dropped)
+        plan.stats["presolve_tightened"] = reduced.tightened
+        for reason in sorted(set(reduced.dropped.values())):
+            count = sum(1 for r in reduced.dropped.values() if r == reason)
+            plan.stats[f"presolve_{reason}"] = count
+    if config.SOLVER_AGGREGATE:
+        plan.stats["aggregated_stops"] = len(grouped.members)
+        plan.stats["aggregated_tasks"] = sum(len(g) for g in grouped.members.values())
+    if synced is not None:
+        plan.stats["matrix_locations_kept"] = synced.kept
+        plan.stats["matrix_locations_added"] = synced.added
+        plan.stats["matrix_cache_hits"] = synced.hits
+        plan.stats["matrix_cache_misses"] = synced.misses
+    return plan
+
+
+def _warm_start_routes(
+    plan: PlanResultDTO, stops: list[TaskDTO]
+) -> dict[str, list[str]]:
+    """Previous routes restricted to tasks that still exist unchanged."""
+
+    current = {t.id: t for t in stops}
+    return {
+        vp.vehicle_id: [
+            tid
+            for tid in vp.tasks_order
+            if tid in current and _latest_tasks.get(tid) == current[tid]
+        ]
+        for vp in plan.vehicle_plans
+    }
+
+
+def _seed(stops: list[TaskDTO], vehicles: list[VehicleDTO]) -> Seed | None:
+    """Routes of the last plan on today's weekday, mapped onto ``stops``.
+
+    Seeding only speeds up the search, so a history that cannot be read
+    leaves the solve unseeded.
+    """
+
+    if not config.PLAN_SEED or not _HAS_ORTOOLS:
+        return None
+    weekday = horizon_date().weekday()
+    try:
+        found = get_weekday_plan(weekday)
+    except (RuntimeError, sqlite3.Error) as exc:
+        logger.info(json.dumps({"event": "plan_seed_failed", "error": repr(exc)}))
+        return None
+    if found is None:
+        return None
+    seed = seed_routes(found[0], found[1], stops, vehicles)
+    logger.info(
+        json.dumps({"event": "plan_seeded", "weekday": weekday, "tasks": seed.seeded})
+    )
+    return seed if seed.seeded else None
+
+
+def cancel_solve(job_id: str) -> bool:
+    return _solver_pool.cancel(job_id)
+
+
+def persist_matrix_cache() -> None:
+    """Save the matrix cache to ``MATRIX_CACHE_DIR`` if it gained locations.
+
+    Runs after full solves and on shutdown, never on the insertion path, as
+    it rewrites the whole file. A failed write only leaves the next start
+    with fewer cached locations.
+    """
+
+    try:
+        saved = _with_matrix_lock(save_matrix_cache)
+    except OSError as exc:
+        logger.error(
+            json.dumps({"event": "matrix_cache_save_failed", "error": repr(exc)})
+        )
+        return
+    if saved:
+        logger.info(json.dumps({"event": "matrix_cache_saved"}))
+
+
+def shutdown_solver_pool() -> None:
+    _solver_pool.shutdown()
+
+
+def _plan_metrics(
+    plan: PlanResultDTO, tasks_total: int, runtime_ms: int
+) -> dict[str, float | int | str]:
     tasks_scheduled = sum(len(v.tasks_order) for v in plan.vehicle_plans)
     total_minutes = sum(v.total_minutes for v in plan.vehicle_plans)
     total_km = sum(v.total_km for v in plan.vehicle_plans)
-    _latest_metrics = {
-        "tasks_total": len(stops),
+    return {
+        **plan.stats,
+        "tasks_total": tasks_total,
         "tasks_scheduled": tasks_scheduled,
         "tasks_unscheduled": len(plan.unscheduled),
         "total_minutes": total_minutes,
         "total_km": total_km,
         "runtime_ms": runtime_ms,
     }
+
+
+def _record_plan(
+    plan: PlanResultDTO,
+    stops: list[TaskDTO],
+    vehicles: list[VehicleDTO],
+    runtime_ms: int,
+) -> None:
+    """Make a fully solved plan the latest one and reset insertion drift."""
+
+    global _latest_plan, _latest_metrics, _latest_tasks, _latest_vehicles
+    global _drift_minutes
+    if _METRIC_RUNS:
+        _METRIC_RUNS.inc()
+    if _METRIC_RUNTIME:
+        _METRIC_RUNTIME.observe(runtime_ms)
+    _latest_plan = plan
+    _latest_tasks = {t.id: t for t in stops}
+    _latest_vehicles = vehicles
+    _drift_minutes = 0
+    _latest_metrics = _plan_metrics(plan, len(stops), runtime_ms)
     if plan.unscheduled:
         logger.info(
             json.dumps({"event": "tasks_unassigned", "count": len(plan.unscheduled)})
@@ -88,7 +703,47 @@ async def build_today_plan() -> PlanResultDTO:
             }
         )
     )
-    save_plan(plan)
+
+
+async def build_today_plan() -> PlanResultDTO:
+    """Plan today's stops and make the result the latest plan.
+
+    With ``PLAN_FAST_FIRST`` the quick heuristic plan is returned, and
+    :func:`_refine` improves it with OR-Tools in the background. Only the
+    OR-Tools solve is seeded from the weekday's plan: the heuristic cannot
+    start from given routes, and the refinement starts from the fast plan,
+    which already routes all of today's tasks.
+    """
+
+    vehicles = await get_vehicles()
+    await get_crews()
+    stops = await get_today_stops()
+    logger.info(
+        json.dumps(
+            {"event": "planner_start", "tasks": len(stops), "vehicles": len(vehicles)}
+        )
+    )
+    start_time = time.time()
+    # this plan supersedes whatever is still being solved from older stops
+    _cancel_refinement()
+    cancel_solve("replan")
+    fast_first = config.PLAN_FAST_FIRST and _HAS_ORTOOLS
+    if fast_first:
+        plan = await solve(stops, vehicles, heuristic=True)
+        plan.stats["plan_phase"] = "fast"
+    else:
+        seed = _seed(stops, vehicles)
+        plan = await solve(
+            stops, vehicles, initial_routes=seed.routes if seed else None
+        )
+        if seed is not None:
+            plan.stats["seeded_tasks"] = seed.seeded
+    runtime_ms = int((time.time() - start_time) * 1000)
+    _record_plan(plan, stops, vehicles, runtime_ms)
+    save_plan(plan, stops)
+    await asyncio.to_thread(persist_matrix_cache)
+    if fast_first:
+        _start_refinement(plan, stops, vehicles)
     return plan
 
 
@@ -98,6 +753,81 @@ async def publish_plan(plan: PlanResultDTO) -> None:
         raise ApiError(response.status_code, response.text[:100])
 
 
+def _start_refinement(
+    first: PlanResultDTO, stops: list[TaskDTO], vehicles: list[VehicleDTO]
+) -> None:
+    """Refine ``first`` in the background, replacing any earlier refinement."""
+
+    global _refinement
+    _cancel_refinement()
+    _refinement = asyncio.create_task(_refine(first, stops, vehicles))
+
+
+def _cancel_refinement() -> None:
+    """Stop a running refinement, whose plan would no longer be accepted."""
+
+    if _refinement is not None and not _refinement.done():
+        _refinement.cancel()
+        # free its solver slots now rather than when the task next runs
+        cancel_solve("refine")
+
+
+async def _refine(
+    first: PlanResultDTO, stops: list[TaskDTO], vehicles: list[VehicleDTO]
+) -> None:
+    """Search on from the fast plan ``first`` with OR-Tools.
+
+    The refined plan replaces ``first`` as the latest plan, and is saved and
+    published, when it schedules more tasks or is at least
+    ``PLAN_REFINE_MIN_IMPROVEMENT_PCT`` percent shorter. An insertion, a
+    replan or a new plan cancels it, as ``first`` then stops being the latest
+    plan and the refined one would be dropped.
+    """
+
+    start_time = time.time()
+    routes = {vp.vehicle_id: list(vp.tasks_order) for vp in first.vehicle_plans}
+    try:
+        plan = await solve(
+            stops,
+            vehicles,
+            job_id="refine",
+            initial_routes=routes,
+            publish_progress=False,
+        )
+    except asyncio.CancelledError:
+        raise
+    except Exception as exc:
+        logger.error(json.dumps({"event": "refine_failed", "error": repr(exc)}))
+        return
+    margin = 1 - config.PLAN_REFINE_MIN_IMPROVEMENT_PCT / 100
+    if len(plan.unscheduled) != len(first.unscheduled):
+        improved = len(plan.unscheduled) < len(first.unscheduled)
+    else:
+        improved = plan.objective_minutes < first.objective_minutes * margin
+    accepted = improved and _latest_plan is first
+    logger.info(
+        json.dumps(
+            {
+                "event": "plan_refined",
+                "objective_minutes": plan.objective_minutes,
+                "first_objective_minutes": first.objective_minutes,
+                "accepted": accepted,
+            }
+        )
+    )
+    if not accepted:
+        return
+    plan.stats["plan_phase"] = "refined"
+    runtime_ms = int((time.time() - start_time) * 1000)
+    _record_plan(plan, stops, vehicles, runtime_ms)
+    save_plan(plan, stops)
+    await asyncio.to_thread(persist_matrix_cache)
+    try:
+        await publish_plan(plan)
+    except Exception as exc:
+        logger.error(json.dumps({"event": "refine_publish_failed", "error": repr(exc)}))
+
+
 async def replan_incremental() -> PlanResultDTO:
     vehicles = await get_vehicles()
     stops = await get_today_stops()
@@ -107,53 +837,142 @@ async def replan_incremental() -> PlanResultDTO:
         )
     )
     start_time = time.time()
-    if _HAS_ORTOOLS:
-        if config.USE_MULTI_DEPOT:
-            depots = [Coord(lat=config.DEPOT_LAT, lon=config.DEPOT_LON)]
-        else:
-            depots = [Coord(lat=config.DEPOT_LAT, lon=config.DEPOT_LON)]
-        plan = solve_plan_ortools(depots, stops, vehicles)
-    else:
-        depot = Coord(lat=config.DEPOT_LAT, lon=config.DEPOT_LON)
-        plan = solve_plan(depot, stops, vehicles)
+    _cancel_refinement()
+    initial_routes = None
+    time_limit = None
+    if _latest_plan is not None and _HAS_ORTOOLS:
+        initial_routes = _warm_start_routes(_latest_plan, stops)
+        time_limit = config.REPLAN_TIME_FRACTION * time_budget_seconds(len(stops))
+    plan = await solve(
+        stops,
+        vehicles,
+        job_id="replan",
+        initial_routes=initial_routes,
+        time_limit_seconds=time_limit,
+    )
     runtime_ms = int((time.time() - start_time) * 1000)
-    if _METRIC_RUNS:
-        _METRIC_RUNS.inc()
-    if _METRIC_RUNTIME:
-        _METRIC_RUNTIME.observe(runtime_ms)
-    global _latest_plan, _latest_metrics
-    _latest_plan = plan
-    tasks_scheduled = sum(len(v.tasks_order) for v in plan.vehicle_plans)
-    total_minutes = sum(v.total_minutes for v in plan.vehicle_plans)
-    total_km = sum(v.total_km for v in plan.vehicle_plans)
-    _latest_metrics = {
-        "tasks_total": len(stops),
-        "tasks_scheduled": tasks_scheduled,
-        "tasks_unscheduled": len(plan.unscheduled),
-        "total_minutes": total_minutes,
-        "total_km": total_km,
-        "runtime_ms": runtime_ms,
-    }
-    if plan.unscheduled:
-        logger.info(
-            json.dumps({"event": "tasks_unassigned", "count": len(plan.unscheduled)})
+    _record_plan(plan, stops, vehicles, runtime_ms)
+    save_plan(plan, stops)
+    await asyncio.to_thread(persist_matrix_cache)
+    return plan
+
+
+class ReplanCoordinator:
+    """Single-flight, debounced runs of :func:`replan_incremental`.
+
+    The first request opens a ``debounce_seconds`` window; requests arriving
+    in that window or while the replan runs are folded into at most one
+    follow-up run. ``request`` never blocks. A replan cancelled because a new
+    full plan superseded it does not stop the coordinator.
+    """
+
+    def __init__(self, debounce_seconds: float) -> None:
+        self.debounce_seconds = debounce_seconds
+        self._pending = False
+        self._replanning = False
+        self._task: asyncio.Task[None] | None = None
+
+    def request(self) -> None:
+        self._pending = True
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def replanning(self) -> bool:
+        """Whether a replan is past fetching its stops and still solving."""
+
+        return self._replanning
+
+    async def _run(self) -> None:
+        while self._pending:
+            await asyncio.sleep(self.debounce_seconds)
+            self._pending = False
+            self._replanning = True
+            try:
+                await replan_incremental()
+            except asyncio.CancelledError:
+                # cancel_solve stopped a replan that a full plan superseded
+                task = asyncio.current_task()
+                if task is not None and task.cancelling():
+                    raise
+                logger.info(json.dumps({"event": "replan_superseded"}))
+            except Exception as exc:
+                logger.error(json.dumps({"event": "replan_failed", "error": repr(exc)}))
+            finally:
+                self._replanning = False
+
+
+_replan_coordinator = ReplanCoordinator(config.REPLAN_DEBOUNCE_SECONDS)
+
+
+def request_replan() -> None:
+    """Schedule a coalesced background replan and return immediately."""
+
+    _replan_coordinator.request()
+
+
+async def insert_new_task(task: TaskDTO) -> bool:
+    """Insert a single new task into the latest plan without a full solve.
+
+    Returns False and schedules a background replan when there is no plan to
+    insert into or no feasible position exists. A replan is also scheduled,
+    after inserting, once the minutes added by insertions since the last full
+    solve exceed ``PLAN_DRIFT_THRESHOLD`` of that solve's objective, or
+    when a running replan will replace the plan with one that lacks the task.
+    """
+
+    global _latest_plan, _latest_metrics, _drift_minutes
+    start_time = time.perf_counter()
+    while True:
+        base = _latest_plan
+        if base is None or task.id in _latest_tasks:
+            request_replan()
+            return False
+        plan = await asyncio.to_thread(
+            _with_matrix_lock,
+            insert_task,
+            base,
+            task,
+            _latest_tasks,
+            _latest_vehicles,
+            _HAS_ORTOOLS,
+            _vehicle_depots(_latest_vehicles),
         )
+        # another insertion or a replan may have landed meanwhile
+        if _latest_plan is base:
+            break
+    runtime_ms = int((time.perf_counter() - start_time) * 1000)
+    if plan is None:
+        logger.info(json.dumps({"event": "insertion_failed", "task": task.id}))
+        request_replan()
+        return False
+    base_objective = base.objective_minutes - _drift_minutes
+    _drift_minutes += plan.objective_minutes - base.objective_minutes
+    _latest_plan = plan
+    _latest_tasks[task.id] = task
+    _cancel_refinement()
+    # the next replan finds the new stop's distances already in place
+    await asyncio.to_thread(_track_location, task)
+    _latest_metrics = _plan_metrics(plan, len(_latest_tasks), runtime_ms)
     logger.info(
         json.dumps(
-            {
-                "event": "planner_end",
-                "runtime_ms": runtime_ms,
-                "objective_minutes": plan.objective_minutes,
-            }
+            {"event": "task_inserted", "task": task.id, "runtime_ms": runtime_ms}
         )
     )
-    save_plan(plan)
-    return plan
+    if _drift_minutes > config.PLAN_DRIFT_THRESHOLD * max(base_objective, 1):
+        logger.info(json.dumps({"event": "plan_drift", "minutes": _drift_minutes}))
+        request_replan()
+    elif _replan_coordinator.replanning():
+        # the running replan fetched its stops before this task existed
+        request_replan()
+    return True
 
 
 def get_latest_plan() -> PlanResultDTO | None:
     return _latest_plan
 
 
-def get_plan_metrics() -> dict[str, float | int] | None:
+def get_plan_metrics() -> dict[str, float | int | str] | None:
     return _latest_metrics
@@ -1,70 +1,208 @@
 from datetime import datetime
-from planner.dtos import Coord, PlanResultDTO, TaskDTO, VehiclePlanDTO
-from api.dtos import VehicleDTO
-from planner.metrics import distance_km, travel_minutes
+from functools import partial
+import math
+from typing import Callable
+
+import numpy as np
+
+from planner.dtos import Coord, PlanResultDTO, VehiclePlanDTO
+from planner.local_search import LocalSearch
+from planner.metrics import TravelMatrices
+from planner.problem import Problem, format_time, travel_matrices
+from planner.spatial import GridIndex
+from planner.speed_profile import SpeedProfile, speed_profile
+from planner.travel import travel_cost_provider
 import config
 
 
-def _parse_time(value: str) -> int:
-    h, m = value.split(":")
-    return int(h) * 60 + int(m)
+class _Legs:
+    """Base km and minutes of legs, the depot being node 0, task ``i`` node ``i + 1``.
+
+    Reads the problem's full matrices when they are given or the day is
+    small enough for local search, and otherwise asks the travel cost
+    provider for single legs as the greedy reaches them, so large days never
+    build an N² matrix.
+    """
+
+    def __init__(self, problem: Problem, full: bool) -> None:
+        self.matrices: TravelMatrices | None = None
+        self._points = np.vstack([problem.depot_coords[:1], problem.task_coords])
+        self._provider = travel_cost_provider()
+        self._legs: dict[tuple[int, int], tuple[float, int]] = {}
+        if full or problem.matrices is not None or problem.matrices_path is not None:
+            matrices = travel_matrices(problem)
+            depots = len(problem.depots)
+            if depots > 1:
+                keep = [0, *range(depots, depots + len(problem.task_ids))]
+                nodes = np.ix_(keep, keep)
+                matrices = matrices._replace(
+                    km=matrices.km[nodes], minutes=matrices.minutes[nodes]
+                )
+            self.matrices = matrices
+
+    def __call__(self, a: int, b: int) -> tuple[float, int]:
+        if self.matrices is not None:
+            return float(self.matrices.km[a, b]), int(self.matrices.minutes[a, b])
+        leg = self._legs.get((a, b))
+        if leg is None:
+            result = self._provider.matrix(
+                self._points[a : a + 1], self._points[b : b + 1]
+            )
+            leg = self._legs[a, b] = (
+                float(result.km[0, 0]),
+                int(result.minutes[0, 0]),
+            )
+        return leg
+
 
+def _feasible(
+    legs: _Legs,
+    profile: SpeedProfile,
+    demands: list[int],
+    latest: list[float],
+    cap: int,
+    node: int,
+    time: int,
+    i: int,
+) -> bool:
+    if demands[i] > cap:
+        return False
+    if latest[i] == math.inf:
+        return True
+    if time > latest[i]:
+        return False
+    return time + profile.travel(legs(node, i + 1)[1], time) <= latest[i]
 
-def _format_time(minutes: int) -> str:
-    h = minutes // 60
-    m = minutes % 60
-    return f"{h:02d}:{m:02d}"
+
+def _vehicle_plan(
+    vehicle_id: str,
+    route: list[int],
+    problem: Problem,
+    start: int,
+    leg: Callable[[int, int, int], tuple[float, int]],
+) -> VehiclePlanDTO:
+    """Schedule ``route`` (task indices) leaving the depot at ``start``.
+
+    ``leg`` gives the km and minutes between two nodes when leaving at a
+    given minute, the depot being node 0 and task ``i`` node ``i + 1``.
+    """
+
+    time = start
+    node = 0
+    etas: list[str] = []
+    total_dist = 0.0
+    for i in route:
+        km, minutes = leg(node, i + 1, time)
+        arrival = time + minutes
+        if problem.windowed[i] and arrival < problem.windows[i, 0]:
+            arrival = int(problem.windows[i, 0])
+        total_dist += km
+        etas.append(format_time(arrival))
+        time = arrival + int(problem.service[i])
+        node = i + 1
+    return VehiclePlanDTO(
+        vehicle_id=vehicle_id,
+        tasks_order=[problem.task_ids[i] for i in route],
+        eta=etas,
+        total_minutes=time - start,
+        total_km=round(total_dist, 2),
+    )
 
 
 def solve_plan(
-    depot: Coord, tasks: list[TaskDTO], vehicles: list[VehicleDTO]
+    problem: Problem, local_search_seconds: float | None = None
 ) -> PlanResultDTO:
-    start = _parse_time(config.PLANNING_HORIZON_START)
-    remaining = list(tasks)
-    plans: list[VehiclePlanDTO] = []
-    for vehicle in vehicles:
-        cap = vehicle.capacity
-        loc = depot
+    """Greedy nearest-feasible fallback used when OR-Tools is unavailable.
+
+    Vehicles leave from the first depot of ``problem``. Each vehicle in turn
+    drives to the straight-line nearest task that still fits its capacity
+    and can be reached within its window. Pending tasks live in a
+    :class:`GridIndex`, so each pick only looks at nearby tasks. Days of up
+    to ``LOCAL_SEARCH_MAX_TASKS`` tasks are then improved by
+    :class:`LocalSearch` for ``LOCAL_SEARCH_SECONDS``, or
+    ``local_search_seconds`` when given. Windows and ETAs use the travel
+    cost provider's times, scaled by the speed profile for each leg's
+    departure.
+    """
+
+    start = problem.horizon_start
+    profile = speed_profile()
+    depot: Coord = problem.depots[0]
+    n = len(problem.task_ids)
+    coords: list[list[float]] = problem.task_coords.tolist()
+    demands: list[int] = problem.demands.tolist()
+    service: list[int] = problem.service.tolist()
+    earliest: list[int] = problem.windows[:, 0].tolist()
+    # tasks without a window may be reached at any time
+    latest: list[float] = [
+        float(we) if windowed else math.inf
+        for we, windowed in zip(problem.windows[:, 1].tolist(), problem.windowed)
+    ]
+    if local_search_seconds is None:
+        local_search_seconds = config.LOCAL_SEARCH_SECONDS
+    improve = 0 < local_search_seconds and n <= config.LOCAL_SEARCH_MAX_TASKS
+    legs = _Legs(problem, n <= config.LOCAL_SEARCH_MAX_TASKS)
+    index = GridIndex(problem.task_coords)
+    smallest = min(demands, default=0)
+    routes: list[list[int]] = []
+    for cap in problem.capacities.tolist():
+        lat, lon = depot.lat, depot.lon
+        node = 0
         time = start
-        order: list[str] = []
-        etas: list[str] = []
-        total_dist = 0.0
-        idx = 0
-        while idx < len(remaining):
-            task = remaining[idx]
-            if task.size > cap:
-                idx += 1
-                continue
-            travel = travel_minutes(loc, task.location, config.AVERAGE_SPEED_KMPH)
-            arrival = time + travel
-            if task.window:
-                ws = _parse_time(task.window.start)
-                we = _parse_time(task.window.end)
-                if arrival < ws:
-                    arrival = ws
-                if arrival > we:
-                    idx += 1
-                    continue
-            service = task.service_minutes or config.SERVICE_TIME_MINUTES_DEFAULT
-            distance = distance_km(loc, task.location)
-            total_dist += distance
-            cap -= task.size
-            order.append(task.id)
-            etas.append(_format_time(arrival))
-            time = arrival + service
-            loc = task.location
-            remaining.pop(idx)
-        total_minutes = time - start
-        plans.append(
-            VehiclePlanDTO(
-                vehicle_id=vehicle.id,
-                tasks_order=order,
-                eta=etas,
-                total_minutes=total_minutes,
-                total_km=round(total_dist, 2),
-            )
+        route: list[int] = []
+        while cap >= smallest:
+            accept = partial(_feasible, legs, profile, demands, latest, cap, node, time)
+            # candidates are ranked by straight line, checked by travel time
+            i = index.nearest(lat, lon, accept)
+            if i is None:
+                break
+            arrival = time + profile.travel(legs(node, i + 1)[1], time)
+            if latest[i] != math.inf and arrival < earliest[i]:
+                arrival = earliest[i]
+            cap -= demands[i]
+            route.append(i)
+            time = arrival + service[i]
+            lat, lon = coords[i]
+            node = i + 1
+            index.remove(i)
+        routes.append(route)
+
+    stats: dict[str, float | int | str] = {}
+    matrices = legs.matrices
+    if improve and matrices is not None:
+        timed = profile.matrices(matrices)
+        search = LocalSearch(
+            [[i + 1 for i in r] for r in routes],
+            problem.capacities.tolist(),
+            matrices.minutes,
+            [None]
+            + [
+                (earliest[i], int(latest[i])) if latest[i] != math.inf else None
+                for i in range(n)
+            ],
+            [0] + service,
+            [0] + demands,
+            start,
+            timed,
         )
-    unscheduled = sorted(t.id for t in remaining)
+        improved = search.run(local_search_seconds)
+        routes = [[node - 1 for node in r] for r in improved]
+        stats["local_search_moves"] = search.moves
+        stats["matrix_cache_hits"] = matrices.hits
+        stats["matrix_cache_misses"] = matrices.misses
+
+    def leg(a: int, b: int, depart: int) -> tuple[float, int]:
+        km, minutes = legs(a, b)
+        return km, profile.travel(minutes, depart)
+
+    plans = [
+        _vehicle_plan(vehicle_id, r, problem, start, leg)
+        for vehicle_id, r in zip(problem.vehicle_ids, routes)
+    ]
+    scheduled = {i for r in routes for i in r}
+    unscheduled = sorted(
+        task_id for i, task_id in enumerate(problem.task_ids) if i not in scheduled
+    )
     generated = datetime.utcnow().isoformat(timespec="seconds") + "Z"
     objective = sum(p.total_minutes for p in plans)
     return PlanResultDTO(
@@ -73,4 +211,5 @@ def solve_plan(
         vehicle_plans=plans,
         unscheduled=unscheduled,
         objective_minutes=objective,
+        stats=stats,
     )
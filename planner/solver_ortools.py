@@ -1,13 +1,21 @@
 from __future__ import annotations
 
+from collections import deque
 from datetime import datetime
 import json
 import logging
-from typing import List, cast
+import math
+import time
+from typing import Any, Callable, List
 
-from api.dtos import VehicleDTO
-from planner.dtos import Coord, TaskDTO, VehiclePlanDTO, PlanResultDTO
-from planner.metrics import distance_km, travel_minutes
+import numpy as np
+import numpy.typing as npt
+
+from planner.dtos import VehiclePlanDTO, PlanResultDTO
+from planner.metrics import TravelMatrices
+from planner.problem import Problem, format_time, travel_matrices
+from planner.speed_profile import speed_profile
+from planner.worker_pool import cancel_requested, progress_enabled, report_progress
 import config
 
 try:
@@ -18,106 +26,311 @@ except Exception:  # pragma: no cover
 logger = logging.getLogger(__name__)
 
 
-def _parse_time(value: str) -> int:
-    h, m = value.split(":")
-    return int(h) * 60 + int(m)
+def _initial_routes(
+    initial_routes: dict[str, List[str]], problem: Problem, offset: int
+) -> List[List[int]]:
+    """Map vehicle id -> task ids onto per-vehicle node lists for OR-Tools."""
+
+    node_of = {task_id: offset + i for i, task_id in enumerate(problem.task_ids)}
+    seen: set[int] = set()
+    routes: List[List[int]] = []
+    for vehicle_id in problem.vehicle_ids:
+        route: List[int] = []
+        for task_id in initial_routes.get(vehicle_id, []):
+            node = node_of.get(task_id)
+            if node is not None and node not in seen:
+                seen.add(node)
+                route.append(node)
+        routes.append(route)
+    return routes
+
+
+def time_budget_seconds(task_count: int) -> float:
+    """Search time for a day of ``task_count`` tasks.
+
+    Grows by ``SOLVER_SECONDS_PER_TASK`` per task, never below
+    ``SOLVER_MIN_SECONDS`` nor above ``SOLVER_TIMEOUT_SECONDS``.
+    """
+
+    budget = max(config.SOLVER_MIN_SECONDS, task_count * config.SOLVER_SECONDS_PER_TASK)
+    return float(min(budget, config.SOLVER_TIMEOUT_SECONDS))
+
+
+def neighbor_count(task_count: int) -> int:
+    """Successor candidates kept per task, 0 when arc pruning is off.
+
+    Pruning applies from ``SOLVER_NEIGHBORS_MIN_TASKS`` tasks on and keeps at
+    least ``SOLVER_NEIGHBORS`` candidates, more as the day grows.
+    """
+
+    if not 0 < config.SOLVER_NEIGHBORS_MIN_TASKS <= task_count:
+        return 0
+    return max(config.SOLVER_NEIGHBORS, math.ceil(math.sqrt(task_count)))
+
+
+def _nearest_successors(
+    time_matrix: npt.NDArray[np.int64], first: int, k: int
+) -> npt.NDArray[np.int64]:
+    """Nodes of the ``k`` tasks reachable soonest from each task node."""
 
+    travel = time_matrix[first:, first:].copy()
+    np.fill_diagonal(travel, np.iinfo(np.int64).max)
+    nearest = np.argpartition(travel, k - 1, axis=1)[:, :k]
+    return np.asarray(nearest + first, dtype=np.int64)
 
-def _format_time(minutes: int) -> str:
-    h = minutes // 60
-    m = minutes % 60
-    return f"{h:02d}:{m:02d}"
+
+def _departure_minutes(
+    problem: Problem, matrices: TravelMatrices
+) -> npt.NDArray[np.int64]:
+    """Travel minutes out of each node at the speed of its departure hour.
+
+    Transit matrices cannot depend on when a leg starts, so each row takes
+    the speed profile bucket of the earliest time its node is left: the
+    horizon start for depots and the window start for windowed tasks. Tasks
+    without a window may be left at any hour and get the day's average.
+    """
+
+    timed = speed_profile().matrices(matrices)
+    if len(timed.minutes) == 1:
+        return timed.at(problem.horizon_start)
+    minutes = timed.average()
+    depots = len(problem.depots)
+    minutes[:depots] = timed.at(problem.horizon_start)[:depots]
+    slots = np.array([timed.slot(ws) for ws in problem.windows[:, 0].tolist()])
+    for slot, matrix in enumerate(timed.minutes):
+        rows = depots + np.flatnonzero(problem.windowed & (slots == slot))
+        minutes[rows] = matrix[rows]
+    return minutes
 
 
 def solve_plan_ortools(
-    depots: List[Coord], tasks: List[TaskDTO], vehicles: List[VehicleDTO]
+    problem: Problem,
+    initial_routes: dict[str, List[str]] | None = None,
+    time_limit_seconds: float | None = None,
+    first_solution: str | None = None,
+    metaheuristic: str | None = None,
 ) -> PlanResultDTO:
-    horizon_start = _parse_time(config.PLANNING_HORIZON_START)
-    horizon_end = _parse_time(config.PLANNING_HORIZON_END)
-
-    locations: List[Coord] = list(depots) + [t.location for t in tasks]
-    service_times: list[int] = [0] * len(depots) + [
-        t.service_minutes or config.SERVICE_TIME_MINUTES_DEFAULT for t in tasks
-    ]
-    demands: list[int] = [0] * len(depots) + [t.size for t in tasks]
-
-    windows: List[tuple[int, int]] = []
-    for _ in depots:
-        windows.append((horizon_start, horizon_end))
-    for t in tasks:
-        if t.window:
-            ws = _parse_time(t.window.start)
-            we = _parse_time(t.window.end)
-        else:
-            ws, we = horizon_start, horizon_end
-        windows.append((ws, we))
+    """Solve the day with OR-Tools.
+
+    ``initial_routes`` (vehicle id -> task ids) seeds the search with an
+    existing plan; tasks missing from it are left for the search to insert.
+    Large days only let each task be followed by its
+    :func:`neighbor_count` nearest tasks or a route end.
+    ``time_limit_seconds`` overrides :func:`time_budget_seconds`,
+    ``first_solution`` and ``metaheuristic`` override ``SOLVER_FIRST_SOLUTION``
+    and ``SOLVER_METAHEURISTIC``. The search also stops once the best cost
+    improved by less than ``SOLVER_PLATEAU_IMPROVEMENT_PCT`` percent over the
+    last ``SOLVER_PLATEAU_SECONDS``; ``stats["solver_stop_reason"]`` records
+    why it ended.
+    """
+
+    horizon_start = problem.horizon_start
+    horizon_end = problem.horizon_end
+    depots = problem.depots
+    task_ids = problem.task_ids
+    vehicle_count = len(problem.vehicle_ids)
+    node_count = len(depots) + len(task_ids)
+    zeros = np.zeros(len(depots), dtype=np.int64)
+    service = np.concatenate([zeros, problem.service])
+    demands = np.concatenate([zeros, problem.demands]).tolist()
+    windows = np.concatenate(
+        [np.tile([horizon_start, horizon_end], (len(depots), 1)), problem.windows]
+    ).tolist()
 
-    starts = [i % len(depots) for i in range(len(vehicles))]
-    ends = [i % len(depots) for i in range(len(vehicles))]
-    manager = pywrapcp.RoutingIndexManager(len(locations), len(vehicles), starts, ends)
+    # Costs are precomputed once and registered as native transit matrices
+    # so arc evaluations never call back into Python during the search.
+    matrices = travel_matrices(problem)
+    dist_matrix = (matrices.km * 1000).astype(np.int64).tolist()
+    time_array = _departure_minutes(problem, matrices) + service[:, None]
+    time_matrix = time_array.tolist()
+
+    starts = [i % len(depots) for i in range(vehicle_count)]
+    ends = [i % len(depots) for i in range(vehicle_count)]
+    manager = pywrapcp.RoutingIndexManager(node_count, vehicle_count, starts, ends)
     routing = pywrapcp.RoutingModel(manager)
 
-    def distance_callback(from_index: int, to_index: int) -> int:
-        from_node = cast(int, manager.IndexToNode(from_index))
-        to_node = cast(int, manager.IndexToNode(to_index))
-        a = locations[from_node]
-        b = locations[to_node]
-        return int(distance_km(a, b) * 1000)
-
-    dist_cb = routing.RegisterTransitCallback(distance_callback)
-
-    def time_callback(from_index: int, to_index: int) -> int:
-        from_node = cast(int, manager.IndexToNode(from_index))
-        to_node = cast(int, manager.IndexToNode(to_index))
-        a = locations[from_node]
-        b = locations[to_node]
-        travel = travel_minutes(a, b, config.AVERAGE_SPEED_KMPH)
-        service = service_times[from_node]
-        return travel + service
-
-    time_cb = routing.RegisterTransitCallback(time_callback)
+    dist_cb = routing.RegisterTransitMatrix(dist_matrix)
+    time_cb = routing.RegisterTransitMatrix(time_matrix)
     routing.SetArcCostEvaluatorOfAllVehicles(time_cb)
 
-    def demand_callback(index: int) -> int:
-        node = cast(int, manager.IndexToNode(index))
-        return demands[node]
-
-    demand_cb_index = routing.RegisterUnaryTransitCallback(demand_callback)
+    demand_cb_index = routing.RegisterUnaryTransitVector(demands)
     routing.AddDimensionWithVehicleCapacity(
         demand_cb_index,
         0,
-        [v.capacity for v in vehicles],
+        problem.capacities.tolist(),
         True,
         "Capacity",
     )
 
-    routing.AddDimension(time_cb, horizon_end, horizon_end, False, "Time")
+    # Cumuls count minutes from the horizon start: pinning route starts at a
+    # non-zero time makes the first solution an order of magnitude slower.
+    horizon = horizon_end - horizon_start
+    routing.AddDimension(time_cb, horizon, horizon, False, "Time")
     time_dim = routing.GetDimensionOrDie("Time")
     for node, (ws, we) in enumerate(windows):
         index = manager.NodeToIndex(node)
-        time_dim.CumulVar(index).SetRange(ws, we)
-    for vid in range(len(vehicles)):
-        time_dim.CumulVar(routing.Start(vid)).SetRange(horizon_start, horizon_start)
-        time_dim.CumulVar(routing.End(vid)).SetRange(horizon_start, horizon_end)
+        if we < horizon_start:
+            routing.ActiveVar(index).SetValue(0)
+        else:
+            time_dim.CumulVar(index).SetRange(ws - horizon_start, we - horizon_start)
+    for vid in range(vehicle_count):
+        time_dim.CumulVar(routing.Start(vid)).SetRange(0, 0)
+        time_dim.CumulVar(routing.End(vid)).SetRange(0, horizon)
 
     routing.AddDimension(dist_cb, 0, 10**9, True, "Distance")
     dist_dim = routing.GetDimensionOrDie("Distance")
 
     # allow dropping tasks with penalty
-    for node in range(len(depots), len(locations)):
+    for node in range(len(depots), node_count):
         routing.AddDisjunction([manager.NodeToIndex(node)], 10_000)
 
+    neighbors = neighbor_count(len(task_ids))
+    if not 0 < neighbors < len(task_ids) - 1:
+        neighbors = 0
     search_params = pywrapcp.DefaultRoutingSearchParameters()
+    # path-building heuristics strand stops whose candidates are used up, so
+    # pruned models start from an insertion heuristic instead
+    first_solution = first_solution or (
+        config.SOLVER_NEIGHBORS_FIRST_SOLUTION
+        if neighbors
+        else config.SOLVER_FIRST_SOLUTION
+    )
+    metaheuristic = metaheuristic or config.SOLVER_METAHEURISTIC
+    solver_config = f"{first_solution}+{metaheuristic}"
     search_params.first_solution_strategy = getattr(
-        routing_enums_pb2.FirstSolutionStrategy, config.SOLVER_FIRST_SOLUTION
+        routing_enums_pb2.FirstSolutionStrategy, first_solution
     )
     search_params.local_search_metaheuristic = getattr(
-        routing_enums_pb2.LocalSearchMetaheuristic, config.SOLVER_METAHEURISTIC
+        routing_enums_pb2.LocalSearchMetaheuristic, metaheuristic
+    )
+    budget = (
+        time_limit_seconds
+        if time_limit_seconds is not None
+        else time_budget_seconds(len(task_ids))
     )
-    search_params.time_limit.seconds = config.SOLVER_TIMEOUT_SECONDS
+    search_params.time_limit.FromMilliseconds(int(budget * 1000))
+
+    hint = (
+        _initial_routes(initial_routes, problem, len(depots))
+        if initial_routes
+        else None
+    )
+    if neighbors:
+        # a task may stay unvisited (itself), end its route or move to one of
+        # its nearest tasks; warm-start arcs stay allowed so the hint is valid
+        ends = [routing.End(vid) for vid in range(vehicle_count)]
+        kept: dict[int, list[int]] = {}
+        for route in hint or []:
+            for a, b in zip(route, route[1:]):
+                kept.setdefault(a, []).append(manager.NodeToIndex(b))
+        nearest = _nearest_successors(time_array, len(depots), neighbors)
+        for offset, row in enumerate(nearest.tolist()):
+            node = len(depots) + offset
+            for other in row:
+                kept.setdefault(node, []).append(manager.NodeToIndex(other))
+                # arcs are kept both ways so a task can sit between neighbors
+                kept.setdefault(other, []).append(manager.NodeToIndex(node))
+        for node in range(len(depots), node_count):
+            index = manager.NodeToIndex(node)
+            routing.NextVar(index).SetValues([index, *ends, *kept[node]])
+        logger.info(json.dumps({"event": "solver_neighbors", "k": neighbors}))
+
+    def extract(value: Callable[[Any], int]) -> PlanResultDTO:
+        plans: List[VehiclePlanDTO] = []
+        for vid, vehicle_id in enumerate(problem.vehicle_ids):
+            index = routing.Start(vid)
+            order: List[str] = []
+            etas: List[str] = []
+            while not routing.IsEnd(index):
+                node = manager.IndexToNode(index)
+                if node >= len(depots):
+                    order.append(task_ids[node - len(depots)])
+                    eta = horizon_start + value(time_dim.CumulVar(index))
+                    etas.append(format_time(eta))
+                index = value(routing.NextVar(index))
+            end_index = routing.End(vid)
+            route_time = value(time_dim.CumulVar(end_index)) - value(
+                time_dim.CumulVar(routing.Start(vid))
+            )
+            route_km = value(dist_dim.CumulVar(end_index)) / 1000.0
+            plans.append(
+                VehiclePlanDTO(
+                    vehicle_id=vehicle_id,
+                    tasks_order=order,
+                    eta=etas,
+                    total_minutes=int(route_time),
+                    total_km=round(route_km, 2),
+                )
+            )
+
+        unscheduled: List[str] = []
+        for task_idx, task_id in enumerate(task_ids):
+            index = manager.NodeToIndex(len(depots) + task_idx)
+            if value(routing.NextVar(index)) == index:
+                unscheduled.append(task_id)
+        unscheduled.sort()
+
+        objective = sum(p.total_minutes for p in plans)
+        generated = datetime.utcnow().isoformat(timespec="seconds") + "Z"
+        return PlanResultDTO(
+            generated_at=generated,
+            depot=depots[0],
+            vehicle_plans=plans,
+            unscheduled=unscheduled,
+            objective_minutes=objective,
+            stats={"solver_config": solver_config},
+        )
+
+    started = time.monotonic()
+    best_cost: int | None = None
+    stop_reason: str | None = None
+    # (elapsed seconds, best cost so far) at each solution within the window
+    history: deque[tuple[float, int]] = deque()
+    window = config.SOLVER_PLATEAU_SECONDS
+    min_gain = config.SOLVER_PLATEAU_IMPROVEMENT_PCT / 100
+
+    def on_solution() -> None:
+        nonlocal best_cost, stop_reason
+        if cancel_requested():
+            stop_reason = "cancelled"
+            routing.solver().FinishCurrentSearch()
+            return
+        elapsed = time.monotonic() - started
+        cost = int(routing.CostVar().Value())
+        improved = best_cost is None or cost < best_cost
+        best = cost if best_cost is None else min(cost, best_cost)
+        best_cost = best
+        if window > 0:
+            history.append((elapsed, best))
+            # keep the last entry at or before the start of the window
+            while len(history) > 1 and history[1][0] <= elapsed - window:
+                history.popleft()
+            then, cost_then = history[0]
+            if then <= elapsed - window and best >= cost_then * (1 - min_gain):
+                stop_reason = "plateau"
+                routing.solver().FinishCurrentSearch()
+        if not improved or not progress_enabled():
+            return
+        # cumuls may still be ranges mid-search; report their earliest value
+        snapshot = extract(lambda var: int(var.Min()))
+        snapshot.stats["objective"] = cost
+        snapshot.stats["elapsed_ms"] = int(elapsed * 1000)
+        report_progress(snapshot)
+
+    routing.AddAtSolutionCallback(on_solution)
 
     logger.info(json.dumps({"event": "solver_selected", "solver": "ortools"}))
-    solution = routing.SolveWithParameters(search_params)
+    initial = None
+    if hint is not None:
+        routing.CloseModelWithParameters(search_params)
+        initial = routing.ReadAssignmentFromRoutes(hint, True)
+        logger.info(
+            json.dumps({"event": "solver_warm_start", "accepted": initial is not None})
+        )
+    if initial is not None:
+        solution = routing.SolveFromAssignmentWithParameters(initial, search_params)
+    else:
+        solution = routing.SolveWithParameters(search_params)
     if solution is None:
         logger.info(json.dumps({"event": "solver_timeout"}))
         generated = datetime.utcnow().isoformat(timespec="seconds") + "Z"
@@ -125,56 +338,37 @@ def solve_plan_ortools(
             generated_at=generated,
             depot=depots[0],
             vehicle_plans=[],
-            unscheduled=sorted(t.id for t in tasks),
+            unscheduled=sorted(task_ids),
             objective_minutes=0,
+            stats={
+                "solver_config": solver_config,
+                "solver_stop_reason": stop_reason or "no_solution",
+            },
         )
 
-    plans: List[VehiclePlanDTO] = []
-    for vid, vehicle in enumerate(vehicles):
-        index = routing.Start(vid)
-        order: List[str] = []
-        etas: List[str] = []
-        while not routing.IsEnd(index):
-            node = manager.IndexToNode(index)
-            if node >= len(depots):
-                task_idx = node - len(depots)
-                order.append(tasks[task_idx].id)
-                eta = solution.Value(time_dim.CumulVar(index))
-                etas.append(_format_time(eta))
-            index = solution.Value(routing.NextVar(index))
-        end_index = routing.End(vid)
-        route_time = solution.Value(time_dim.CumulVar(end_index)) - solution.Value(
-            time_dim.CumulVar(routing.Start(vid))
-        )
-        route_km = solution.Value(dist_dim.CumulVar(end_index)) / 1000.0
-        plans.append(
-            VehiclePlanDTO(
-                vehicle_id=vehicle.id,
-                tasks_order=order,
-                eta=etas,
-                total_minutes=int(route_time),
-                total_km=round(route_km, 2),
-            )
-        )
-
-    unscheduled: List[str] = []
-    for task_idx, task in enumerate(tasks):
-        node = len(depots) + task_idx
-        index = manager.NodeToIndex(node)
-        if solution.Value(routing.NextVar(index)) == index:
-            unscheduled.append(task.id)
-    unscheduled.sort()
-    if unscheduled:
+    plan = extract(solution.Value)
+    if plan.unscheduled:
         logger.info(
-            json.dumps({"event": "tasks_unassigned", "count": len(unscheduled)})
+            json.dumps({"event": "tasks_unassigned", "count": len(plan.unscheduled)})
+        )
+    elapsed = time.monotonic() - started
+    if stop_reason is None:
+        stop_reason = "time_limit" if elapsed >= 0.99 * budget else "completed"
+    plan.stats["objective"] = solution.ObjectiveValue()
+    plan.stats["elapsed_ms"] = int(elapsed * 1000)
+    plan.stats["time_budget_ms"] = int(budget * 1000)
+    plan.stats["solver_stop_reason"] = stop_reason
+    plan.stats["matrix_cache_hits"] = matrices.hits
+    plan.stats["matrix_cache_misses"] = matrices.misses
+    if neighbors:
+        plan.stats["neighbors"] = neighbors
+    logger.info(
+        json.dumps(
+            {
+                "event": "solver_stopped",
+                "reason": stop_reason,
+                "elapsed_ms": int(elapsed * 1000),
+            }
         )
-
-    objective = sum(p.total_minutes for p in plans)
-    generated = datetime.utcnow().isoformat(timespec="seconds") + "Z"
-    return PlanResultDTO(
-        generated_at=generated,
-        depot=depots[0],
-        vehicle_plans=plans,
-        unscheduled=unscheduled,
-        objective_minutes=objective,
     )
+    return plan
@@ -0,0 +1,119 @@
+"""Uniform grid over task locations for nearest-neighbour queries."""
+
+from __future__ import annotations
+
+import math
+from typing import Callable
+
+import numpy as np
+import numpy.typing as npt
+
+from planner.metrics import EARTH_RADIUS_KM
+
+_KM_PER_DEGREE = EARTH_RADIUS_KM * math.pi / 180
+# target number of points per cell when no cell size is given
+_POINTS_PER_CELL = 2
+
+
+class GridIndex:
+    """Points bucketed into square cells on an equirectangular projection.
+
+    Points are ``[lat, lon]`` rows and are referred to by row index.
+    Removing a point is O(1). :meth:`nearest` scans rings of cells outwards
+    from the query and stops as soon as no unscanned cell can hold a closer
+    point, so a query touches a handful of cells on evenly spread data.
+    """
+
+    def __init__(
+        self, points: npt.NDArray[np.float64], cell_km: float | None = None
+    ) -> None:
+        lat0 = float(points[:, 0].mean()) if len(points) else 0.0
+        self._kx = _KM_PER_DEGREE * math.cos(math.radians(lat0))
+        xs = (points[:, 1] * self._kx).tolist()
+        ys = (points[:, 0] * _KM_PER_DEGREE).tolist()
+        self._xy: list[tuple[float, float]] = list(zip(xs, ys))
+        if cell_km is None:
+            xs = xs or [0.0]
+            ys = ys or [0.0]
+            area = (max(xs) - min(xs)) * (max(ys) - min(ys))
+            cell_km = math.sqrt(area * _POINTS_PER_CELL / max(1, len(points)))
+        self._cell = cell_km if cell_km > 0 else 1.0
+        self._cells: dict[tuple[int, int], set[int]] = {}
+        for i, (x, y) in enumerate(self._xy):
+            self._cells.setdefault(self._key(x, y), set()).add(i)
+        keys = list(self._cells) or [(0, 0)]
+        self._lo = (min(k[0] for k in keys), min(k[1] for k in keys))
+        self._hi = (max(k[0] for k in keys), max(k[1] for k in keys))
+        self._size = len(points)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def project(self, lat: float, lon: float) -> tuple[float, float]:
+        return lon * self._kx, lat * _KM_PER_DEGREE
+
+    def _key(self, x: float, y: float) -> tuple[int, int]:
+        return math.floor(x / self._cell), math.floor(y / self._cell)
+
+    def remove(self, i: int) -> None:
+        key = self._key(*self._xy[i])
+        bucket = self._cells[key]
+        bucket.remove(i)
+        if not bucket:
+            del self._cells[key]
+        self._size -= 1
+
+    def _ring(self, cx: int, cy: int, r: int) -> list[tuple[int, int]]:
+        if r == 0:
+            return [(cx, cy)]
+        side = range(-r, r + 1)
+        keys = [(cx + d, cy - r) for d in side] + [(cx + d, cy + r) for d in side]
+        keys += [(cx - r, cy + d) for d in side[1:-1]]
+        keys += [(cx + r, cy + d) for d in side[1:-1]]
+        return keys
+
+    def nearest(
+        self, lat: float, lon: float, accept: Callable[[int], bool]
+    ) -> int | None:
+        """Closest remaining point to ``(lat, lon)`` for which ``accept`` holds.
+
+        ``accept`` is only called for points closer than the best accepted
+        one so far; ties go to the lowest index.
+        """
+
+        if not self._size:
+            return None
+        x, y = self.project(lat, lon)
+        cx, cy = self._key(x, y)
+        rings = max(
+            cx - self._lo[0], self._hi[0] - cx, cy - self._lo[1], self._hi[1] - cy
+        )
+        best: int | None = None
+        best_d = math.inf
+        for r in range(max(0, rings) + 1):
+            # every point in ring r lies at least (r - 1) cells away
+            if (r - 1) * self._cell > best_d:
+                break
+            # once the scanned square outgrows the occupied cells, visit every
+            # occupied cell outside it at once instead of mostly empty rings
+            rest = (2 * r + 1) ** 2 > len(self._cells)
+            if rest:
+                keys = [
+                    k for k in self._cells if max(abs(k[0] - cx), abs(k[1] - cy)) >= r
+                ]
+            else:
+                keys = self._ring(cx, cy, r)
+            candidates: list[tuple[float, int]] = []
+            for key in keys:
+                for i in self._cells.get(key, ()):
+                    px, py = self._xy[i]
+                    candidates.append((math.hypot(px - x, py - y), i))
+            for d, i in sorted(candidates):
+                if best is not None and (d, i) >= (best_d, best):
+                    break
+                if accept(i):
+                    best, best_d = i, d
+                    break
+            if rest:
+                break
+        return best
@@ -0,0 +1,136 @@
+"""Driving speed by hour of day, with one travel-time matrix per speed."""
+
+from __future__ import annotations
+
+import math
+
+import numpy as np
+import numpy.typing as npt
+
+from planner.metrics import TravelMatrices
+from planner.problem import parse_time
+import config
+
+
+def parse_speed_profile(spec: str, default_kmph: int) -> list[int]:
+    """Speed of each hour of the day from ``"7-9=25,16-19=28"``.
+
+    Each entry sets hours ``[start, end)`` to a speed in km/h; other hours
+    drive at ``default_kmph``.
+    """
+
+    speeds = [default_kmph] * 24
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        try:
+            hours, speed = entry.split("=")
+            first, last = (int(h) for h in hours.split("-"))
+            kmph = int(speed)
+        except ValueError:
+            raise ValueError(f"invalid speed profile entry: {entry!r}") from None
+        if not 0 <= first < last <= 24 or kmph <= 0:
+            raise ValueError(f"invalid speed profile entry: {entry!r}")
+        speeds[first:last] = [kmph] * (last - first)
+    return speeds
+
+
+class SpeedProfile:
+    """Speeds of the hour buckets between ``start`` and ``end`` minutes.
+
+    Travel times are scaled from ones driven at ``base_kmph``. Times outside
+    the horizon use the nearest bucket.
+    """
+
+    def __init__(
+        self, hourly_kmph: list[int], start: int, end: int, base_kmph: int
+    ) -> None:
+        self.start = start
+        self.end = end
+        self.base_kmph = base_kmph
+        first, last = start // 60, max(start // 60 + 1, math.ceil(end / 60))
+        self.speeds = hourly_kmph[first:last]
+        self._first = first
+
+    def bucket(self, minute: int) -> int:
+        """Index into :attr:`speeds` of the hour ``minute`` falls in."""
+
+        return min(max(minute // 60 - self._first, 0), len(self.speeds) - 1)
+
+    def speed_at(self, minute: int) -> int:
+        return self.speeds[self.bucket(minute)]
+
+    def travel(self, minutes: int, depart: int) -> int:
+        """Scale base travel ``minutes`` to a departure at ``depart``."""
+
+        speed = self.speed_at(depart)
+        if speed == self.base_kmph:
+            return minutes
+        return int(minutes * self.base_kmph / speed + 0.5)
+
+    def matrices(self, base: TravelMatrices) -> TimedMatrices:
+        return TimedMatrices(base, self)
+
+
+class TimedMatrices:
+    """Travel minutes per distinct bucket speed, picked by departure time.
+
+    ``minutes`` stacks one matrix per distinct speed of the profile, all
+    computed up front; :meth:`at` finds the one for a departure minute
+    through a lookup table, so nothing is computed per leg. ``km`` does not
+    depend on the time of day.
+    """
+
+    def __init__(self, base: TravelMatrices, profile: SpeedProfile) -> None:
+        self.km = base.km
+        self.profile = profile
+        distinct = sorted(set(profile.speeds))
+        stack = []
+        for speed in distinct:
+            if speed == profile.base_kmph:
+                stack.append(base.minutes)
+            else:
+                scaled = base.minutes * (profile.base_kmph / speed) + 0.5
+                stack.append(np.floor(scaled).astype(np.int64))
+        self.minutes: npt.NDArray[np.int64] = (
+            np.stack(stack) if len(stack) > 1 else stack[0][None]
+        )
+        self._slot = [distinct.index(s) for s in profile.speeds]
+
+    def slot(self, minute: int) -> int:
+        """Index into :attr:`minutes` for a departure at ``minute``."""
+
+        return self._slot[self.profile.bucket(minute)]
+
+    def at(self, minute: int) -> npt.NDArray[np.int64]:
+        return np.asarray(self.minutes[self.slot(minute)], dtype=np.int64)
+
+    def average(self) -> npt.NDArray[np.int64]:
+        """Each leg's time averaged over the hours of the horizon."""
+
+        counts = np.bincount(self._slot, minlength=len(self.minutes))
+        total = np.tensordot(counts, self.minutes, axes=1)
+        return np.floor(total / len(self._slot) + 0.5).astype(np.int64)
+
+    def fastest(self) -> npt.NDArray[np.int64]:
+        """Shortest time of each leg over the horizon."""
+
+        return np.asarray(self.minutes.min(axis=0), dtype=np.int64)
+
+    def slowest(self) -> npt.NDArray[np.int64]:
+        """Longest time of each leg over the horizon."""
+
+        return np.asarray(self.minutes.max(axis=0), dtype=np.int64)
+
+
+def speed_profile() -> SpeedProfile:
+    """The profile set by ``SPEED_PROFILE`` over the planning horizon.
+
+    Without one every bucket drives at ``AVERAGE_SPEED_KMPH``.
+    """
+
+    base = config.AVERAGE_SPEED_KMPH
+    return SpeedProfile(
+        parse_speed_profile(config.SPEED_PROFILE, base),
+        parse_time(config.PLANNING_HORIZON_START),
+        parse_time(config.PLANNING_HORIZON_END),
+        base,
+    )
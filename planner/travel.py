@@ -0,0 +1,658 @@
+"""Travel costs between locations, straight-line or over a road graph."""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+import hashlib
+import heapq
+import json
+import logging
+import math
+import os
+from pathlib import Path
+from typing import Protocol
+
+import numpy as np
+import numpy.typing as npt
+
+from planner.metrics import (
+    TravelMatrices,
+    distance_matrix_km,
+    minutes_matrix,
+    paired_distance_km,
+    quantize,
+)
+from planner.spatial import GridIndex
+import config
+
+try:  # optional scipy for fast many-to-many shortest paths
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import dijkstra
+
+    _HAS_SCIPY = True
+except Exception:  # pragma: no cover
+    _HAS_SCIPY = False
+
+logger = logging.getLogger(__name__)
+
+# origins searched per scipy call, bounding the (origins, nodes) work arrays
+_SOURCE_BATCH = 64
+
+
+class TravelCostProvider(Protocol):
+    """Kilometres and whole minutes from each origin to each destination."""
+
+    # identifies the costs, so matrices built under another key are stale
+    key: str
+    # whether going from a to b always costs the same as from b to a
+    symmetric: bool
+
+    def matrix(
+        self,
+        origins: npt.NDArray[np.float64],
+        destinations: npt.NDArray[np.float64],
+    ) -> TravelMatrices: ...
+
+
+class HaversineProvider:
+    """Straight-line kilometres driven at a constant ``speed_kmph``."""
+
+    symmetric = True
+
+    def __init__(self, speed_kmph: int) -> None:
+        self.speed_kmph = speed_kmph
+        self.key = f"haversine:{speed_kmph}"
+
+    def matrix(
+        self,
+        origins: npt.NDArray[np.float64],
+        destinations: npt.NDArray[np.float64],
+    ) -> TravelMatrices:
+        km = distance_matrix_km(origins, destinations)
+        return TravelMatrices(km=km, minutes=minutes_matrix(km, self.speed_kmph))
+
+
+def _accept_any(i: int) -> bool:
+    return True
+
+
+class RoadGraphProvider:
+    """Fastest paths over a preprocessed directed road graph.
+
+    The graph file is an ``.npz`` archive with ``coords`` (node ``[lat, lon]``
+    rows) and, per edge, ``tails``, ``heads``, ``meters`` and ``seconds``.
+    Points are snapped to their nearest node and the straight line to it is
+    driven at ``access_speed_kmph``; pairs the graph does not connect fall
+    back to that straight line too. A query runs one Dijkstra per distinct
+    origin node: scipy's when installed, bounded to a travel time that
+    doubles until every destination node is reached, otherwise a heap search
+    that stops once every destination node is settled. Kilometres follow the
+    fastest path.
+    """
+
+    symmetric = False
+
+    def __init__(self, path: Path, access_speed_kmph: int) -> None:
+        self.path = path
+        digest = hashlib.sha1(path.read_bytes()).hexdigest()[:12]
+        self.key = f"road_graph:{digest}:{access_speed_kmph}"
+        self.access_speed_kmph = access_speed_kmph
+        with np.load(path) as data:
+            self.coords = np.asarray(data["coords"], dtype=np.float64)
+            tails = np.asarray(data["tails"], dtype=np.int64)
+            heads = np.asarray(data["heads"], dtype=np.int64)
+            meters = np.asarray(data["meters"], dtype=np.float64)
+            seconds = np.asarray(data["seconds"], dtype=np.float64)
+        n = len(self.coords)
+        # sort by tail, head, then time and keep the fastest parallel edge
+        order = np.lexsort((seconds, heads, tails))
+        tails, heads = tails[order], heads[order]
+        first = np.ones(len(order), dtype=np.bool_)
+        first[1:] = (tails[1:] != tails[:-1]) | (heads[1:] != heads[:-1])
+        self._tails, self._heads = tails[first], heads[first]
+        self._meters = meters[order][first]
+        # zero weights would read as missing edges in a sparse matrix
+        self._seconds = np.maximum(seconds[order][first], 1e-3)
+        self._indptr = np.searchsorted(self._tails, np.arange(n + 1))
+        # the same edges by head, for searches towards a node
+        by_head = np.lexsort((self._tails, self._heads))
+        self._rev_tails = self._tails[by_head]
+        self._rev_seconds = self._seconds[by_head]
+        self._rev_meters = self._meters[by_head]
+        self._rev_indptr = np.searchsorted(self._heads[by_head], np.arange(n + 1))
+        # no fastest path takes longer than every edge driven once
+        self._max_seconds = float(self._seconds.sum())
+        speeds = self._meters / self._seconds
+        self._mps = max(float(np.median(speeds)), 1.0) if len(speeds) else 1.0
+        self._index = GridIndex(self.coords)
+        self._graph = (
+            csr_matrix((self._seconds, self._heads, self._indptr), shape=(n, n))
+            if _HAS_SCIPY
+            else None
+        )
+        self._reverse_graph = self._graph.T.tocsr() if self._graph is not None else None
+        if self._graph is None:
+            # the heap search is some ten times slower on city-sized graphs
+            logger.warning(json.dumps({"event": "road_graph_without_scipy"}))
+
+    def _snap(
+        self, points: npt.NDArray[np.float64]
+    ) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.float64]]:
+        """Nearest node of each point and the kilometres to reach it."""
+
+        nodes = np.array(
+            [
+                self._index.nearest(lat, lon, _accept_any)
+                for lat, lon in points.tolist()
+            ],
+            dtype=np.int64,
+        )
+        return nodes, paired_distance_km(points, self.coords[nodes])
+
+    def _path_meters(
+        self,
+        pred: npt.NDArray[np.int32],
+        targets: npt.NDArray[np.int64],
+        reverse: bool,
+    ) -> npt.NDArray[np.float64]:
+        """Meters along each predecessor tree from its root to ``targets``.
+
+        Every path is walked back from its target an edge per step, over the
+        paths not yet at their root only, so the work follows the length of
+        the paths asked for rather than the size of the trees. Trees of a
+        ``reverse`` search follow edges from node to parent.
+        """
+
+        if reverse:
+            indptr, heads, meters = self._rev_indptr, self._rev_tails, self._rev_meters
+        else:
+            indptr, heads, meters = self._indptr, self._heads, self._meters
+        rows = np.repeat(np.arange(len(pred)), len(targets))
+        node = np.tile(targets, len(pred))
+        total = np.zeros(len(node))
+        active = np.arange(len(node))
+        while len(active):
+            parent = pred[rows[active], node[active]].astype(np.int64)
+            walking = parent >= 0
+            active, parent = active[walking], parent[walking]
+            child = node[active]
+            # scan the parent's few edges for the one to the child
+            edge = indptr[parent]
+            off = np.flatnonzero(heads[edge] != child)
+            while len(off):
+                edge[off] += 1
+                off = off[heads[edge[off]] != child[off]]
+            total[active] += meters[edge]
+            node[active] = parent
+        return total.reshape(len(pred), len(targets))
+
+    def _dijkstra(
+        self, source: int, targets: set[int], reverse: bool
+    ) -> dict[int, tuple[float, float]]:
+        """(seconds, meters) of the fastest path from ``source`` to settled nodes.
+
+        A ``reverse`` search finds the fastest paths to ``source`` instead.
+        """
+
+        if reverse:
+            indptr, heads = self._rev_indptr, self._rev_tails
+            seconds, meters = self._rev_seconds, self._rev_meters
+        else:
+            indptr, heads = self._indptr, self._heads
+            seconds, meters = self._seconds, self._meters
+        settled: dict[int, tuple[float, float]] = {}
+        best = {source: 0.0}
+        heap = [(0.0, 0.0, source)]
+        remaining = len(targets)
+        while heap and remaining:
+            secs, dist, u = heapq.heappop(heap)
+            if u in settled:
+                continue
+            settled[u] = (secs, dist)
+            if u in targets:
+                remaining -= 1
+            for e in range(indptr[u], indptr[u + 1]):
+                v = int(heads[e])
+                candidate = secs + seconds[e]
+                if v not in settled and candidate < best.get(v, math.inf):
+                    best[v] = candidate
+                    heapq.heappush(heap, (candidate, dist + meters[e], v))
+        return settled
+
+    def _bounded_dijkstra(
+        self,
+        sources: npt.NDArray[np.int64],
+        targets: npt.NDArray[np.int64],
+        reverse: bool,
+    ) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.int32]]:
+        """scipy's Dijkstra from ``sources``, stopped past the farthest target.
+
+        The time limit starts at the straight line to the farthest target at
+        the graph's median speed and doubles until every target is reached
+        or no path can be longer, so a query over a small area only searches
+        that area of a large graph.
+        """
+
+        graph = self._reverse_graph if reverse else self._graph
+        straight = distance_matrix_km(self.coords[sources], self.coords[targets])
+        limit = max(float(straight.max(initial=0.0)) * 1000 / self._mps, 60.0)
+        while True:
+            bounded = limit < self._max_seconds
+            dist, pred = dijkstra(
+                graph,
+                indices=sources,
+                return_predecessors=True,
+                limit=limit if bounded else np.inf,
+            )
+            if not bounded or np.isfinite(dist[:, targets]).all():
+                return dist, pred
+            limit *= 2
+
+    def _paths(
+        self,
+        sources: npt.NDArray[np.int64],
+        targets: npt.NDArray[np.int64],
+        reverse: bool = False,
+    ) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+        """Seconds and meters from each source node to each target node.
+
+        With ``reverse`` they are from each target node to each source node,
+        still indexed source first, so one search per source covers both
+        directions.
+        """
+
+        secs = np.full((len(sources), len(targets)), np.inf)
+        meters = np.zeros((len(sources), len(targets)))
+        if self._graph is not None:
+            for first in range(0, len(sources), _SOURCE_BATCH):
+                batch = sources[first : first + _SOURCE_BATCH]
+                dist, pred = self._bounded_dijkstra(batch, targets, reverse)
+                rows = slice(first, first + len(batch))
+                secs[rows] = dist[:, targets]
+                meters[rows] = self._path_meters(pred, targets, reverse)
+            return secs, meters
+        wanted = set(targets.tolist())
+        for i, source in enumerate(sources.tolist()):
+            settled = self._dijkstra(source, wanted, reverse)
+            for j, target in enumerate(targets.tolist()):
+                if target in settled:
+                    secs[i, j], meters[i, j] = settled[target]
+        return secs, meters
+
+    def matrix(
+        self,
+        origins: npt.NDArray[np.float64],
+        destinations: npt.NDArray[np.float64],
+    ) -> TravelMatrices:
+        return self._matrices(origins, destinations, (False,))[0]
+
+    def round_trip(
+        self,
+        origins: npt.NDArray[np.float64],
+        destinations: npt.NDArray[np.float64],
+    ) -> tuple[TravelMatrices, TravelMatrices]:
+        """Costs from ``origins`` to ``destinations`` and back, transposed.
+
+        Both directions search from the origins only, the way back over the
+        reversed graph, so few origins against many destinations stay cheap.
+        """
+
+        forward, back = self._matrices(origins, destinations, (False, True))
+        return forward, back
+
+    def _matrices(
+        self,
+        origins: npt.NDArray[np.float64],
+        destinations: npt.NDArray[np.float64],
+        directions: tuple[bool, ...],
+    ) -> list[TravelMatrices]:
+        from_nodes, from_km = self._snap(origins)
+        to_nodes, to_km = self._snap(destinations)
+        sources, source_of = np.unique(from_nodes, return_inverse=True)
+        targets, target_of = np.unique(to_nodes, return_inverse=True)
+        access_km = from_km[:, None] + to_km[None, :]
+        straight = distance_matrix_km(origins, destinations)
+        same = (origins[:, None, :] == destinations[None, :, :]).all(axis=2)
+        return [
+            self._costs(
+                *self._paths(sources, targets, reverse),
+                np.ix_(source_of, target_of),
+                access_km,
+                straight,
+                same,
+            )
+            for reverse in directions
+        ]
+
+    def _costs(
+        self,
+        secs: npt.NDArray[np.float64],
+        meters: npt.NDArray[np.float64],
+        index: tuple[npt.NDArray[np.intp], ...],
+        access_km: npt.NDArray[np.float64],
+        straight: npt.NDArray[np.float64],
+        same: npt.NDArray[np.bool_],
+    ) -> TravelMatrices:
+        """Matrices of point pairs from the paths between their nodes."""
+
+        secs = secs[index]
+        meters = meters[index]
+        km = meters / 1000 + access_km
+        minutes = secs / 60 + access_km / self.access_speed_kmph * 60
+        unreachable = ~np.isfinite(secs)
+        if unreachable.any():
+            km[unreachable] = straight[unreachable]
+            minutes[unreachable] = straight[unreachable] / self.access_speed_kmph * 60
+            logger.info(
+                json.dumps(
+                    {"event": "road_graph_unreachable", "pairs": int(unreachable.sum())}
+                )
+            )
+        km[same] = 0.0
+        minutes[same] = 0.0
+        return TravelMatrices(km=km, minutes=np.floor(minutes + 0.5).astype(np.int64))
+
+
+_provider: TravelCostProvider | None = None
+
+
+def travel_cost_provider() -> TravelCostProvider:
+    """This process's provider as set by ``TRAVEL_COST_PROVIDER``."""
+
+    global _provider
+    if config.TRAVEL_COST_PROVIDER == "road_graph":
+        path = Path(config.ROAD_GRAPH_PATH)
+        speed = config.AVERAGE_SPEED_KMPH
+        # loading hashes the whole file, so only reload when the settings change
+        if (
+            not isinstance(_provider, RoadGraphProvider)
+            or _provider.path != path
+            or _provider.access_speed_kmph != speed
+        ):
+            _provider = RoadGraphProvider(path, speed)
+        return _provider
+    if _provider is None or _provider.key != f"haversine:{config.AVERAGE_SPEED_KMPH}":
+        _provider = HaversineProvider(config.AVERAGE_SPEED_KMPH)
+    return _provider
+
+
+def provider_matrices(
+    provider: TravelCostProvider,
+    origins: npt.NDArray[np.float64],
+    destinations: npt.NDArray[np.float64],
+) -> tuple[TravelMatrices, TravelMatrices]:
+    """Costs from ``origins`` to ``destinations`` and back, transposed.
+
+    The second matrix is indexed like the first, so both directions can be
+    written into the same rows of a square matrix.
+    """
+
+    if isinstance(provider, RoadGraphProvider):
+        return provider.round_trip(origins, destinations)
+    forward = provider.matrix(origins, destinations)
+    if provider.symmetric:
+        return forward, forward
+    back = provider.matrix(destinations, origins)
+    return forward, TravelMatrices(km=back.km.T, minutes=back.minutes.T)
+
+
+class MatrixCache:
+    """Travel costs between recurring locations, evicting the least recently used.
+
+    A location is its lat/lon rounded to ``precision`` decimals and costs are
+    taken between the rounded points. Every pair of cached locations is
+    known, so a lookup only computes the rows and columns of locations it has
+    not seen. The tables grow with the locations held, up to ``capacity``.
+    With a ``directory`` the cache is loaded from there on start and
+    :meth:`save` writes it back; the file holds one row per location, oldest
+    first: its two key columns, its kilometres, then its minutes to every
+    location.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        precision: int,
+        provider: TravelCostProvider,
+        directory: Path | None = None,
+    ) -> None:
+        self.capacity = capacity
+        self.precision = precision
+        self.provider = provider
+        # the cache stands in for its provider, see matrix()
+        self.key = provider.key
+        self.symmetric = provider.symmetric
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        # locations added since the cache was loaded or last saved
+        self.unsaved = 0
+        self._slots: OrderedDict[tuple[int, int], int] = OrderedDict()
+        self._free = list(range(capacity - 1, -1, -1))
+        self._coords = np.zeros((0, 2), dtype=np.float64)
+        self._km = np.zeros((0, 0), dtype=np.float64)
+        self._minutes = np.zeros((0, 0), dtype=np.int64)
+        if directory is not None:
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    @property
+    def path(self) -> Path | None:
+        if self.directory is None:
+            return None
+        digest = hashlib.sha1(self.provider.key.encode()).hexdigest()[:8]
+        return self.directory / f"matrix_cache_p{self.precision}_{digest}.npy"
+
+    def _keys(self, points: npt.NDArray[np.float64]) -> list[tuple[int, int]]:
+        return [(a, b) for a, b in quantize(points, self.precision).tolist()]
+
+    def _reserve(self, size: int) -> None:
+        """Grow the tables to at least ``size`` slots, doubling their size."""
+
+        have = len(self._coords)
+        if size <= have:
+            return
+        size = min(self.capacity, max(size, 2 * have, 64))
+        coords = np.zeros((size, 2), dtype=np.float64)
+        km = np.zeros((size, size), dtype=np.float64)
+        minutes = np.zeros((size, size), dtype=np.int64)
+        coords[:have] = self._coords
+        km[:have, :have] = self._km
+        minutes[:have, :have] = self._minutes
+        self._coords, self._km, self._minutes = coords, km, minutes
+
+    def _add(self, keys: list[tuple[int, int]]) -> list[int]:
+        """Give ``keys`` slots, evicting the oldest entries when full."""
+
+        slots = []
+        for key in keys:
+            if self._free:
+                slot = self._free.pop()
+            else:
+                _, slot = self._slots.popitem(last=False)
+            self._slots[key] = slot
+            slots.append(slot)
+        # free slots are handed out in order, so the tables grow at the end
+        self._reserve(max(slots, default=-1) + 1)
+        self._coords[slots] = np.array(keys, dtype=np.float64) / 10.0**self.precision
+        return slots
+
+    def _lookup(self, keys: list[tuple[int, int]]) -> tuple[int, int]:
+        """Make ``keys`` the newest entries, computing the missing ones.
+
+        Returns the (hits, misses) of the distinct ``keys``, of which there
+        must be no more than the cache holds.
+        """
+
+        distinct = list(dict.fromkeys(keys))
+        new = []
+        for key in distinct:
+            if key in self._slots:
+                self._slots.move_to_end(key)
+            else:
+                new.append(key)
+        if new:
+            # the locations just looked up are the newest, so eviction in
+            # _add never hits one of them
+            slots = self._add(new)
+            occupied = list(self._slots.values())
+            out, back = provider_matrices(
+                self.provider, self._coords[slots], self._coords[occupied]
+            )
+            self._km[np.ix_(slots, occupied)] = out.km
+            self._km[np.ix_(occupied, slots)] = back.km.T
+            self._minutes[np.ix_(slots, occupied)] = out.minutes
+            self._minutes[np.ix_(occupied, slots)] = back.minutes.T
+            self.unsaved += len(new)
+        self.hits += len(distinct) - len(new)
+        self.misses += len(new)
+        return len(distinct) - len(new), len(new)
+
+    def add(self, points: npt.NDArray[np.float64]) -> tuple[int, int]:
+        """Cache ``[lat, lon]`` rows without building their matrices.
+
+        Returns the (hits, misses) of the lookup, counting distinct
+        locations. Lookups with more distinct locations than the cache holds
+        are not cached.
+        """
+
+        keys = self._keys(points)
+        distinct = len(set(keys))
+        if distinct > self.capacity:
+            return 0, distinct
+        return self._lookup(keys)
+
+    def matrices(self, points: npt.NDArray[np.float64]) -> TravelMatrices:
+        """Matrices between ``[lat, lon]`` rows, counting hits and misses.
+
+        Hits and misses count distinct locations. A lookup with more distinct
+        locations than the cache holds bypasses it.
+        """
+
+        keys = self._keys(points)
+        distinct = len(set(keys))
+        if distinct > self.capacity:
+            self.misses += distinct
+            result = self.provider.matrix(points, points)
+            return result._replace(misses=distinct)
+        hits, misses = self._lookup(keys)
+        index = np.ix_(*[[self._slots[key] for key in keys]] * 2)
+        return TravelMatrices(
+            km=self._km[index], minutes=self._minutes[index], hits=hits, misses=misses
+        )
+
+    def matrix(
+        self,
+        origins: npt.NDArray[np.float64],
+        destinations: npt.NDArray[np.float64],
+    ) -> TravelMatrices:
+        """Costs from ``origins`` to ``destinations``, as a provider would.
+
+        Lets the cache stand in for its provider wherever single legs are
+        looked up, as in cheapest insertion.
+        """
+
+        keys = self._keys(np.vstack([origins, destinations]))
+        if len(set(keys)) > self.capacity:
+            return self.provider.matrix(origins, destinations)
+        self._lookup(keys)
+        slots = [self._slots[key] for key in keys]
+        index = np.ix_(slots[: len(origins)], slots[len(origins) :])
+        return TravelMatrices(km=self._km[index], minutes=self._minutes[index])
+
+    def save(self) -> None:
+        """Write the cache to ``directory``, replacing the file there.
+
+        The whole table is rewritten, about 0.2 seconds at 3000 locations, so
+        callers save off the request path rather than after every lookup.
+        """
+
+        path = self.path
+        if path is None:
+            return
+        order = list(self._slots.values())
+        n = len(order)
+        table = np.empty((n, 2 + 2 * n), dtype=np.float64)
+        table[:, :2] = np.array(list(self._slots), dtype=np.float64).reshape(-1, 2)
+        table[:, 2 : 2 + n] = self._km[np.ix_(order, order)]
+        table[:, 2 + n :] = self._minutes[np.ix_(order, order)]
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # solver processes share the file, so replace it in one step
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as fh:
+            np.save(fh, table)
+        os.replace(tmp, path)
+        self.unsaved = 0
+
+    def _load(self) -> None:
+        path = self.path
+        if path is None or not path.exists():
+            return
+        table = np.load(path, mmap_mode="r")
+        n = len(table)
+        # keep the newest entries that fit
+        first = max(0, n - self.capacity)
+        keys = [(int(a), int(b)) for a, b in table[first:, :2].tolist()]
+        slots = self._add(keys)
+        block = np.ix_(slots, slots)
+        self._km[block] = table[first:, 2 + first : 2 + n]
+        self._minutes[block] = table[first:, 2 + n + first :]
+
+
+_cache: MatrixCache | None = None
+
+
+def matrix_cache() -> MatrixCache | None:
+    """This process's cache as set by ``MATRIX_CACHE_*``, None when disabled."""
+
+    global _cache
+    if config.MATRIX_CACHE_SIZE <= 0:
+        return None
+    provider = travel_cost_provider()
+    directory = Path(config.MATRIX_CACHE_DIR) if config.MATRIX_CACHE_DIR else None
+    settings = (
+        config.MATRIX_CACHE_SIZE,
+        config.MATRIX_CACHE_PRECISION,
+        provider.key,
+        directory,
+    )
+    if (
+        _cache is None
+        or (
+            _cache.capacity,
+            _cache.precision,
+            _cache.provider.key,
+            _cache.directory,
+        )
+        != settings
+    ):
+        _cache = MatrixCache(
+            config.MATRIX_CACHE_SIZE, config.MATRIX_CACHE_PRECISION, provider, directory
+        )
+    return _cache
+
+
+def save_matrix_cache() -> bool:
+    """Save this process's cache when it has unsaved locations.
+
+    Returns whether the file was written.
+    """
+
+    if _cache is None or _cache.directory is None or not _cache.unsaved:
+        return False
+    _cache.save()
+    return True
+
+
+def cost_matrices(points: npt.NDArray[np.float64]) -> TravelMatrices:
+    """Square matrices between ``points`` from the configured provider.
+
+    Goes through :func:`matrix_cache` when it is enabled.
+    """
+
+    cache = matrix_cache()
+    if cache is None:
+        return travel_cost_provider().matrix(points, points)
+    return cache.matrices(points)
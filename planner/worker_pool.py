@@ -0,0 +1,265 @@
+"""Process pool that keeps CPU-bound solves off the asyncio event loop."""
+
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import itertools
+import json
+import logging
+import multiprocessing
+import threading
+from typing import Any, Callable, TypeVar
+
+import config
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Per-process state, populated by the pool initializer and ``_run_job``.
+_flags: Any = None
+_progress: Any = None
+_slot: int | None = None
+_token: int | None = None
+
+
+class SolverQueueFullError(Exception):
+    """Raised when ``SOLVER_QUEUE_SIZE`` jobs are already queued or running."""
+
+
+def cancel_requested() -> bool:
+    """Whether the job running in this worker process has been cancelled."""
+
+    return _flags is not None and _slot is not None and bool(_flags[_slot])
+
+
+def progress_enabled() -> bool:
+    """Whether the caller of the running job listens for progress reports."""
+
+    return _progress is not None and _token is not None
+
+
+def report_progress(payload: Any) -> None:
+    """Send ``payload`` to the running job's ``on_progress`` callback."""
+
+    if progress_enabled():
+        _progress.put((_token, payload))
+
+
+def _init_worker(flags: Any, progress: Any) -> None:
+    global _flags, _progress
+    _flags = flags
+    _progress = progress
+
+
+def _run_job(
+    fn: Callable[..., T],
+    args: tuple[Any, ...],
+    kwargs: dict[str, Any],
+    settings: dict[str, Any],
+    slot: int,
+    token: int | None,
+) -> T:
+    global _slot, _token
+    # Workers are long-lived, so apply the parent's current settings per job.
+    for name, value in settings.items():
+        setattr(config, name, value)
+    # only the parent loads and saves the matrix cache file
+    config.MATRIX_CACHE_DIR = ""
+    _slot = slot
+    _token = token
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        _slot = None
+        _token = None
+
+
+def _threadsafe(
+    loop: asyncio.AbstractEventLoop, callback: Callable[[Any], None]
+) -> Callable[[Any], None]:
+    def listener(payload: Any) -> None:
+        loop.call_soon_threadsafe(callback, payload)
+
+    return listener
+
+
+def _settings() -> dict[str, Any]:
+    return {k: v for k, v in vars(config).items() if k.isupper()}
+
+
+class _Job:
+    def __init__(self, future: Future[Any], slot: int) -> None:
+        self.future = future
+        self.slot = slot
+        self.cancelled = False
+
+
+class SolverPool:
+    """Bounded process pool with an async ``run`` and per-job cancellation.
+
+    At most ``queue_size`` jobs may be queued or running at once; further
+    submissions raise :class:`SolverQueueFullError`. Cancelling a queued job
+    drops it, cancelling a running one raises a shared flag the solver polls
+    via :func:`cancel_requested` so it can stop its search early. Payloads a
+    job passes to :func:`report_progress` reach its ``on_progress`` callback
+    on the caller's event loop.
+    """
+
+    def __init__(self, workers: int, queue_size: int) -> None:
+        self._workers = max(1, workers)
+        self._queue_size = max(1, queue_size)
+        self._ctx = multiprocessing.get_context("spawn")
+        self._flags: Any = None
+        self._progress: Any = None
+        self._executor: ProcessPoolExecutor | None = None
+        self._free = list(range(self._queue_size))
+        self._jobs: dict[str, _Job] = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._tokens = itertools.count(1)
+        self._listeners: dict[int, Callable[[Any], None]] = {}
+
+    def _ensure_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._flags = self._ctx.Array("b", self._queue_size, lock=False)
+            self._progress = self._ctx.Queue()
+            threading.Thread(
+                target=self._drain_progress, args=(self._progress,), daemon=True
+            ).start()
+            self._executor = ProcessPoolExecutor(
+                max_workers=self._workers,
+                mp_context=self._ctx,
+                initializer=_init_worker,
+                initargs=(self._flags, self._progress),
+            )
+        return self._executor
+
+    def _discard_executor(self, executor: ProcessPoolExecutor) -> None:
+        """Drop ``executor`` after a worker died; the next job starts a new one.
+
+        Must be called with ``_lock`` held.
+        """
+
+        if self._executor is not executor:
+            return
+        executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+        self._progress.put(None)
+        logger.error(json.dumps({"event": "solver_pool_broken"}))
+
+    def _drain_progress(self, queue: Any) -> None:
+        while True:
+            item = queue.get()
+            if item is None:
+                return
+            token, payload = item
+            with self._lock:
+                listener = self._listeners.get(token)
+            # reports arriving after the job finished are dropped
+            if listener is not None:
+                try:
+                    listener(payload)
+                except RuntimeError:  # the caller's loop is already closed
+                    pass
+
+    def _release(self, job_id: str, job: _Job, token: int | None) -> None:
+        with self._lock:
+            if self._jobs.get(job_id) is job:
+                del self._jobs[job_id]
+            self._free.append(job.slot)
+            if token is not None:
+                self._listeners.pop(token, None)
+
+    async def run(
+        self,
+        fn: Callable[..., T],
+        *args: Any,
+        job_id: str | None = None,
+        on_progress: Callable[[Any], None] | None = None,
+        **kwargs: Any,
+    ) -> T:
+        loop = asyncio.get_running_loop()
+        if job_id is None:
+            job_id = f"job-{next(self._ids)}"
+        token = None
+        with self._lock:
+            if job_id in self._jobs:
+                raise ValueError(f"solver job {job_id} is already queued")
+            if not self._free:
+                raise SolverQueueFullError(job_id)
+            executor = self._ensure_executor()
+            slot = self._free.pop()
+            try:
+                if on_progress is not None:
+                    token = next(self._tokens)
+                    self._listeners[token] = _threadsafe(loop, on_progress)
+                self._flags[slot] = 0
+                try:
+                    future = executor.submit(
+                        _run_job, fn, args, kwargs, _settings(), slot, token
+                    )
+                except BrokenProcessPool:
+                    self._discard_executor(executor)
+                    executor = self._ensure_executor()
+                    self._flags[slot] = 0
+                    future = executor.submit(
+                        _run_job, fn, args, kwargs, _settings(), slot, token
+                    )
+            except BaseException:
+                self._free.append(slot)
+                if token is not None:
+                    self._listeners.pop(token, None)
+                raise
+            job = _Job(future, slot)
+            self._jobs[job_id] = job
+        # The slot stays reserved until the worker is really done with it.
+        future.add_done_callback(lambda _: self._release(job_id, job, token))
+        try:
+            result = await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            self.cancel(job_id)
+            raise
+        except BrokenProcessPool:
+            # a worker died, e.g. in native solver code; later jobs get a
+            # fresh executor instead of failing the same way
+            with self._lock:
+                self._discard_executor(executor)
+            raise
+        if job.cancelled:
+            raise asyncio.CancelledError(job_id)
+        return result
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job and its ``<job_id>:<n>`` sub-jobs.
+
+        Returns False if no such job is known.
+        """
+
+        with self._lock:
+            ids = [j for j in self._jobs if j == job_id or j.startswith(job_id + ":")]
+            jobs = [self._jobs.pop(j) for j in ids]
+            for job in jobs:
+                job.cancelled = True
+                self._flags[job.slot] = 1
+        for job in jobs:
+            job.future.cancel()
+        if ids:
+            logger.info(json.dumps({"event": "solver_job_cancelled", "job_ids": ids}))
+        return bool(ids)
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._jobs)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            for job in self._jobs.values():
+                job.cancelled = True
+                self._flags[job.slot] = 1
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._progress.put(None)
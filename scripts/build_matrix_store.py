@@ -0,0 +1,51 @@
+"""Precompute the shared travel matrix for a set of recurring locations.
+
+Reads a CSV with ``lat`` and ``lon`` columns (other columns are ignored) and
+writes a new version of the store, keeping the ids of locations already in
+it::
+
+    python scripts/build_matrix_store.py customers.csv /var/lib/planner/matrix
+
+Travel costs come from the provider configured by ``TRAVEL_COST_PROVIDER``.
+Point ``MATRIX_STORE_DIR`` at the output directory to have solvers using the
+same provider read it.
+"""
+
+import argparse
+import csv
+import json
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+
+from planner.matrix_store import build_store
+from planner.travel import travel_cost_provider
+import config
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Build the shared travel matrix.")
+    parser.add_argument("locations", type=Path, help="CSV with lat and lon columns")
+    parser.add_argument("directory", type=Path, help="store directory")
+    parser.add_argument("--precision", type=int, default=config.MATRIX_CACHE_PRECISION)
+    parser.add_argument("--block-rows", type=int, default=1024)
+    args = parser.parse_args(argv)
+
+    with open(args.locations, newline="") as fh:
+        rows = [(float(r["lat"]), float(r["lon"])) for r in csv.DictReader(fh)]
+    points = np.array(rows, dtype=np.float64).reshape(-1, 2)
+    path = build_store(
+        points,
+        args.directory,
+        args.precision,
+        travel_cost_provider(),
+        args.block_rows,
+    )
+    print(json.dumps({"event": "matrix_store_built", "path": str(path)}))
+
+
+if __name__ == "__main__":
+    main()
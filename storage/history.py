@@ -1,7 +1,11 @@
+from datetime import datetime
+import json
 import sqlite3
 from pathlib import Path
+from typing import Sequence
 
-from planner.dtos import PlanResultDTO
+from planner.dtos import Coord, PlanResultDTO, TaskDTO
+from planner.problem import horizon_date
 import config
 
 DB_PATH = Path(__file__).with_name("history.db")
@@ -21,13 +25,39 @@ def init_db() -> None:
             )
             """
         )
+        # the latest plan of each weekday with its task locations, kept
+        # however many plans a day produces
+        _conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS weekday_plans (
+                weekday INTEGER PRIMARY KEY,
+                plan TEXT NOT NULL,
+                locations TEXT NOT NULL
+            )
+            """
+        )
         _conn.commit()
 
 
-def save_plan(plan: PlanResultDTO) -> None:
+def _weekday(plan: PlanResultDTO) -> int:
+    # generated_at is UTC, the weekday that of the horizon it was planned for
+    generated = datetime.fromisoformat(plan.generated_at.replace("Z", "+00:00"))
+    return horizon_date(generated).weekday()
+
+
+def save_plan(plan: PlanResultDTO, tasks: Sequence[TaskDTO] | None = None) -> None:
+    """Store ``plan``; with ``tasks`` it also becomes its weekday's plan."""
+
     if _conn is None:
         raise RuntimeError("DB not initialized")
     _conn.execute("INSERT INTO plans(plan) VALUES (?)", (plan.model_dump_json(),))
+    if tasks is not None:
+        locations = {t.id: [t.location.lat, t.location.lon] for t in tasks}
+        _conn.execute(
+            "INSERT OR REPLACE INTO weekday_plans(weekday, plan, locations) "
+            "VALUES (?, ?, ?)",
+            (_weekday(plan), plan.model_dump_json(), json.dumps(locations)),
+        )
     _conn.commit()
     _conn.execute(
         "DELETE FROM plans WHERE id NOT IN (SELECT id FROM plans ORDER BY id DESC LIMIT ?)",
@@ -45,3 +75,23 @@ def get_recent_plans(limit: int) -> list[PlanResultDTO]:
     )
     rows = cur.fetchall()
     return [PlanResultDTO.model_validate_json(r[0]) for r in rows]
+
+
+def get_weekday_plan(weekday: int) -> tuple[PlanResultDTO, dict[str, Coord]] | None:
+    """Last plan saved with tasks on ``weekday`` and its task locations.
+
+    Monday is 0, as in :meth:`datetime.weekday`.
+    """
+
+    if _conn is None:
+        raise RuntimeError("DB not initialized")
+    row = _conn.execute(
+        "SELECT plan, locations FROM weekday_plans WHERE weekday = ?", (weekday,)
+    ).fetchone()
+    if row is None:
+        return None
+    locations = {
+        task_id: Coord(lat=lat, lon=lon)
+        for task_id, (lat, lon) in json.loads(row[1]).items()
+    }
+    return PlanResultDTO.model_validate_json(row[0]), locations
@@ -0,0 +1,23 @@
+from api.dtos import VehicleDTO
+from planner.dtos import Coord, TaskDTO
+
+
+def grid_tasks(n: int, columns: int = 5) -> list[TaskDTO]:
+    """Unit-size pickups laid out on a 0.01 degree grid ``columns`` wide."""
+    return [
+        TaskDTO(
+            id=f"t{i}",
+            kind="pickup",
+            location=Coord(lat=0.01 * (i % columns), lon=0.01 * (i // columns)),
+            window=None,
+            size=1,
+        )
+        for i in range(n)
+    ]
+
+
+def two_vehicles(capacity: int = 20) -> list[VehicleDTO]:
+    return [
+        VehicleDTO(id=f"v{i}", plate="p", capacity=capacity, office="o", division=None)
+        for i in range(2)
+    ]
@@ -0,0 +1,109 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pytest
+
+from api.dtos import VehicleDTO
+import planner.service as service
+from planner.aggregate import aggregate, expand_plan, merged_routes
+from planner.dtos import Coord, PlanResultDTO, TaskDTO, TimeWindow, VehiclePlanDTO
+import config
+
+_VEHICLES = [VehicleDTO(id="v1", plate="p", capacity=6, office="o", division=None)]
+
+
+def _task(
+    task_id: str,
+    lat: float,
+    window: tuple[str, str] | None = None,
+    size: int = 1,
+    service_minutes: int = 10,
+) -> TaskDTO:
+    return TaskDTO(
+        id=task_id,
+        kind="pickup",
+        location=Coord(lat=lat, lon=0.0),
+        window=TimeWindow(start=window[0], end=window[1]) if window else None,
+        size=size,
+        service_minutes=service_minutes,
+    )
+
+
+@pytest.fixture(autouse=True)
+def _settings(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(config, "PLANNING_HORIZON_START", "08:00")
+    monkeypatch.setattr(config, "PLANNING_HORIZON_END", "18:00")
+    monkeypatch.setattr(config, "SOLVER_AGGREGATE_PRECISION", 4)
+
+
+def test_merges_co_located_tasks() -> None:
+    tasks = [
+        _task("b", 0.10001, ("09:00", "12:00"), service_minutes=5),
+        _task("a", 0.1, ("08:30", "10:00")),
+        _task("c", 0.10002, size=2),
+        _task("elsewhere", 0.2),
+    ]
+    result = aggregate(tasks, _VEHICLES)
+    assert [t.id for t in result.tasks] == ["c", "elsewhere"]
+    # sorted by window start, the window-less task first
+    assert [t.id for t in result.members["c"]] == ["c", "a", "b"]
+    merged = result.tasks[0]
+    assert (merged.size, merged.service_minutes) == (4, 25)
+    assert merged.location == tasks[2].location
+    # a begins 10 minutes in and b 20 minutes in
+    assert merged.window == TimeWindow(start="08:40", end="09:50")
+
+
+def test_splits_groups_that_do_not_fit() -> None:
+    tasks = [
+        _task("a", 0.1, ("08:00", "08:30")),
+        _task("b", 0.1, ("11:00", "12:00"), size=2),
+        _task("c", 0.1, ("11:00", "12:00"), size=5),
+        _task("d", 0.1, ("11:30", "12:00")),
+    ]
+    result = aggregate(tasks, _VEHICLES)
+    # a and b have disjoint windows, b and c exceed the largest vehicle
+    assert [[t.id for t in g] for g in result.members.values()] == [["c", "d"]]
+    assert [t.id for t in result.tasks] == ["a", "b", "c"]
+
+
+def test_expand_plan_and_routes() -> None:
+    tasks = [_task("a", 0.1), _task("b", 0.1, service_minutes=7), _task("c", 0.2)]
+    members = aggregate(tasks, _VEHICLES).members
+    assert merged_routes({"v1": ["c", "b", "a"]}, members) == {"v1": ["c", "a"]}
+    plan = PlanResultDTO(
+        generated_at="now",
+        depot=Coord(lat=0.0, lon=0.0),
+        vehicle_plans=[
+            VehiclePlanDTO(
+                vehicle_id="v1",
+                tasks_order=["c", "a"],
+                eta=["08:10", "09:00"],
+                total_minutes=80,
+                total_km=3.0,
+            )
+        ],
+        unscheduled=[],
+        objective_minutes=80,
+    )
+    expand_plan(plan, members)
+    assert plan.vehicle_plans[0].tasks_order == ["c", "a", "b"]
+    assert plan.vehicle_plans[0].eta == ["08:10", "09:00", "09:10"]
+    plan.unscheduled = ["a"]
+    expand_plan(plan, members)
+    assert plan.unscheduled == ["a", "b"]
+
+
+@pytest.mark.asyncio
+async def test_solve_expands_merged_stops(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(config, "DEPOT_LAT", 0.0)
+    monkeypatch.setattr(config, "DEPOT_LON", 0.0)
+    monkeypatch.setattr(config, "SOLVER_DECOMPOSE", "off")
+    tasks = [_task("a", 0.01), _task("b", 0.01), _task("c", 0.02)]
+    plan = await service.solve(tasks, _VEHICLES, time_limit_seconds=1)
+    order = plan.vehicle_plans[0].tasks_order
+    assert sorted(order) == ["a", "b", "c"]
+    assert order.index("b") == order.index("a") + 1
+    assert (plan.stats["aggregated_stops"], plan.stats["aggregated_tasks"]) == (1, 2)
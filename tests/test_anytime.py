@@ -0,0 +1,62 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pytest
+
+import planner.service as service
+import planner.worker_pool as worker_pool
+from planner.dtos import Coord, PlanResultDTO
+from planner.problem import compile_problem
+from planner.solver_ortools import solve_plan_ortools
+import config
+from grid_day import grid_tasks, two_vehicles
+
+
+class _Reports:
+    def __init__(self) -> None:
+        self.items: list[tuple[int, PlanResultDTO]] = []
+
+    def put(self, item: tuple[int, PlanResultDTO]) -> None:
+        self.items.append(item)
+
+
+def test_solver_reports_improving_solutions(monkeypatch: pytest.MonkeyPatch) -> None:
+    config.PLANNING_HORIZON_START = "08:00"
+    reports = _Reports()
+    monkeypatch.setattr(worker_pool, "_progress", reports)
+    monkeypatch.setattr(worker_pool, "_token", 7)
+    problem = compile_problem([Coord(lat=0.0, lon=0.0)], grid_tasks(20), two_vehicles())
+    plan = solve_plan_ortools(problem, None, 1)
+    assert reports.items
+    objectives = [int(p.stats["objective"]) for _, p in reports.items]
+    assert objectives == sorted(objectives, reverse=True)
+    assert len(set(objectives)) == len(objectives)
+    assert all(token == 7 for token, _ in reports.items)
+    assert int(plan.stats["objective"]) <= objectives[-1]
+
+
+@pytest.mark.asyncio
+async def test_partial_plan_visible_during_solve(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(config, "SOLVER_TIMEOUT_SECONDS", 2)
+    monkeypatch.setattr(config, "SOLVER_PORTFOLIO", "")
+    monkeypatch.setattr(config, "SOLVER_DECOMPOSE", "off")
+    monkeypatch.setattr(service, "_latest_plan", None)
+    monkeypatch.setattr(service, "_latest_metrics", None)
+    config.DEPOT_LAT = 0.0
+    config.DEPOT_LON = 0.0
+    task = asyncio.create_task(service.solve(grid_tasks(40), two_vehicles()))
+    partial_seen = False
+    while not task.done():
+        metrics = service.get_plan_metrics()
+        if metrics is not None and metrics.get("partial") == 1:
+            partial_seen = True
+            assert service.get_latest_plan() is not None
+        await asyncio.sleep(0.05)
+    final = await task
+    assert partial_seen
+    assert final.unscheduled == []
@@ -40,7 +40,7 @@ def test_api_endpoints(monkeypatch: pytest.MonkeyPatch) -> None:
     monkeypatch.setattr(service, "get_vehicles", fake_get_vehicles)
     monkeypatch.setattr(service, "get_crews", fake_get_crews)
     monkeypatch.setattr(service, "get_today_stops", fake_get_today_stops)
-    monkeypatch.setattr(service, "save_plan", lambda plan: None)
+    monkeypatch.setattr(service, "save_plan", lambda plan, tasks=None: None)
     monkeypatch.setattr(api_module, "publish_plan", fake_publish)
 
     client = TestClient(api_module.app)
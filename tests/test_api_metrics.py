@@ -37,7 +37,7 @@ def _setup(monkeypatch: pytest.MonkeyPatch) -> None:
     monkeypatch.setattr(service, "get_vehicles", fake_get_vehicles)
     monkeypatch.setattr(service, "get_crews", fake_get_crews)
     monkeypatch.setattr(service, "get_today_stops", fake_get_today_stops)
-    monkeypatch.setattr(service, "save_plan", lambda plan: None)
+    monkeypatch.setattr(service, "save_plan", lambda plan, tasks=None: None)
 
     async def fake_publish(plan: object) -> None:
         return None
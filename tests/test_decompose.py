@@ -0,0 +1,162 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pytest
+
+from api.dtos import VehicleDTO
+import planner.service as service
+from planner.decompose import (
+    merge_plans,
+    partition_by_office,
+    partition_by_vehicle,
+    partition_spatial,
+    rebalance_boundary,
+)
+from planner.dtos import Coord, TaskDTO
+from planner.problem import compile_problem
+from planner.solver import solve_plan
+import config
+
+
+def _task(task_id: str, lat: float, lon: float, office: str | None = None) -> TaskDTO:
+    return TaskDTO(
+        id=task_id,
+        kind="pickup",
+        location=Coord(lat=lat, lon=lon),
+        window=None,
+        size=1,
+        office=office,
+    )
+
+
+def _vehicle(vehicle_id: str, office: str) -> VehicleDTO:
+    return VehicleDTO(
+        id=vehicle_id, plate="p", capacity=10, office=office, division=None
+    )
+
+
+def test_partition_by_office_assigns_orphans_to_nearest() -> None:
+    tasks = [
+        _task("n1", 1.0, 0.0, "north"),
+        _task("s1", -1.0, 0.0, "south"),
+        _task("x", -0.9, 0.0),
+    ]
+    parts = partition_by_office(
+        tasks, [_vehicle("v1", "north"), _vehicle("v2", "south")]
+    )
+    ids = {p.vehicles[0].id: sorted(t.id for t in p.tasks) for p in parts}
+    assert ids == {"v1": ["n1"], "v2": ["s1", "x"]}
+
+
+def test_partition_spatial_splits_clusters() -> None:
+    tasks = [_task(f"a{i}", 0.0, 0.001 * i) for i in range(5)]
+    tasks += [_task(f"b{i}", 1.0, 0.001 * i) for i in range(5)]
+    parts = partition_spatial(tasks, [_vehicle("v1", "o"), _vehicle("v2", "o")], 2)
+    assert len(parts) == 2
+    for part in parts:
+        assert len(part.vehicles) == 1
+        assert len({t.id[0] for t in part.tasks}) == 1
+
+
+def _outlier_day() -> tuple[list[TaskDTO], list[VehicleDTO]]:
+    tasks = [_task(f"a{i}", 0.001 * (i % 10), 0.001 * (i // 10)) for i in range(100)]
+    tasks += [_task("o1", 1.0, 1.0), _task("o2", -1.0, 1.0)]
+    return tasks, [_vehicle(f"v{i}", "o") for i in range(3)]
+
+
+def test_partition_spatial_gives_outliers_a_vehicle() -> None:
+    tasks, vehicles = _outlier_day()
+    parts = partition_spatial(tasks, vehicles, 3)
+    assert sorted(len(p.tasks) for p in parts) == [1, 1, 100]
+    assert all(p.vehicles for p in parts)
+
+
+@pytest.mark.asyncio
+async def test_service_solves_outlier_partitions(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(config, "SOLVER_DECOMPOSE", "spatial")
+    monkeypatch.setattr(config, "SOLVER_DECOMPOSE_MIN_TASKS", 1)
+    monkeypatch.setattr(config, "SOLVER_DECOMPOSE_MAX_TASKS", 34)
+    monkeypatch.setattr(config, "SOLVER_TIMEOUT_SECONDS", 1)
+    monkeypatch.setattr(config, "DEPOT_LAT", 0.0)
+    monkeypatch.setattr(config, "DEPOT_LON", 0.0)
+    tasks, vehicles = _outlier_day()
+    plan = await service.solve(tasks, vehicles)
+    assert plan.stats["partitions"] == 3
+    assigned = [t for vp in plan.vehicle_plans for t in vp.tasks_order]
+    assert len(assigned) + len(plan.unscheduled) == len(tasks)
+    # a fleetless subproblem is answered without reaching the solver
+    empty = await service._solve_single(tasks[:2], [], None, None, None)
+    assert empty.unscheduled == ["a0", "a1"]
+
+
+def test_partition_by_vehicle_sweeps_capacity_shares() -> None:
+    depot = Coord(lat=0.0, lon=0.0)
+    # four tasks north-east, four south-west of the depot
+    tasks = [_task(f"n{i}", 0.01 * (i + 1), 0.01) for i in range(4)]
+    tasks += [_task(f"s{i}", -0.01 * (i + 1), -0.01) for i in range(4)]
+    vehicles = [_vehicle("v1", "o"), _vehicle("v2", "o"), _vehicle("v3", "o")]
+    vehicles[0] = vehicles[0].model_copy(update={"capacity": 20})
+    parts = partition_by_vehicle(tasks, vehicles, depot)
+    # 8 tasks on 40 seats fill a fifth of each vehicle, so v1 takes four
+    assert [[v.id for v in p.vehicles] for p in parts] == [["v1"], ["v2"], ["v3"]]
+    assert [len(p.tasks) for p in parts] == [4, 2, 2]
+    for part in parts:
+        assert len({t.id[0] for t in part.tasks}) == 1
+
+
+def test_rebalance_inserts_unscheduled_across_partitions() -> None:
+    config.PLANNING_HORIZON_START = "08:00"
+    depot = Coord(lat=0.0, lon=0.0)
+    tasks = [_task("a", 0.0, 0.01), _task("b", 0.0, 0.02), _task("c", 0.0, -0.01)]
+    vehicles = [_vehicle("v1", "o"), _vehicle("v2", "o")]
+    # partition 2 had no vehicle capacity left for "c"
+    plans = [
+        solve_plan(compile_problem([depot], tasks[:2], vehicles[:1])),
+        solve_plan(compile_problem([depot], [tasks[2]], [])),
+    ]
+    merged = merge_plans(depot, plans, vehicles)
+    assert merged.unscheduled == ["c"]
+    plan = rebalance_boundary(merged, tasks, vehicles, [["v1"], ["v2"]], False)
+    assert plan.unscheduled == []
+    assert sorted(t for v in plan.vehicle_plans for t in v.tasks_order) == [
+        "a",
+        "b",
+        "c",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_service_solves_partitions(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(config, "SOLVER_DECOMPOSE", "spatial")
+    monkeypatch.setattr(config, "SOLVER_DECOMPOSE_MIN_TASKS", 1)
+    monkeypatch.setattr(config, "SOLVER_DECOMPOSE_MAX_TASKS", 3)
+    monkeypatch.setattr(config, "SOLVER_TIMEOUT_SECONDS", 1)
+    config.DEPOT_LAT = 0.0
+    config.DEPOT_LON = 0.0
+    tasks = [_task(f"a{i}", 0.0, 0.01 * (i + 1)) for i in range(3)]
+    tasks += [_task(f"b{i}", 0.0, -0.01 * (i + 1)) for i in range(3)]
+    vehicles = [_vehicle("v1", "o"), _vehicle("v2", "o")]
+    plan = await service.solve(tasks, vehicles)
+    assert [vp.vehicle_id for vp in plan.vehicle_plans] == ["v1", "v2"]
+    assigned = sorted(t for v in plan.vehicle_plans for t in v.tasks_order)
+    assert assigned == sorted(t.id for t in tasks)
+
+
+@pytest.mark.asyncio
+async def test_service_routes_each_vehicle(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(config, "SOLVER_DECOMPOSE", "vehicle")
+    monkeypatch.setattr(config, "SOLVER_DECOMPOSE_MIN_TASKS", 1)
+    monkeypatch.setattr(config, "SOLVER_TIMEOUT_SECONDS", 1)
+    config.DEPOT_LAT = 0.0
+    config.DEPOT_LON = 0.0
+    tasks = [_task(f"a{i}", 0.0, 0.01 * (i + 1)) for i in range(3)]
+    tasks += [_task(f"b{i}", 0.0, -0.01 * (i + 1)) for i in range(3)]
+    vehicles = [_vehicle("v1", "o"), _vehicle("v2", "o")]
+    plan = await service.solve(tasks, vehicles)
+    assert plan.stats["partitions"] == 2
+    routes = [sorted(vp.tasks_order) for vp in plan.vehicle_plans]
+    assert sorted(routes) == [["a0", "a1", "a2"], ["b0", "b1", "b2"]]
@@ -0,0 +1,91 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pytest
+
+from api.dtos import VehicleDTO
+import planner.service as service
+from planner.dtos import Coord, PlanResultDTO, TaskDTO
+import config
+
+
+def _task(task_id: str, lon: float) -> TaskDTO:
+    return TaskDTO(
+        id=task_id,
+        kind="pickup",
+        location=Coord(lat=0.0, lon=lon),
+        window=None,
+        size=1,
+    )
+
+
+@pytest.fixture
+def published(monkeypatch: pytest.MonkeyPatch) -> list[PlanResultDTO]:
+    sent: list[PlanResultDTO] = []
+
+    async def fake_get_vehicles() -> list[VehicleDTO]:
+        return [VehicleDTO(id="v1", plate="p", capacity=10, office="o", division=None)]
+
+    async def fake_get_crews() -> list[object]:
+        return []
+
+    async def fake_get_today_stops() -> list[TaskDTO]:
+        # nearest-neighbour greedy zigzags across the depot on this line
+        return [_task("a", 0.1), _task("b", -0.15), _task("c", 0.36)]
+
+    async def fake_publish(plan: PlanResultDTO) -> None:
+        sent.append(plan)
+
+    monkeypatch.setattr(service, "get_vehicles", fake_get_vehicles)
+    monkeypatch.setattr(service, "get_crews", fake_get_crews)
+    monkeypatch.setattr(service, "get_today_stops", fake_get_today_stops)
+    monkeypatch.setattr(service, "save_plan", lambda plan, tasks=None: None)
+    monkeypatch.setattr(service, "publish_plan", fake_publish)
+    monkeypatch.setattr(config, "DEPOT_LAT", 0.0)
+    monkeypatch.setattr(config, "DEPOT_LON", 0.0)
+    monkeypatch.setattr(config, "PLANNING_HORIZON_START", "08:00")
+    monkeypatch.setattr(config, "PLANNING_HORIZON_END", "18:00")
+    monkeypatch.setattr(config, "SOLVER_TIMEOUT_SECONDS", 1)
+    monkeypatch.setattr(config, "PLAN_FAST_FIRST", True)
+    monkeypatch.setattr(config, "PLAN_FAST_FIRST_SECONDS", 0.0)
+    monkeypatch.setattr(config, "PLAN_REFINE_MIN_IMPROVEMENT_PCT", 1.0)
+    return sent
+
+
+@pytest.mark.asyncio
+async def test_fast_plan_is_replaced_by_refined_plan(
+    published: list[PlanResultDTO],
+) -> None:
+    first = await service.build_today_plan()
+    assert first.stats["plan_phase"] == "fast"
+    assert first.vehicle_plans[0].tasks_order == ["a", "b", "c"]
+    assert service.get_latest_plan() is first
+    assert service._refinement is not None
+    await service._refinement
+    refined = service.get_latest_plan()
+    assert refined is not None and refined is not first
+    assert refined.stats["plan_phase"] == "refined"
+    assert refined.objective_minutes < first.objective_minutes
+    assert published == [refined]
+
+
+@pytest.mark.asyncio
+async def test_refinement_needs_margin_and_current_plan(
+    published: list[PlanResultDTO], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(config, "PLAN_REFINE_MIN_IMPROVEMENT_PCT", 90.0)
+    first = await service.build_today_plan()
+    assert service._refinement is not None
+    await service._refinement
+    assert service.get_latest_plan() is first
+
+    monkeypatch.setattr(config, "PLAN_REFINE_MIN_IMPROVEMENT_PCT", 1.0)
+    await service.build_today_plan()
+    # an insertion or replan lands while the refinement searches
+    newer = first.model_copy()
+    service._latest_plan = newer
+    await service._refinement
+    assert service.get_latest_plan() is newer
+    assert published == []
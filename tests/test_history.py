@@ -3,7 +3,7 @@ from pathlib import Path
 
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 
-from planner.dtos import PlanResultDTO, Coord
+from planner.dtos import Coord, PlanResultDTO, TaskDTO
 import storage.history as history
 import config
 import pytest
@@ -32,3 +32,33 @@ def test_history_save_and_fetch(
     assert len(plans) == 2
     assert plans[0].generated_at == "2024-01-01T00:00:03Z"
     assert plans[1].generated_at == "2024-01-01T00:00:02Z"
+
+
+def test_history_keeps_latest_plan_per_weekday(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(history, "DB_PATH", tmp_path / "history.db")
+    monkeypatch.setattr(history, "_conn", None)
+    monkeypatch.setattr(config, "PLAN_HISTORY_SIZE", 1)
+    history.init_db()
+    task = TaskDTO(
+        id="t1", kind="pickup", location=Coord(lat=1.0, lon=2.0), window=None, size=1
+    )
+    # 2024-01-01 and 2024-01-08 were Mondays
+    history.save_plan(_plan(1), [task])
+    history.save_plan(
+        _plan(2).model_copy(update={"generated_at": "2024-01-02T07:00:00Z"}), [task]
+    )
+    history.save_plan(
+        _plan(3).model_copy(update={"generated_at": "2024-01-08T07:00:00Z"}), []
+    )
+    # plans saved without tasks only go to the plain history
+    history.save_plan(_plan(4))
+    monday = history.get_weekday_plan(0)
+    assert monday is not None
+    assert monday[0].generated_at == "2024-01-08T07:00:00Z"
+    assert monday[1] == {}
+    tuesday = history.get_weekday_plan(1)
+    assert tuesday is not None
+    assert tuesday[1] == {"t1": Coord(lat=1.0, lon=2.0)}
+    assert history.get_weekday_plan(2) is None
@@ -0,0 +1,91 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+import pytest
+
+from api.dtos import VehicleDTO
+import planner.service as service
+from planner.dtos import Coord, TaskDTO
+from planner.incremental_matrix import IncrementalMatrix, Synced
+from planner.metrics import coord_array, distance_matrix_km, minutes_matrix
+from planner.travel import HaversineProvider, MatrixCache
+import planner.travel as travel
+import config
+
+
+def _coord(i: int) -> Coord:
+    return Coord(lat=40.0 + 0.01 * i, lon=-3.7 + 0.003 * i * i)
+
+
+def _matrix(capacity: int) -> IncrementalMatrix:
+    return IncrementalMatrix(MatrixCache(capacity, 5, HaversineProvider(40)))
+
+
+def test_add_remove_and_grow_match_full_matrix() -> None:
+    matrix = _matrix(10)
+    assert matrix.add([(i, _coord(i)) for i in range(5)]) == (0, 5)
+    matrix.remove(1)
+    matrix.add([(5, _coord(5))])
+    # a key at a location the cache already holds costs nothing
+    assert matrix.add([(6, _coord(6)), (7, _coord(0))]) == (1, 1)
+    keys = [5, 0, 3, 2, 4, 7, 6]
+    assert len(matrix) == 7 and 1 not in matrix
+    expected = distance_matrix_km(coord_array([_coord(k % 7) for k in keys]))
+    matrices = matrix.matrices(keys)
+    assert np.allclose(matrices.km, expected)
+    assert np.array_equal(matrices.minutes, minutes_matrix(matrices.km, 40))
+
+
+def test_matrices_beyond_cache_capacity_are_still_correct() -> None:
+    matrix = _matrix(2)
+    matrix.add([(i, _coord(i)) for i in range(4)])
+    expected = distance_matrix_km(coord_array([_coord(i) for i in range(4)]))
+    assert np.allclose(matrix.matrices([0, 1, 2, 3]).km, expected)
+
+
+def test_sync_only_adds_new_and_moved_locations() -> None:
+    matrix = _matrix(10)
+    assert matrix.sync([("a", _coord(0)), ("b", _coord(1))]) == Synced(0, 2, 0, 2)
+    moved = _coord(7)
+    synced = matrix.sync([("b", moved), ("c", _coord(2)), ("a", _coord(0))])
+    assert synced == Synced(1, 2, 1, 2)
+    assert len(matrix) == 3
+    expected = distance_matrix_km(coord_array([_coord(0), moved, _coord(2)]))
+    assert np.allclose(matrix.matrices(["a", "b", "c"]).km, expected)
+    assert matrix.sync([("c", _coord(2))]) == Synced(1, 0, 1, 0)
+    assert "a" not in matrix
+
+
+def _task(task_id: str, i: int) -> TaskDTO:
+    return TaskDTO(id=task_id, kind="pickup", location=_coord(i), window=None, size=1)
+
+
+@pytest.mark.asyncio
+async def test_solve_reuses_matrix_between_runs(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(service, "_matrix", None)
+    monkeypatch.setattr(travel, "_cache", None)
+    monkeypatch.setattr(config, "SOLVER_DECOMPOSE", "off")
+    monkeypatch.setattr(config, "INCREMENTAL_MATRIX_MAX_LOCATIONS", 100)
+    vehicles = [VehicleDTO(id="v1", plate="p", capacity=10, office="o", division=None)]
+    tasks = [_task(f"t{i}", i) for i in range(4)]
+    keys = (
+        "matrix_locations_kept",
+        "matrix_locations_added",
+        "matrix_cache_hits",
+        "matrix_cache_misses",
+    )
+    first = await service.solve(tasks, vehicles, time_limit_seconds=1)
+    assert [first.stats[k] for k in keys] == [0, 5, 0, 5]
+    second = await service.solve(tasks[1:] + [_task("new", 9)], vehicles, None, None, 1)
+    assert [second.stats[k] for k in keys] == [4, 1, 4, 1]
+    assert service._matrix is not None and "t0" not in service._matrix
+    # the cache backs the tracked locations, so a disabled cache stops tracking
+    monkeypatch.setattr(config, "MATRIX_CACHE_SIZE", 0)
+    third = await service.solve(tasks, vehicles, time_limit_seconds=1)
+    assert "matrix_locations_added" not in third.stats
+    assert service._matrix is None
@@ -0,0 +1,203 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+import pytest
+
+from api.dtos import VehicleDTO
+import planner.insertion as insertion
+import planner.service as service
+from planner.dtos import Coord, PlanResultDTO, TaskDTO, TimeWindow, VehiclePlanDTO
+from planner.insertion import insert_task, remove_task, reschedule
+from planner.metrics import TravelMatrices
+from planner.problem import compile_problem
+from planner.solver import solve_plan
+from planner.travel import HaversineProvider, MatrixCache
+import config
+
+
+def _task(task_id: str, lon: float, size: int = 1) -> TaskDTO:
+    return TaskDTO(
+        id=task_id,
+        kind="pickup",
+        location=Coord(lat=0.0, lon=lon),
+        window=None,
+        size=size,
+    )
+
+
+def _setup() -> tuple[PlanResultDTO, dict[str, TaskDTO], list[VehicleDTO]]:
+    config.PLANNING_HORIZON_START = "08:00"
+    config.PLANNING_HORIZON_END = "18:00"
+    config.AVERAGE_SPEED_KMPH = 40
+    tasks = [_task("a", 0.1), _task("b", 0.3)]
+    vehicles = [VehicleDTO(id="v1", plate="p", capacity=3, office="o", division=None)]
+    plan = solve_plan(compile_problem([Coord(lat=0.0, lon=0.0)], tasks, vehicles))
+    return plan, {t.id: t for t in tasks}, vehicles
+
+
+def test_insert_between_existing_stops() -> None:
+    plan, tasks, vehicles = _setup()
+    new = _task("n", 0.2)
+    result = insert_task(plan, new, tasks, vehicles, closed_routes=False)
+    assert result is not None
+    vp = result.vehicle_plans[0]
+    assert vp.tasks_order == ["a", "n", "b"]
+    assert vp.eta == sorted(vp.eta)
+    expected = solve_plan(
+        compile_problem(
+            [Coord(lat=0.0, lon=0.0)], [tasks["a"], new, tasks["b"]], vehicles
+        )
+    )
+    assert vp.eta == expected.vehicle_plans[0].eta
+    assert result.objective_minutes == expected.objective_minutes
+
+
+def test_insert_respects_capacity_and_windows() -> None:
+    plan, tasks, vehicles = _setup()
+    assert insert_task(plan, _task("big", 0.2, size=2), tasks, vehicles, False) is None
+    late = _task("late", 0.2)
+    late.window = TimeWindow(start="08:00", end="08:01")
+    assert insert_task(plan, late, tasks, vehicles, closed_routes=True) is None
+
+
+@pytest.mark.asyncio
+async def test_failed_insertion_schedules_replan(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    plan, tasks, vehicles = _setup()
+    scheduled: list[bool] = []
+    monkeypatch.setattr(service, "_latest_plan", plan)
+    monkeypatch.setattr(service, "_latest_tasks", dict(tasks))
+    monkeypatch.setattr(service, "_latest_vehicles", vehicles)
+    monkeypatch.setattr(service, "_drift_minutes", 0)
+    monkeypatch.setattr(service, "request_replan", lambda: scheduled.append(True))
+    monkeypatch.setattr(config, "PLAN_DRIFT_THRESHOLD", 10.0)
+
+    assert await service.insert_new_task(_task("n", 0.2))
+    assert service.get_latest_plan() is not plan
+    assert not scheduled
+    assert not await service.insert_new_task(_task("big", 0.25, size=5))
+    assert scheduled == [True]
+
+
+def test_reschedule_adds_return_leg() -> None:
+    plan, tasks, _ = _setup()
+    closed = reschedule(plan, tasks, closed_routes=True)
+    vp, open_vp = closed.vehicle_plans[0], plan.vehicle_plans[0]
+    assert vp.tasks_order == open_vp.tasks_order
+    assert vp.eta == open_vp.eta
+    # 0.3 degrees of longitude back to the depot at 40 km/h
+    assert vp.total_minutes - open_vp.total_minutes == 50
+    assert closed.stats == plan.stats
+    reopened = reschedule(closed, tasks, closed_routes=False)
+    assert reopened.vehicle_plans == plan.vehicle_plans
+
+
+class _CountingProvider(HaversineProvider):
+    def __init__(self) -> None:
+        super().__init__(40)
+        self.rows = 0
+
+    def matrix(self, origins: np.ndarray, destinations: np.ndarray) -> TravelMatrices:
+        self.rows += len(origins)
+        return super().matrix(origins, destinations)
+
+
+def test_insertion_looks_legs_up_in_matrix_cache(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    config.PLANNING_HORIZON_START = "08:00"
+    config.PLANNING_HORIZON_END = "18:00"
+    config.AVERAGE_SPEED_KMPH = 40
+    depot = Coord(lat=0.0, lon=0.0)
+    tasks = [_task(f"t{i}", 0.01 * (i + 1)) for i in range(12)]
+    vehicles = [
+        VehicleDTO(id=f"v{i}", plate="p", capacity=10, office="o", division=None)
+        for i in range(4)
+    ]
+    routes = [tasks[i::4] for i in range(4)]
+    plan = PlanResultDTO(
+        generated_at="t",
+        depot=depot,
+        vehicle_plans=[
+            VehiclePlanDTO(
+                vehicle_id=v.id,
+                tasks_order=[t.id for t in r],
+                eta=[],
+                total_minutes=0,
+                total_km=0.0,
+            )
+            for v, r in zip(vehicles, routes)
+        ],
+        unscheduled=[],
+        objective_minutes=0,
+        stats={"solver_config": "x"},
+    )
+    by_id = {t.id: t for t in tasks}
+    provider = _CountingProvider()
+    cache = MatrixCache(100, 5, provider)
+    monkeypatch.setattr(insertion, "matrix_cache", lambda: cache)
+    plan = reschedule(plan, by_id, closed_routes=True)
+    provider.rows = 0
+    result = insert_task(plan, _task("n", 0.125), by_id, vehicles, True)
+    assert result is not None
+    # only the new location's costs are computed, once for all four routes
+    assert provider.rows == 1
+    assert result.stats == {"solver_config": "x"}
+    removed = remove_task(result, "n", {**by_id, "n": _task("n", 0.125)}, True)
+    assert provider.rows == 1 and removed.stats == {"solver_config": "x"}
+
+
+@pytest.mark.asyncio
+async def test_insertion_during_replan_schedules_follow_up(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    plan, tasks, vehicles = _setup()
+    monkeypatch.setattr(service, "_latest_plan", plan)
+    monkeypatch.setattr(service, "_latest_tasks", dict(tasks))
+    monkeypatch.setattr(service, "_latest_vehicles", vehicles)
+    monkeypatch.setattr(service, "_drift_minutes", 0)
+    monkeypatch.setattr(config, "PLAN_DRIFT_THRESHOLD", 10.0)
+    replans = 0
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def fake_replan() -> None:
+        nonlocal replans
+        replans += 1
+        started.set()
+        await release.wait()
+
+    coordinator = service.ReplanCoordinator(debounce_seconds=0.0)
+    monkeypatch.setattr(service, "replan_incremental", fake_replan)
+    monkeypatch.setattr(service, "_replan_coordinator", coordinator)
+    coordinator.request()
+    await started.wait()
+    assert await service.insert_new_task(_task("n", 0.2))
+    release.set()
+    while coordinator.running():
+        await asyncio.sleep(0.01)
+    assert replans == 2
+
+
+@pytest.mark.asyncio
+async def test_insertion_cancels_refinement(monkeypatch: pytest.MonkeyPatch) -> None:
+    plan, tasks, vehicles = _setup()
+    monkeypatch.setattr(service, "_latest_plan", plan)
+    monkeypatch.setattr(service, "_latest_tasks", dict(tasks))
+    monkeypatch.setattr(service, "_latest_vehicles", vehicles)
+    monkeypatch.setattr(service, "_drift_minutes", 0)
+    monkeypatch.setattr(config, "PLAN_DRIFT_THRESHOLD", 10.0)
+    cancelled: list[str] = []
+    monkeypatch.setattr(service, "cancel_solve", cancelled.append)
+    refinement = asyncio.create_task(asyncio.sleep(60))
+    monkeypatch.setattr(service, "_refinement", refinement)
+
+    assert await service.insert_new_task(_task("n", 0.2))
+    assert cancelled == ["refine"]
+    with pytest.raises(asyncio.CancelledError):
+        await refinement
@@ -0,0 +1,91 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+import pytest
+
+from api.dtos import VehicleDTO
+from planner.dtos import Coord, TaskDTO
+from planner.local_search import LocalSearch
+from planner.problem import compile_problem
+from planner.solver import solve_plan
+import config
+
+
+def _line(*positions: int) -> np.ndarray:
+    # node 0 is the depot at position 0
+    pos = np.array((0,) + positions, dtype=np.int64)
+    line: np.ndarray = np.abs(pos[:, None] - pos[None, :])
+    return line
+
+
+def _search(
+    routes: list[list[int]],
+    minutes: np.ndarray,
+    windows: list[tuple[int, int] | None] | None = None,
+    capacities: list[int] | None = None,
+    service: list[int] | None = None,
+) -> LocalSearch:
+    n = len(minutes)
+    return LocalSearch(
+        routes,
+        capacities or [n] * len(routes),
+        minutes,
+        windows or [None] * n,
+        service or [0] * n,
+        [0] + [1] * (n - 1),
+        0,
+    )
+
+
+def test_untangles_single_route() -> None:
+    routes = _search([[1, 3, 2, 4]], _line(1, 2, 3, 4)).run(1.0)
+    assert routes == [[1, 2, 3, 4]]
+
+
+def test_keeps_time_windows() -> None:
+    # visiting node 2 first is shorter, but its service would make node 1 late
+    windows: list[tuple[int, int] | None] = [None, (0, 4), None]
+    search = _search([[1, 2]], _line(4, 1), windows, service=[0, 0, 5])
+    assert search.run(1.0) == [[1, 2]]
+    assert _search([[1, 2]], _line(4, 1)).run(1.0) == [[2, 1]]
+
+
+def test_relocates_between_routes_within_capacity() -> None:
+    minutes = _line(1, 2, 50, 51)
+    routes = _search([[1, 4], [3, 2]], minutes, capacities=[2, 2]).run(1.0)
+    assert sorted(map(sorted, routes)) == [[1, 2], [3, 4]]
+    routes = _search([[1, 3], [4]], minutes, capacities=[2, 1]).run(1.0)
+    assert sum(len(r) for r in routes) == 3
+    assert len(routes[1]) <= 1
+
+
+def test_solve_plan_reports_moves(monkeypatch: pytest.MonkeyPatch) -> None:
+    config.PLANNING_HORIZON_START = "08:00"
+    tasks = [
+        TaskDTO(
+            id=f"t{i}",
+            kind="pickup",
+            location=Coord(lat=0.01 * (i % 4), lon=0.01 * (i // 4)),
+            window=None,
+            size=1,
+        )
+        for i in range(16)
+    ]
+    vehicles = [
+        VehicleDTO(id=f"v{i}", plate="p", capacity=8, office="o", division=None)
+        for i in range(2)
+    ]
+    depot = Coord(lat=0.0, lon=0.0)
+    monkeypatch.setattr(config, "LOCAL_SEARCH_SECONDS", 0)
+    problem = compile_problem([depot], tasks, vehicles)
+    greedy = solve_plan(problem)
+    assert "local_search_moves" not in greedy.stats
+    monkeypatch.setattr(config, "LOCAL_SEARCH_SECONDS", 1)
+    improved = solve_plan(problem)
+    assert improved.unscheduled == []
+    assert sum(vp.total_km for vp in improved.vehicle_plans) <= sum(
+        vp.total_km for vp in greedy.vehicle_plans
+    )
@@ -0,0 +1,106 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+import pytest
+
+import planner.service as service
+from planner.metrics import distance_matrix_km, minutes_matrix
+from planner.travel import HaversineProvider, MatrixCache, cost_matrices, matrix_cache
+import config
+
+_PROVIDER = HaversineProvider(40)
+
+
+def _points(*rows: tuple[float, float]) -> np.ndarray:
+    return np.array(rows, dtype=np.float64)
+
+
+def test_cache_only_computes_new_locations() -> None:
+    cache = MatrixCache(10, 5, _PROVIDER)
+    a, b, c = (40.0, -3.7), (40.1, -3.6), (40.2, -3.5)
+    result = cache.matrices(_points(a, b))
+    assert (result.hits, result.misses) == (0, 2)
+    assert np.allclose(result.km, distance_matrix_km(_points(a, b)))
+    result = cache.matrices(_points(c, a, b, a))
+    assert (result.hits, result.misses) == (2, 1)
+    assert np.allclose(result.km, distance_matrix_km(_points(c, a, b, a)))
+    assert np.array_equal(result.minutes, minutes_matrix(result.km, 40))
+    # locations closer than the precision share an entry
+    result = cache.matrices(_points((40.000001, -3.7)))
+    assert (result.hits, result.misses) == (1, 0)
+    assert (cache.hits, cache.misses) == (3, 3)
+
+
+def test_cache_evicts_least_recently_used() -> None:
+    cache = MatrixCache(2, 5, _PROVIDER)
+    a, b, c = (0.0, 0.0), (0.0, 0.1), (0.0, 0.2)
+    cache.matrices(_points(a))
+    cache.matrices(_points(b))
+    cache.matrices(_points(a))
+    cache.matrices(_points(c))
+    assert len(cache) == 2
+    result = cache.matrices(_points(a, c))
+    assert (result.hits, result.misses) == (2, 0)
+    assert np.allclose(result.km, distance_matrix_km(_points(a, c)))
+    result = cache.matrices(_points(b))
+    assert (result.hits, result.misses) == (0, 1)
+    # lookups larger than the cache bypass it
+    result = cache.matrices(_points(a, b, c))
+    assert (result.hits, result.misses) == (0, 3)
+    assert np.allclose(result.km, distance_matrix_km(_points(a, b, c)))
+
+
+def test_cache_persists_to_directory(tmp_path: Path) -> None:
+    a, b, c = (40.0, -3.7), (40.1, -3.6), (40.2, -3.5)
+    cache = MatrixCache(10, 5, _PROVIDER, tmp_path)
+    cache.matrices(_points(a, b, c))
+    cache.save()
+    reloaded = MatrixCache(2, 5, _PROVIDER, tmp_path)
+    result = reloaded.matrices(_points(b, c))
+    assert (result.hits, result.misses) == (2, 0)
+    assert np.allclose(result.km, distance_matrix_km(_points(b, c)))
+    assert np.array_equal(result.minutes, minutes_matrix(result.km, 40))
+    # another provider does not read this provider's file
+    assert len(MatrixCache(10, 5, HaversineProvider(20), tmp_path)) == 0
+
+
+def test_cost_matrices_report_cache_use(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(config, "MATRIX_CACHE_SIZE", 50)
+    monkeypatch.setattr(config, "MATRIX_CACHE_PRECISION", 4)
+    points = _points((1.0, 1.0), (1.0, 1.5))
+    first = cost_matrices(points)
+    again = cost_matrices(points)
+    assert (first.misses, again.hits, again.misses) == (2, 2, 0)
+    assert np.array_equal(first.minutes, again.minutes)
+    monkeypatch.setattr(config, "MATRIX_CACHE_SIZE", 0)
+    assert cost_matrices(points).hits == 0
+
+
+def test_cache_saves_only_when_asked(tmp_path: Path) -> None:
+    a, b = (40.0, -3.7), (40.1, -3.6)
+    cache = MatrixCache(3000, 5, _PROVIDER, tmp_path)
+    cache.matrices(_points(a, b))
+    assert cache.path is not None and not cache.path.exists()
+    assert cache.unsaved == 2
+    # the tables grow with use rather than being sized for the capacity
+    assert cache._km.shape[0] < cache.capacity
+    cache.save()
+    assert cache.unsaved == 0
+    assert len(MatrixCache(3000, 5, _PROVIDER, tmp_path)) == 2
+
+
+def test_service_persists_cache_with_new_locations(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    monkeypatch.setattr(config, "MATRIX_CACHE_SIZE", 50)
+    monkeypatch.setattr(config, "MATRIX_CACHE_DIR", str(tmp_path))
+    cache = matrix_cache()
+    assert cache is not None and cache.path is not None
+    cache.matrices(_points((1.0, 1.0), (1.0, 1.5)))
+    service.persist_matrix_cache()
+    saved = cache.path.stat().st_mtime_ns
+    service.persist_matrix_cache()
+    assert cache.path.stat().st_mtime_ns == saved
@@ -0,0 +1,70 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+import pytest
+
+from planner.dtos import Coord
+from planner.matrix_store import MatrixStore, build_store, matrix_store
+from planner.metrics import build_matrices
+from planner.problem import compile_problem, travel_matrices
+from planner.travel import HaversineProvider
+from scripts.build_matrix_store import main
+import config
+
+_PROVIDER = HaversineProvider(40)
+
+
+def _points(n: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return np.column_stack([40 + rng.random(n) * 0.2, -3.7 + rng.random(n) * 0.2])
+
+
+def test_store_matches_computed_matrices(tmp_path: Path) -> None:
+    points = _points(30)
+    path = build_store(points, tmp_path, 5, _PROVIDER, block_rows=7)
+    store = MatrixStore(path)
+    assert store.minutes.dtype == np.uint16 and store.meters.dtype == np.uint32
+    assert len(store) == 30
+    expected = build_matrices(points, 40)
+    stored = store.matrices(points[::-1], _PROVIDER)
+    assert np.allclose(stored.km, expected.km[::-1, ::-1], atol=0.002)
+    assert np.abs(stored.minutes - expected.minutes[::-1, ::-1]).max() <= 1
+    assert (stored.hits, stored.misses) == (30, 0)
+
+
+def test_unknown_points_are_computed(tmp_path: Path) -> None:
+    store = MatrixStore(build_store(_points(10), tmp_path, 5, _PROVIDER))
+    points = np.vstack([_points(10)[:4], _points(3, seed=1)])
+    result = store.matrices(points, _PROVIDER)
+    assert (result.hits, result.misses) == (4, 3)
+    assert np.allclose(result.km, build_matrices(points).km, atol=0.002)
+    assert np.array_equal(result.km, result.km.T)
+
+
+def test_rebuild_keeps_location_ids(tmp_path: Path) -> None:
+    first = MatrixStore(build_store(_points(5), tmp_path, 5, _PROVIDER))
+    points = np.vstack([_points(4, seed=2), _points(5)])
+    second = MatrixStore(build_store(points, tmp_path, 5, _PROVIDER))
+    assert len(second) == 9
+    assert second.rows(_points(5)).tolist() == first.rows(_points(5)).tolist()
+
+
+def test_travel_matrices_use_configured_store(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    csv_path = tmp_path / "locations.csv"
+    csv_path.write_text("id,lat,lon\na,0.0,0.0\nb,0.0,0.1\n")
+    main([str(csv_path), str(tmp_path / "store")])
+    monkeypatch.setattr(config, "MATRIX_STORE_DIR", str(tmp_path / "store"))
+    assert matrix_store() is not None
+    problem = compile_problem([Coord(lat=0.0, lon=0.0)], [], [])
+    matrices = travel_matrices(problem)
+    assert (matrices.hits, matrices.misses) == (1, 0)
+    # a store built with another provider is not used
+    monkeypatch.setattr(config, "AVERAGE_SPEED_KMPH", 20)
+    assert matrix_store() is None
+    monkeypatch.setattr(config, "MATRIX_STORE_DIR", "")
+    assert matrix_store() is None
@@ -0,0 +1,39 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from planner.dtos import Coord
+from planner.metrics import (
+    build_matrices,
+    coord_array,
+    distance_km,
+    distance_matrix_km,
+    travel_minutes,
+)
+
+
+def _coords() -> list[Coord]:
+    return [
+        Coord(lat=0.0, lon=0.0),
+        Coord(lat=0.0, lon=0.01),
+        Coord(lat=40.4, lon=-3.7),
+        Coord(lat=-33.9, lon=151.2),
+    ]
+
+
+def test_matrix_matches_scalar_functions() -> None:
+    coords = _coords()
+    matrices = build_matrices(coords, speed_kmph=40)
+    assert matrices.km.shape == (4, 4)
+    for i, a in enumerate(coords):
+        for j, b in enumerate(coords):
+            assert abs(matrices.km[i, j] - distance_km(a, b)) < 1e-6
+            assert matrices.minutes[i, j] == travel_minutes(a, b, 40)
+
+
+def test_rectangular_matrix() -> None:
+    coords = coord_array(_coords())
+    km = distance_matrix_km(coords[:1], coords)
+    assert km.shape == (1, 4)
+    assert km[0, 0] == 0.0
@@ -0,0 +1,140 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pytest
+
+from api.dtos import VehicleDTO
+import planner.service as service
+from planner.decompose import partition_by_office, rebalance_boundary
+from planner.dtos import Coord, PlanResultDTO, TaskDTO, VehiclePlanDTO
+from planner.insertion import insert_task, reschedule
+import config
+
+_NORTH = Coord(lat=1.0, lon=0.0)
+_SOUTH = Coord(lat=-1.0, lon=0.0)
+
+
+def _task(task_id: str, lat: float, lon: float, office: str | None = None) -> TaskDTO:
+    return TaskDTO(
+        id=task_id,
+        kind="pickup",
+        location=Coord(lat=lat, lon=lon),
+        window=None,
+        size=1,
+        office=office,
+    )
+
+
+def _vehicle(vehicle_id: str, office: str) -> VehicleDTO:
+    return VehicleDTO(
+        id=vehicle_id, plate="p", capacity=10, office=office, division=None
+    )
+
+
+@pytest.fixture
+def offices(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(config, "USE_MULTI_DEPOT", True)
+    monkeypatch.setattr(config, "OFFICE_DEPOTS", "north=1.0:0.0, south=-1.0:0.0")
+    monkeypatch.setattr(config, "DEPOT_LAT", 0.0)
+    monkeypatch.setattr(config, "DEPOT_LON", 0.0)
+
+
+def test_office_depots_parse(offices: None, monkeypatch: pytest.MonkeyPatch) -> None:
+    assert service._office_depots() == {"north": _NORTH, "south": _SOUTH}
+    assert service._depots() == [Coord(lat=0.0, lon=0.0), _NORTH, _SOUTH]
+    vehicles = [_vehicle("v1", "north"), _vehicle("v2", "west")]
+    assert service._vehicle_depots(vehicles) == {"v1": _NORTH}
+    monkeypatch.setattr(config, "OFFICE_DEPOTS", "north=1.0")
+    with pytest.raises(ValueError):
+        service._office_depots()
+    monkeypatch.setattr(config, "USE_MULTI_DEPOT", False)
+    assert service._office_depots() == {}
+
+
+def test_partition_by_office_sends_orphans_to_nearest_depot() -> None:
+    # the orphan is nearer the north tasks but nearer the south depot
+    tasks = [_task("n1", 0.2, 0.0, "north"), _task("x", -0.1, 0.0)]
+    vehicles = [_vehicle("v1", "north"), _vehicle("v2", "south")]
+    parts = partition_by_office(tasks, vehicles, {"north": _NORTH, "south": _SOUTH})
+    ids = {p.vehicles[0].id: [t.id for t in p.tasks] for p in parts}
+    assert ids == {"v1": ["n1"], "v2": ["x"]}
+
+
+def test_insertion_starts_at_vehicle_depot() -> None:
+    plan = PlanResultDTO(
+        generated_at="t",
+        depot=Coord(lat=0.0, lon=0.0),
+        vehicle_plans=[
+            VehiclePlanDTO(
+                vehicle_id="v1", tasks_order=[], eta=[], total_minutes=0, total_km=0.0
+            )
+        ],
+        unscheduled=[],
+        objective_minutes=0,
+    )
+    task = _task("a", 1.0, 0.01)
+    vehicles = [_vehicle("v1", "north")]
+    far = insert_task(plan, task, {}, vehicles, True)
+    near = insert_task(plan, task, {}, vehicles, True, {"v1": _NORTH})
+    assert far is not None and near is not None
+    assert near.vehicle_plans[0].total_km < 5 < far.vehicle_plans[0].total_km
+
+
+@pytest.mark.parametrize(
+    "routed, unscheduled",
+    [(["n1", "x"], []), (["n1"], ["x"])],
+)
+def test_rebalance_keeps_tasks_within_their_office(
+    routed: list[str], unscheduled: list[str]
+) -> None:
+    # "x" belongs to the north office but lies next to the south task
+    tasks = [
+        _task("n1", 0.1, 0.01, "north"),
+        _task("x", -0.09, 0.01, "north"),
+        _task("s1", -0.1, 0.01, "south"),
+    ]
+    vehicles = [_vehicle("v1", "north"), _vehicle("v2", "south")]
+    depots = {"v1": Coord(lat=0.1, lon=0.0), "v2": Coord(lat=-0.1, lon=0.0)}
+    plan = PlanResultDTO(
+        generated_at="t",
+        depot=Coord(lat=0.0, lon=0.0),
+        vehicle_plans=[
+            VehiclePlanDTO(
+                vehicle_id=v, tasks_order=order, eta=[], total_minutes=0, total_km=0.0
+            )
+            for v, order in (("v1", routed), ("v2", ["s1"]))
+        ],
+        unscheduled=unscheduled,
+        objective_minutes=0,
+    )
+    plan = reschedule(plan, {t.id: t for t in tasks}, True, depots)
+
+    def routes(within_office: bool) -> dict[str, list[str]]:
+        result = rebalance_boundary(
+            plan, tasks, vehicles, [["v1"], ["v2"]], True, depots, within_office
+        )
+        return {vp.vehicle_id: sorted(vp.tasks_order) for vp in result.vehicle_plans}
+
+    assert routes(False) == {"v1": ["n1"], "v2": ["s1", "x"]}
+    assert routes(True) == {"v1": ["n1", "x"], "v2": ["s1"]}
+
+
+@pytest.mark.asyncio
+async def test_service_solves_each_office_from_its_depot(
+    offices: None, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(config, "SOLVER_DECOMPOSE", "off")
+    monkeypatch.setattr(config, "SOLVER_TIMEOUT_SECONDS", 1)
+    tasks = [_task(f"n{i}", 1.0, 0.01 * (i + 1), "north") for i in range(3)]
+    tasks += [_task(f"s{i}", -1.0, 0.01 * (i + 1), "south") for i in range(3)]
+    tasks.append(_task("x", -0.99, 0.0))
+    vehicles = [_vehicle("v1", "north"), _vehicle("v2", "south")]
+    plan = await service.solve(tasks, vehicles)
+    assert plan.stats["offices"] == 2
+    assert plan.stats["partitions"] == 2
+    routes = {vp.vehicle_id: sorted(vp.tasks_order) for vp in plan.vehicle_plans}
+    assert routes == {"v1": ["n0", "n1", "n2"], "v2": ["s0", "s1", "s2", "x"]}
+    # routes from the shared default depot would drive over 200 km
+    assert all(vp.total_km < 20 for vp in plan.vehicle_plans)
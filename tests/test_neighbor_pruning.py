@@ -0,0 +1,59 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+import pytest
+
+from planner.dtos import Coord
+from planner.problem import compile_problem
+from planner.solver_ortools import (
+    _nearest_successors,
+    neighbor_count,
+    solve_plan_ortools,
+)
+import config
+from grid_day import grid_tasks, two_vehicles
+
+
+def test_neighbor_count_scales_with_size(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(config, "SOLVER_NEIGHBORS_MIN_TASKS", 100)
+    monkeypatch.setattr(config, "SOLVER_NEIGHBORS", 20)
+    assert neighbor_count(99) == 0
+    assert neighbor_count(100) == 20
+    assert neighbor_count(3600) == 60
+    monkeypatch.setattr(config, "SOLVER_NEIGHBORS_MIN_TASKS", 0)
+    assert neighbor_count(3600) == 0
+
+
+def test_nearest_successors_skip_self_and_depots() -> None:
+    # node 0 is the depot, 1..4 are tasks on a line
+    pos = np.array([0, 1, 2, 3, 10])
+    matrix = np.abs(pos[:, None] - pos[None, :]).astype(np.int64)
+    nearest = _nearest_successors(matrix, 1, 2)
+    assert [sorted(row) for row in nearest.tolist()] == [
+        [2, 3],
+        [1, 3],
+        [1, 2],
+        [2, 3],
+    ]
+
+
+def test_pruned_solve_schedules_everything(monkeypatch: pytest.MonkeyPatch) -> None:
+    config.PLANNING_HORIZON_START = "08:00"
+    monkeypatch.setattr(config, "SOLVER_NEIGHBORS_MIN_TASKS", 1)
+    monkeypatch.setattr(config, "SOLVER_NEIGHBORS", 3)
+    problem = compile_problem(
+        [Coord(lat=0.0, lon=0.0)], grid_tasks(40, columns=8), two_vehicles(40)
+    )
+    plan = solve_plan_ortools(problem, None, 1)
+    assert plan.stats["neighbors"] == 7
+    assert plan.unscheduled == []
+    # the warm-start hint may use arcs outside the candidate lists
+    hint = {
+        "v0": [f"t{i}" for i in range(0, 40, 2)],
+        "v1": [f"t{i}" for i in range(1, 40, 2)],
+    }
+    plan = solve_plan_ortools(problem, hint, 1)
+    assert plan.unscheduled == []
@@ -36,7 +36,7 @@ async def test_build_today_plan(monkeypatch: pytest.MonkeyPatch) -> None:
     monkeypatch.setattr(service, "get_vehicles", fake_get_vehicles)
     monkeypatch.setattr(service, "get_crews", fake_get_crews)
     monkeypatch.setattr(service, "get_today_stops", fake_get_today_stops)
-    monkeypatch.setattr(service, "save_plan", lambda plan: None)
+    monkeypatch.setattr(service, "save_plan", lambda plan, tasks=None: None)
 
     plan = await service.build_today_plan()
     assert service.get_latest_plan() is plan
@@ -0,0 +1,84 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pytest
+
+from api.dtos import VehicleDTO
+import planner.service as service
+from planner.dtos import Coord, TaskDTO
+import config
+
+
+def test_portfolio_parsing(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(config, "SOLVER_METAHEURISTIC", "GUIDED_LOCAL_SEARCH")
+    monkeypatch.setattr(
+        config, "SOLVER_PORTFOLIO", "SAVINGS:TABU_SEARCH, PATH_CHEAPEST_ARC"
+    )
+    assert service._portfolio() == [
+        ("SAVINGS", "TABU_SEARCH"),
+        ("PATH_CHEAPEST_ARC", "GUIDED_LOCAL_SEARCH"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_portfolio_keeps_best_and_records_winner(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    configs = "PATH_CHEAPEST_ARC:GUIDED_LOCAL_SEARCH,SAVINGS:TABU_SEARCH"
+    monkeypatch.setattr(config, "SOLVER_PORTFOLIO", configs)
+    monkeypatch.setattr(config, "SOLVER_WORKERS", 2)
+    monkeypatch.setattr(config, "SOLVER_TIMEOUT_SECONDS", 1)
+    config.DEPOT_LAT = 0.0
+    config.DEPOT_LON = 0.0
+    tasks = [
+        TaskDTO(
+            id=f"t{i}",
+            kind="pickup",
+            location=Coord(lat=0.01 * (i % 3), lon=0.01 * i),
+            window=None,
+            size=1,
+        )
+        for i in range(6)
+    ]
+    vehicles = [VehicleDTO(id="v1", plate="p", capacity=10, office="o", division=None)]
+    plan = await service.solve(tasks, vehicles)
+    assert plan.unscheduled == []
+    assert plan.stats["portfolio_size"] == 2
+    assert str(plan.stats["solver_config"]).replace("+", ":") in configs.split(",")
+    metrics = service._plan_metrics(plan, len(tasks), 0)
+    assert metrics["solver_config"] == plan.stats["solver_config"]
+
+
+@pytest.mark.asyncio
+async def test_decomposed_day_skips_portfolio(monkeypatch: pytest.MonkeyPatch) -> None:
+    configs = "PATH_CHEAPEST_ARC:GUIDED_LOCAL_SEARCH,SAVINGS:TABU_SEARCH"
+    monkeypatch.setattr(config, "SOLVER_PORTFOLIO", configs)
+    monkeypatch.setattr(config, "SOLVER_DECOMPOSE", "vehicle")
+    monkeypatch.setattr(config, "SOLVER_DECOMPOSE_MIN_TASKS", 1)
+    monkeypatch.setattr(config, "SOLVER_TIMEOUT_SECONDS", 1)
+    config.DEPOT_LAT = 0.0
+    config.DEPOT_LON = 0.0
+
+    async def fan_out(*args: object) -> None:
+        raise AssertionError("portfolio run inside a partition")
+
+    monkeypatch.setattr(service, "_solve_portfolio", fan_out)
+    tasks = [
+        TaskDTO(
+            id=f"t{i}",
+            kind="pickup",
+            location=Coord(lat=0.0, lon=0.01 * (i - 2)),
+            window=None,
+            size=1,
+        )
+        for i in range(5)
+    ]
+    vehicles = [
+        VehicleDTO(id=f"v{i}", plate="p", capacity=10, office="o", division=None)
+        for i in range(2)
+    ]
+    plan = await service.solve(tasks, vehicles)
+    assert plan.stats["partitions"] == 2
+    assert plan.unscheduled == []
@@ -0,0 +1,109 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pytest
+
+from api.dtos import VehicleDTO
+import planner.service as service
+from planner.dtos import Coord, TaskDTO, TimeWindow
+from planner.presolve import presolve
+import config
+
+_DEPOT = Coord(lat=0.0, lon=0.0)
+_VEHICLES = [
+    VehicleDTO(id="v1", plate="p", capacity=5, office="o", division=None),
+    VehicleDTO(id="v2", plate="p", capacity=8, office="o", division=None),
+]
+
+
+def _task(
+    task_id: str, lon: float, window: tuple[str, str] | None = None, size: int = 1
+) -> TaskDTO:
+    return TaskDTO(
+        id=task_id,
+        kind="pickup",
+        location=Coord(lat=0.0, lon=lon),
+        window=TimeWindow(start=window[0], end=window[1]) if window else None,
+        size=size,
+        service_minutes=10,
+    )
+
+
+@pytest.fixture(autouse=True)
+def _horizon(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(config, "PLANNING_HORIZON_START", "08:00")
+    monkeypatch.setattr(config, "PLANNING_HORIZON_END", "18:00")
+    monkeypatch.setattr(config, "AVERAGE_SPEED_KMPH", 40)
+    monkeypatch.setattr(config, "SPEED_PROFILE", "")
+
+
+def test_drops_tasks_with_reason_codes() -> None:
+    # 0.12 degrees of longitude at the equator is 20 minutes at 40 km/h
+    tasks = [
+        _task("big", 0.01, size=9),
+        _task("backwards", 0.01, ("10:00", "09:00")),
+        _task("early", 0.01, ("06:00", "07:30")),
+        _task("late", 0.01, ("18:30", "19:00")),
+        _task("far", 0.12, ("08:00", "08:15")),
+        _task("ok", 0.12, ("08:00", "09:00")),
+    ]
+    result = presolve(tasks, _VEHICLES, [_DEPOT], closed_routes=True)
+    assert result.dropped == {
+        "big": "exceeds_capacity",
+        "backwards": "window_invalid",
+        "early": "window_outside_horizon",
+        "late": "window_outside_horizon",
+        "far": "window_unreachable",
+    }
+    assert [t.id for t in result.tasks] == ["ok"]
+
+
+def test_tightens_windows() -> None:
+    tasks = [_task("windowed", 0.12, ("07:00", "17:55")), _task("free", 0.12)]
+    closed = presolve(tasks, _VEHICLES, [_DEPOT], closed_routes=True)
+    assert closed.tightened == 1
+    # reached at 08:20, and 10 minutes of service plus 20 back by 18:00
+    assert closed.tasks[0].window == TimeWindow(start="08:20", end="17:30")
+    # tasks without a window stay windowless, so solvers do not time them as
+    # windowed ones
+    assert closed.tasks[1].window is None
+    # open routes do not return
+    open_ = presolve(tasks, _VEHICLES, [_DEPOT], closed_routes=False)
+    assert open_.tightened == 1
+    assert open_.tasks[0].window == TimeWindow(start="08:20", end="17:55")
+    assert open_.tasks[1].window is None
+    # the original tasks are left untouched
+    assert tasks[0].window == TimeWindow(start="07:00", end="17:55")
+
+
+def test_drops_windowless_tasks_too_far_to_return() -> None:
+    task = _task("remote", 3.0)
+    closed = presolve([task], _VEHICLES, [_DEPOT], closed_routes=True)
+    assert closed.dropped == {"remote": "window_unreachable"}
+    open_ = presolve([task], _VEHICLES, [_DEPOT], closed_routes=False)
+    assert not open_.dropped
+
+
+def test_fastest_hour_decides_reachability(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(config, "SPEED_PROFILE", "8-9=20,12-13=80")
+    task = _task("t", 0.12, ("08:00", "08:30"))
+    result = presolve([task], _VEHICLES, [_DEPOT], closed_routes=True)
+    window = result.tasks[0].window
+    assert not result.dropped and window is not None and window.start == "08:10"
+
+
+@pytest.mark.asyncio
+async def test_solve_reports_dropped_tasks(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(config, "DEPOT_LAT", 0.0)
+    monkeypatch.setattr(config, "DEPOT_LON", 0.0)
+    monkeypatch.setattr(config, "SOLVER_DECOMPOSE", "off")
+    tasks = [_task("big", 0.01, size=9), _task("ok", 0.01)]
+    plan = await service.solve(tasks, _VEHICLES, time_limit_seconds=1)
+    assert plan.unscheduled == ["big"]
+    assert plan.stats["presolve_dropped"] == 1
+    assert plan.stats["presolve_exceeds_capacity"] == 1
+    monkeypatch.setattr(config, "SOLVER_PRESOLVE", False)
+    plan = await service.solve(tasks, _VEHICLES, time_limit_seconds=1)
+    assert plan.unscheduled == ["big"] and "presolve_dropped" not in plan.stats
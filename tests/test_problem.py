@@ -0,0 +1,71 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from datetime import date, datetime
+import time
+
+import pytest
+
+from api.dtos import VehicleDTO
+from planner.dtos import Coord, TaskDTO, TimeWindow
+from planner.problem import compile_problem, format_time, horizon_date, parse_time
+import config
+
+
+def test_compile_problem_arrays() -> None:
+    config.PLANNING_HORIZON_START = "08:00"
+    config.PLANNING_HORIZON_END = "18:00"
+    tasks = [
+        TaskDTO(
+            id="a",
+            kind="pickup",
+            location=Coord(lat=1.0, lon=2.0),
+            window=TimeWindow(start="09:00", end="10:30"),
+            size=3,
+            service_minutes=7,
+        ),
+        TaskDTO(
+            id="b",
+            kind="delivery",
+            location=Coord(lat=3.0, lon=4.0),
+            window=None,
+            size=1,
+        ),
+    ]
+    vehicles = [VehicleDTO(id="v1", plate="p", capacity=5, office="o", division=None)]
+    problem = compile_problem([Coord(lat=0.0, lon=0.0)], tasks, vehicles)
+    assert problem.task_ids == ["a", "b"]
+    assert problem.windows.tolist() == [[540, 630], [480, 1080]]
+    assert problem.windowed.tolist() == [True, False]
+    assert problem.demands.tolist() == [3, 1]
+    assert problem.service.tolist() == [7, config.SERVICE_TIME_MINUTES_DEFAULT]
+    assert problem.vehicle_ids == ["v1"]
+    assert problem.capacities.tolist() == [5]
+    assert problem.locations.tolist() == [[0.0, 0.0], [1.0, 2.0], [3.0, 4.0]]
+    assert (problem.horizon_start, problem.horizon_end) == (480, 1080)
+
+
+def test_compile_problem_empty_day() -> None:
+    problem = compile_problem([Coord(lat=0.0, lon=0.0)], [], [])
+    assert problem.task_coords.shape == (0, 2)
+    assert problem.windows.shape == (0, 2)
+    assert problem.locations.shape == (1, 2)
+
+
+def test_time_round_trip() -> None:
+    assert parse_time("07:05") == 425
+    assert format_time(425) == "07:05"
+
+
+def test_horizon_date_is_local(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("TZ", "Asia/Tokyo")
+    time.tzset()
+    try:
+        # Sunday night in UTC is already Monday morning in Tokyo
+        moment = datetime.fromisoformat("2024-01-07T23:30:00+00:00")
+        assert horizon_date(moment) == date(2024, 1, 8)
+    finally:
+        monkeypatch.undo()
+        time.tzset()
@@ -0,0 +1,74 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pytest
+
+import planner.service as service
+
+
+@pytest.mark.asyncio
+async def test_burst_is_coalesced(monkeypatch: pytest.MonkeyPatch) -> None:
+    runs = 0
+
+    async def fake_replan() -> None:
+        nonlocal runs
+        runs += 1
+
+    monkeypatch.setattr(service, "replan_incremental", fake_replan)
+    coordinator = service.ReplanCoordinator(debounce_seconds=0.05)
+    for _ in range(20):
+        coordinator.request()
+    while coordinator.running():
+        await asyncio.sleep(0.01)
+    assert runs == 1
+
+
+@pytest.mark.asyncio
+async def test_requests_during_run_fold_into_one_follow_up(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    runs = 0
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def fake_replan() -> None:
+        nonlocal runs
+        runs += 1
+        started.set()
+        await release.wait()
+
+    monkeypatch.setattr(service, "replan_incremental", fake_replan)
+    coordinator = service.ReplanCoordinator(debounce_seconds=0.0)
+    coordinator.request()
+    await started.wait()
+    for _ in range(5):
+        coordinator.request()
+    release.set()
+    while coordinator.running():
+        await asyncio.sleep(0.01)
+    assert runs == 2
+
+
+@pytest.mark.asyncio
+async def test_superseded_replan_keeps_coordinator_running(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    runs = 0
+
+    async def fake_replan() -> None:
+        nonlocal runs
+        runs += 1
+        if runs == 1:
+            # what the solver pool raises for a job stopped by cancel_solve
+            coordinator.request()
+            raise asyncio.CancelledError("replan")
+
+    monkeypatch.setattr(service, "replan_incremental", fake_replan)
+    coordinator = service.ReplanCoordinator(debounce_seconds=0.0)
+    coordinator.request()
+    while coordinator.running():
+        await asyncio.sleep(0.01)
+    assert runs == 2
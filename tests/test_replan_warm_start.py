@@ -0,0 +1,112 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pytest
+
+from api.dtos import VehicleDTO
+import planner.service as service
+from planner.dtos import Coord, PlanResultDTO, TaskDTO, TimeWindow, VehiclePlanDTO
+from planner.problem import compile_problem
+from planner.solver_ortools import solve_plan_ortools
+import config
+
+
+def _task(task_id: str, lon: float, window: TimeWindow | None = None) -> TaskDTO:
+    return TaskDTO(
+        id=task_id,
+        kind="pickup",
+        location=Coord(lat=0.0, lon=lon),
+        window=window,
+        size=1,
+    )
+
+
+def _vehicles() -> list[VehicleDTO]:
+    return [
+        VehicleDTO(id="v1", plate="p1", capacity=5, office="o", division=None),
+        VehicleDTO(id="v2", plate="p2", capacity=5, office="o", division=None),
+    ]
+
+
+def test_warm_start_inserts_new_task() -> None:
+    config.PLANNING_HORIZON_START = "08:00"
+    tasks = [_task("a", 0.01), _task("b", 0.02), _task("new", 0.015)]
+    plan = solve_plan_ortools(
+        compile_problem([Coord(lat=0.0, lon=0.0)], tasks, _vehicles()),
+        initial_routes={"v1": ["a", "b", "gone"], "v2": []},
+        time_limit_seconds=1,
+    )
+    assigned = [t for v in plan.vehicle_plans for t in v.tasks_order]
+    assert sorted(assigned) == ["a", "b", "new"]
+    assert plan.unscheduled == []
+
+
+def test_infeasible_hint_falls_back_to_cold_start() -> None:
+    config.PLANNING_HORIZON_START = "08:00"
+    tasks = [_task("a", 0.01, TimeWindow(start="08:00", end="08:05")), _task("b", 1)]
+    plan = solve_plan_ortools(
+        compile_problem([Coord(lat=0.0, lon=0.0)], tasks, _vehicles()),
+        initial_routes={"v1": ["b", "a"]},
+        time_limit_seconds=1,
+    )
+    assert sorted(t for v in plan.vehicle_plans for t in v.tasks_order) == ["a", "b"]
+
+
+@pytest.mark.asyncio
+async def test_replan_seeds_from_latest_plan(monkeypatch: pytest.MonkeyPatch) -> None:
+    old_a = _task("a", 0.01)
+    stops = [old_a, _task("b", 0.03, TimeWindow(start="09:00", end="10:00"))]
+    seen: dict[str, object] = {}
+
+    async def fake_get_vehicles() -> list[VehicleDTO]:
+        return _vehicles()
+
+    async def fake_get_today_stops() -> list[TaskDTO]:
+        return stops
+
+    async def fake_solve(
+        tasks: list[TaskDTO], vehicles: list[VehicleDTO], **kwargs: object
+    ) -> PlanResultDTO:
+        seen.update(kwargs)
+        return PlanResultDTO(
+            generated_at="2024-01-01T00:00:00Z",
+            depot=Coord(lat=0.0, lon=0.0),
+            vehicle_plans=[],
+            unscheduled=[t.id for t in tasks],
+            objective_minutes=0,
+        )
+
+    monkeypatch.setattr(service, "get_vehicles", fake_get_vehicles)
+    monkeypatch.setattr(service, "get_today_stops", fake_get_today_stops)
+    monkeypatch.setattr(service, "solve", fake_solve)
+    monkeypatch.setattr(service, "save_plan", lambda plan, tasks=None: None)
+    monkeypatch.setattr(service, "_latest_tasks", {"a": old_a, "b": _task("b", 0.03)})
+    monkeypatch.setattr(
+        service,
+        "_latest_plan",
+        PlanResultDTO(
+            generated_at="2024-01-01T00:00:00Z",
+            depot=Coord(lat=0.0, lon=0.0),
+            vehicle_plans=[
+                VehiclePlanDTO(
+                    vehicle_id="v1",
+                    tasks_order=["a", "b"],
+                    eta=["08:02", "09:00"],
+                    total_minutes=65,
+                    total_km=3.3,
+                )
+            ],
+            unscheduled=[],
+            objective_minutes=65,
+        ),
+    )
+    monkeypatch.setattr(config, "SOLVER_TIMEOUT_SECONDS", 20)
+    monkeypatch.setattr(config, "SOLVER_SECONDS_PER_TASK", 10)
+    monkeypatch.setattr(config, "REPLAN_TIME_FRACTION", 0.25)
+
+    await service.replan_incremental()
+    # "b" changed its window, so only "a" is kept as a hint
+    assert seen["initial_routes"] == {"v1": ["a"]}
+    assert seen["time_limit_seconds"] == 5
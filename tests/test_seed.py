@@ -0,0 +1,130 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pytest
+
+from api.dtos import VehicleDTO
+import planner.service as service
+from planner.dtos import Coord, PlanResultDTO, TaskDTO, VehiclePlanDTO
+from planner.seed import seed_routes
+import config
+
+
+def _task(task_id: str, lat: float, lon: float, size: int = 1) -> TaskDTO:
+    return TaskDTO(
+        id=task_id,
+        kind="pickup",
+        location=Coord(lat=lat, lon=lon),
+        window=None,
+        size=size,
+    )
+
+
+def _vehicle(vehicle_id: str, capacity: int = 10) -> VehicleDTO:
+    return VehicleDTO(
+        id=vehicle_id, plate="p", capacity=capacity, office="o", division=None
+    )
+
+
+def _past_plan(routes: dict[str, list[str]]) -> PlanResultDTO:
+    return PlanResultDTO(
+        generated_at="2024-01-01T07:00:00Z",
+        depot=Coord(lat=0.0, lon=0.0),
+        vehicle_plans=[
+            VehiclePlanDTO(
+                vehicle_id=v,
+                tasks_order=order,
+                eta=["08:00"] * len(order),
+                total_minutes=0,
+                total_km=0.0,
+            )
+            for v, order in routes.items()
+        ],
+        unscheduled=[],
+        objective_minutes=0,
+    )
+
+
+def test_seed_maps_past_tasks_by_id_then_place() -> None:
+    past = _past_plan({"v1": ["old-b", "a", "old-c"], "gone": ["old-d"]})
+    locations = {
+        "old-b": Coord(lat=0.0, lon=0.02),
+        "a": Coord(lat=0.0, lon=0.01),
+        "old-c": Coord(lat=0.0, lon=0.03),
+        "old-d": Coord(lat=0.0, lon=0.04),
+    }
+    today = [
+        _task("a", 0.0, 0.01),
+        # a few metres from where old-b was
+        _task("b", 0.00001, 0.02),
+        _task("b2", 0.0, 0.02),
+        _task("d", 0.0, 0.04),
+        _task("new", 1.0, 1.0),
+    ]
+    seed = seed_routes(past, locations, today, [_vehicle("v1")])
+    assert seed.routes == {"v1": ["b", "b2", "a"]}
+    assert seed.seeded == 3
+
+
+def test_seed_places_use_their_own_precision(monkeypatch: pytest.MonkeyPatch) -> None:
+    past = _past_plan({"v1": ["old-b"]})
+    locations = {"old-b": Coord(lat=0.0, lon=0.02)}
+    today = [_task("b", 0.00001, 0.02)]
+    monkeypatch.setattr(config, "SOLVER_AGGREGATE_PRECISION", 6)
+    assert seed_routes(past, locations, today, [_vehicle("v1")]).seeded == 1
+    monkeypatch.setattr(config, "PLAN_SEED_PRECISION", 6)
+    assert seed_routes(past, locations, today, [_vehicle("v1")]).seeded == 0
+
+
+def test_seed_stops_at_vehicle_capacity() -> None:
+    past = _past_plan({"v1": ["a", "b", "c"]})
+    today = [_task("a", 0.0, 0.01, 2), _task("b", 0.0, 0.02, 2), _task("c", 0.0, 0.03)]
+    seed = seed_routes(past, {}, today, [_vehicle("v1", 3)])
+    assert seed.routes == {"v1": ["a", "c"]}
+
+
+@pytest.mark.asyncio
+async def test_build_today_plan_seeds_from_weekday_plan(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(config, "SOLVER_TIMEOUT_SECONDS", 1)
+    today = [_task("a", 0.0, 0.01), _task("b", 0.0, 0.02)]
+    past = _past_plan({"v1": ["old-b", "a"]})
+    locations = {"old-b": Coord(lat=0.0, lon=0.02), "a": Coord(lat=0.0, lon=0.01)}
+    seeds: list[dict[str, list[str]] | None] = []
+    solve = service.solve
+
+    async def fake_get_vehicles() -> list[VehicleDTO]:
+        return [_vehicle("v1")]
+
+    async def fake_get_crews() -> list[object]:
+        return []
+
+    async def fake_get_today_stops() -> list[TaskDTO]:
+        return today
+
+    async def recording_solve(
+        stops: list[TaskDTO],
+        vehicles: list[VehicleDTO],
+        initial_routes: dict[str, list[str]] | None = None,
+    ) -> PlanResultDTO:
+        seeds.append(initial_routes)
+        return await solve(stops, vehicles, initial_routes=initial_routes)
+
+    monkeypatch.setattr(service, "get_vehicles", fake_get_vehicles)
+    monkeypatch.setattr(service, "get_crews", fake_get_crews)
+    monkeypatch.setattr(service, "get_today_stops", fake_get_today_stops)
+    monkeypatch.setattr(service, "save_plan", lambda plan, tasks=None: None)
+    monkeypatch.setattr(service, "get_weekday_plan", lambda day: (past, locations))
+    monkeypatch.setattr(service, "solve", recording_solve)
+
+    plan = await service.build_today_plan()
+    assert seeds == [{"v1": ["b", "a"]}]
+    assert plan.stats["seeded_tasks"] == 2
+    assert sorted(plan.vehicle_plans[0].tasks_order) == ["a", "b"]
+
+    monkeypatch.setattr(config, "PLAN_SEED", False)
+    await service.build_today_plan()
+    assert seeds[-1] is None
@@ -3,8 +3,14 @@ from pathlib import Path
 
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 
+import pytest
+
 from planner.dtos import Coord, TaskDTO, TimeWindow
+from planner.problem import compile_problem
+import planner.solver as solver
 from planner.solver import solve_plan
+import planner.travel as travel
+from planner.travel import HaversineProvider
 from api.dtos import VehicleDTO
 import config
 
@@ -39,8 +45,44 @@ def test_solver_basic() -> None:
         VehicleDTO(id="v1", plate="p1", capacity=4, office="o", division=None),
         VehicleDTO(id="v2", plate="p2", capacity=2, office="o", division=None),
     ]
-    plan = solve_plan(depot, tasks, vehicles)
+    plan = solve_plan(compile_problem([depot], tasks, vehicles))
     assigned = [t for v in plan.vehicle_plans for t in v.tasks_order]
     assert set(assigned) == {"a", "b"}
     assert plan.unscheduled == ["c"]
     assert len(assigned) + len(plan.unscheduled) == len(tasks)
+
+
+@pytest.mark.parametrize("max_tasks", [0, 100])
+def test_solver_times_legs_with_travel_cost_provider(
+    monkeypatch: pytest.MonkeyPatch, max_tasks: int
+) -> None:
+    # roads ten times slower than the straight line at the average speed
+    slow = HaversineProvider(4)
+    monkeypatch.setattr(travel, "travel_cost_provider", lambda: slow)
+    monkeypatch.setattr(solver, "travel_cost_provider", lambda: slow)
+    monkeypatch.setattr(config, "MATRIX_CACHE_SIZE", 0)
+    monkeypatch.setattr(config, "AVERAGE_SPEED_KMPH", 40)
+    monkeypatch.setattr(config, "SPEED_PROFILE", "")
+    monkeypatch.setattr(config, "PLANNING_HORIZON_START", "08:00")
+    monkeypatch.setattr(config, "LOCAL_SEARCH_MAX_TASKS", max_tasks)
+    tasks = [
+        TaskDTO(
+            id="near",
+            kind="pickup",
+            location=Coord(lat=0.0, lon=0.01),
+            window=None,
+            size=1,
+        ),
+        # 17 minutes away in a straight line, nearly three hours by road
+        TaskDTO(
+            id="far",
+            kind="pickup",
+            location=Coord(lat=0.0, lon=0.1),
+            window=TimeWindow(start="08:00", end="08:30"),
+            size=1,
+        ),
+    ]
+    vehicles = [VehicleDTO(id="v1", plate="p1", capacity=4, office="o", division=None)]
+    plan = solve_plan(compile_problem([Coord(lat=0.0, lon=0.0)], tasks, vehicles))
+    assert plan.unscheduled == ["far"]
+    assert plan.vehicle_plans[0].eta == ["08:17"]
@@ -4,6 +4,7 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 
 from planner.dtos import Coord, TaskDTO
+from planner.problem import compile_problem
 from planner.solver_ortools import solve_plan_ortools
 from api.dtos import VehicleDTO
 import config
@@ -32,9 +33,9 @@ def test_speed_affects_objective() -> None:
     depots = [Coord(lat=0.0, lon=0.0)]
     vehicles = [VehicleDTO(id="v1", plate="p", capacity=5, office="o", division=None)]
     config.AVERAGE_SPEED_KMPH = 40
-    plan_fast = solve_plan_ortools(depots, _make_tasks(), vehicles)
+    plan_fast = solve_plan_ortools(compile_problem(depots, _make_tasks(), vehicles))
     config.AVERAGE_SPEED_KMPH = 20
-    plan_slow = solve_plan_ortools(depots, _make_tasks(), vehicles)
+    plan_slow = solve_plan_ortools(compile_problem(depots, _make_tasks(), vehicles))
     assert plan_slow.objective_minutes > plan_fast.objective_minutes
 
 
@@ -44,8 +45,8 @@ def test_service_time_affects_objective() -> None:
     config.AVERAGE_SPEED_KMPH = 40
     tasks = _make_tasks()
     tasks[0].service_minutes = 5
-    plan1 = solve_plan_ortools(depots, tasks, vehicles)
+    plan1 = solve_plan_ortools(compile_problem(depots, tasks, vehicles))
     tasks = _make_tasks()
     tasks[0].service_minutes = 20
-    plan2 = solve_plan_ortools(depots, tasks, vehicles)
+    plan2 = solve_plan_ortools(compile_problem(depots, tasks, vehicles))
     assert plan2.objective_minutes > plan1.objective_minutes
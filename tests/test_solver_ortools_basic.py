@@ -4,6 +4,7 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 
 from planner.dtos import Coord, TaskDTO, TimeWindow
+from planner.problem import compile_problem
 from planner.solver_ortools import solve_plan_ortools
 from api.dtos import VehicleDTO
 import config
@@ -39,10 +40,36 @@ def test_solver_ortools_basic() -> None:
         VehicleDTO(id="v1", plate="p1", capacity=4, office="o", division=None),
         VehicleDTO(id="v2", plate="p2", capacity=2, office="o", division=None),
     ]
-    plan = solve_plan_ortools(depots, tasks, vehicles)
+    plan = solve_plan_ortools(compile_problem(depots, tasks, vehicles))
     assigned = [t for v in plan.vehicle_plans for t in v.tasks_order]
     assert set(assigned) == {"a", "b"}
     assert plan.unscheduled == ["c"]
     for vp in plan.vehicle_plans:
         assert vp.total_minutes >= 0
         assert vp.total_km >= 0.0
+
+
+def test_solver_ortools_window_before_horizon() -> None:
+    config.PLANNING_HORIZON_START = "08:00"
+    tasks = [
+        TaskDTO(
+            id="early",
+            kind="pickup",
+            location=Coord(lat=0.0, lon=0.01),
+            window=TimeWindow(start="06:00", end="07:00"),
+            size=1,
+        ),
+        TaskDTO(
+            id="late",
+            kind="pickup",
+            location=Coord(lat=0.0, lon=0.02),
+            window=TimeWindow(start="11:00", end="12:00"),
+            size=1,
+        ),
+    ]
+    vehicles = [VehicleDTO(id="v1", plate="p1", capacity=4, office="o", division=None)]
+    problem = compile_problem([Coord(lat=0.0, lon=0.0)], tasks, vehicles)
+    plan = solve_plan_ortools(problem, None, 1)
+    assert plan.unscheduled == ["early"]
+    assert plan.vehicle_plans[0].tasks_order == ["late"]
+    assert "11:00" <= plan.vehicle_plans[0].eta[0] <= "12:00"
@@ -0,0 +1,76 @@
+import random
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+
+from api.dtos import VehicleDTO
+from planner.dtos import Coord, TaskDTO, TimeWindow
+from planner.problem import compile_problem
+from planner.solver import solve_plan
+from planner.spatial import GridIndex
+import config
+
+
+def test_nearest_matches_brute_force() -> None:
+    rng = random.Random(3)
+    points = np.array(
+        [[rng.uniform(40.0, 40.2), rng.uniform(-3.8, -3.6)] for _ in range(300)]
+    )
+    index = GridIndex(points)
+    for i in range(0, 300, 3):
+        index.remove(i)
+    removed = set(range(0, 300, 3))
+    for _ in range(50):
+        lat, lon = rng.uniform(39.9, 40.3), rng.uniform(-3.9, -3.5)
+        x, y = index.project(lat, lon)
+        expected = min(
+            (
+                ((px - x) ** 2 + (py - y) ** 2, i)
+                for i, (px, py) in enumerate(index.project(*p) for p in points)
+                if i not in removed and i % 2
+            ),
+        )[1]
+        assert index.nearest(lat, lon, lambda i: i % 2 == 1) == expected
+    assert len(index) == 200
+
+
+def test_nearest_returns_none_when_nothing_accepted() -> None:
+    index = GridIndex(np.array([[0.0, 0.0], [0.1, 0.1]]))
+    assert index.nearest(0.0, 0.0, lambda i: False) is None
+    index.remove(0)
+    index.remove(1)
+    assert index.nearest(0.0, 0.0, lambda i: True) is None
+
+
+def test_solve_plan_visits_nearest_feasible_first() -> None:
+    config.PLANNING_HORIZON_START = "08:00"
+    tasks = [
+        TaskDTO(
+            id="far",
+            kind="pickup",
+            location=Coord(lat=0.0, lon=0.3),
+            window=None,
+            size=1,
+        ),
+        TaskDTO(
+            id="closed",
+            kind="pickup",
+            location=Coord(lat=0.0, lon=0.01),
+            window=TimeWindow(start="07:00", end="07:30"),
+            size=1,
+        ),
+        TaskDTO(
+            id="near",
+            kind="pickup",
+            location=Coord(lat=0.0, lon=0.1),
+            window=None,
+            size=1,
+        ),
+    ]
+    vehicles = [VehicleDTO(id="v1", plate="p", capacity=5, office="o", division=None)]
+    plan = solve_plan(compile_problem([Coord(lat=0.0, lon=0.0)], tasks, vehicles))
+    assert plan.vehicle_plans[0].tasks_order == ["near", "far"]
+    assert plan.unscheduled == ["closed"]
@@ -0,0 +1,84 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+import pytest
+
+from api.dtos import VehicleDTO
+from planner.dtos import Coord, TaskDTO
+from planner.metrics import TravelMatrices
+from planner.problem import compile_problem
+from planner.solver import solve_plan
+from planner.speed_profile import SpeedProfile, parse_speed_profile, speed_profile
+import config
+
+
+def test_parse_speed_profile() -> None:
+    speeds = parse_speed_profile("7-9=25, 16-19=28", 40)
+    assert speeds[6:10] == [40, 25, 25, 40]
+    assert speeds[16:20] == [28, 28, 28, 40]
+    assert parse_speed_profile("", 40) == [40] * 24
+    for spec in ("7-9", "9-7=20", "7-9=0", "a-b=1"):
+        with pytest.raises(ValueError):
+            parse_speed_profile(spec, 40)
+
+
+def test_timed_matrices_pick_bucket_by_departure() -> None:
+    profile = SpeedProfile(parse_speed_profile("8-10=20,12-13=20", 40), 480, 750, 40)
+    assert profile.speeds == [20, 20, 40, 40, 20]
+    base = TravelMatrices(
+        km=np.zeros((2, 2)), minutes=np.array([[0, 10], [15, 0]], dtype=np.int64)
+    )
+    timed = profile.matrices(base)
+    # one matrix per distinct speed
+    assert len(timed.minutes) == 2
+    assert timed.at(479).tolist() == [[0, 20], [30, 0]]
+    assert timed.at(600).tolist() == [[0, 10], [15, 0]]
+    assert timed.at(725).tolist() == [[0, 20], [30, 0]]
+    assert timed.slowest().tolist() == [[0, 20], [30, 0]]
+    assert timed.average().tolist() == [[0, 16], [24, 0]]
+    flat = SpeedProfile([40] * 24, 480, 1080, 40).matrices(base)
+    assert len(flat.minutes) == 1 and flat.at(700) is not None
+    assert np.array_equal(flat.at(700), base.minutes)
+
+
+def test_heuristic_drives_slower_in_rush_hour(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(config, "PLANNING_HORIZON_START", "08:00")
+    monkeypatch.setattr(config, "PLANNING_HORIZON_END", "18:00")
+    monkeypatch.setattr(config, "AVERAGE_SPEED_KMPH", 40)
+    depot = Coord(lat=0.0, lon=0.0)
+    # about 20 minutes at 40 km/h
+    task = TaskDTO(
+        id="t", kind="pickup", location=Coord(lat=0.0, lon=0.12), window=None, size=1
+    )
+    vehicles = [VehicleDTO(id="v", plate="p", capacity=5, office="o", division=None)]
+    for seconds in (0, 1):
+        monkeypatch.setattr(config, "LOCAL_SEARCH_SECONDS", seconds)
+        monkeypatch.setattr(config, "SPEED_PROFILE", "")
+        plain = solve_plan(compile_problem([depot], [task], vehicles))
+        monkeypatch.setattr(config, "SPEED_PROFILE", "8-9=20")
+        rush = solve_plan(compile_problem([depot], [task], vehicles))
+        assert plain.vehicle_plans[0].eta == ["08:20"]
+        assert rush.vehicle_plans[0].eta == ["08:40"]
+    assert speed_profile().speed_at(8 * 60) == 20
+
+
+def test_ortools_leaves_depots_at_horizon_start_speed(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    pytest.importorskip("ortools")
+    from planner.solver_ortools import solve_plan_ortools
+
+    monkeypatch.setattr(config, "PLANNING_HORIZON_START", "08:00")
+    monkeypatch.setattr(config, "PLANNING_HORIZON_END", "18:00")
+    monkeypatch.setattr(config, "AVERAGE_SPEED_KMPH", 40)
+    monkeypatch.setattr(config, "SPEED_PROFILE", "8-9=20")
+    task = TaskDTO(
+        id="t", kind="pickup", location=Coord(lat=0.0, lon=0.12), window=None, size=1
+    )
+    vehicles = [VehicleDTO(id="v", plate="p", capacity=5, office="o", division=None)]
+    problem = compile_problem([Coord(lat=0.0, lon=0.0)], [task], vehicles)
+    plan = solve_plan_ortools(problem, time_limit_seconds=1)
+    assert plan.vehicle_plans[0].eta == ["08:40"]
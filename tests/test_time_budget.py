@@ -0,0 +1,41 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pytest
+
+from planner.dtos import Coord
+from planner.problem import compile_problem
+from planner.solver_ortools import solve_plan_ortools, time_budget_seconds
+import config
+from grid_day import grid_tasks, two_vehicles
+
+
+def test_budget_scales_with_task_count(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(config, "SOLVER_TIMEOUT_SECONDS", 30)
+    monkeypatch.setattr(config, "SOLVER_MIN_SECONDS", 1)
+    monkeypatch.setattr(config, "SOLVER_SECONDS_PER_TASK", 0.05)
+    assert time_budget_seconds(4) == 1
+    assert time_budget_seconds(200) == 10
+    assert time_budget_seconds(4000) == 30
+
+
+def test_plateau_stops_search_early(monkeypatch: pytest.MonkeyPatch) -> None:
+    config.PLANNING_HORIZON_START = "08:00"
+    monkeypatch.setattr(config, "SOLVER_PLATEAU_SECONDS", 0.2)
+    monkeypatch.setattr(config, "SOLVER_PLATEAU_IMPROVEMENT_PCT", 1.0)
+    problem = compile_problem([Coord(lat=0.0, lon=0.0)], grid_tasks(10), two_vehicles())
+    plan = solve_plan_ortools(problem, None, 5)
+    assert plan.stats["solver_stop_reason"] == "plateau"
+    assert int(plan.stats["elapsed_ms"]) < 5000
+    assert plan.unscheduled == []
+
+
+def test_time_limit_reported(monkeypatch: pytest.MonkeyPatch) -> None:
+    config.PLANNING_HORIZON_START = "08:00"
+    monkeypatch.setattr(config, "SOLVER_PLATEAU_SECONDS", 0)
+    problem = compile_problem([Coord(lat=0.0, lon=0.0)], grid_tasks(10), two_vehicles())
+    plan = solve_plan_ortools(problem, None, 0.5)
+    assert plan.stats["solver_stop_reason"] == "time_limit"
+    assert plan.stats["time_budget_ms"] == 500
@@ -0,0 +1,99 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+import pytest
+
+from planner.metrics import distance_matrix_km, minutes_matrix
+import planner.travel as travel
+from planner.travel import (
+    HaversineProvider,
+    RoadGraphProvider,
+    provider_matrices,
+    travel_cost_provider,
+)
+import config
+
+# 0 <-> 1 -> 2 -> 0 along the equator, node 3 unconnected
+_NODES = [(0.0, 0.0), (0.0, 0.01), (0.0, 0.02), (1.0, 1.0)]
+
+
+def _graph(path: Path) -> Path:
+    np.savez(
+        path,
+        coords=np.array(_NODES),
+        tails=np.array([0, 0, 1, 1, 2]),
+        heads=np.array([1, 1, 0, 2, 0]),
+        meters=np.array([1000.0, 900.0, 1000.0, 1000.0, 5000.0]),
+        seconds=np.array([60.0, 600.0, 60.0, 60.0, 600.0]),
+    )
+    return path
+
+
+def test_haversine_provider_matches_metrics() -> None:
+    points = np.array([[40.0, -3.7], [40.1, -3.6], [40.2, -3.5]])
+    result = HaversineProvider(30).matrix(points[:2], points)
+    assert np.allclose(result.km, distance_matrix_km(points[:2], points))
+    assert np.array_equal(result.minutes, minutes_matrix(result.km, 30))
+
+
+@pytest.mark.parametrize("scipy", [False, True])
+def test_road_graph_follows_fastest_directed_paths(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, scipy: bool
+) -> None:
+    if scipy:
+        pytest.importorskip("scipy")
+    monkeypatch.setattr(travel, "_HAS_SCIPY", scipy)
+    provider = RoadGraphProvider(_graph(tmp_path / "graph.npz"), 40)
+    points = np.array(_NODES[:3])
+    result = provider.matrix(points, points)
+    # the slower parallel 0 -> 1 edge is ignored
+    assert np.allclose(result.km, [[0, 1, 2], [1, 0, 1], [5, 6, 0]])
+    assert result.minutes.tolist() == [[0, 1, 2], [1, 0, 1], [10, 11, 0]]
+
+
+@pytest.mark.parametrize("scipy", [False, True])
+def test_road_graph_round_trip_matches_both_directions(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, scipy: bool
+) -> None:
+    if scipy:
+        pytest.importorskip("scipy")
+    monkeypatch.setattr(travel, "_HAS_SCIPY", scipy)
+    provider = RoadGraphProvider(_graph(tmp_path / "graph.npz"), 40)
+    # a first time limit far too short to reach any destination
+    provider._mps = 1e6
+    origins = np.array([_NODES[2], [0.001, 0.0]])
+    destinations = np.array(_NODES)
+    forward, back = provider_matrices(provider, origins, destinations)
+    expected = provider.matrix(origins, destinations)
+    assert np.allclose(forward.km, expected.km)
+    assert np.array_equal(forward.minutes, expected.minutes)
+    reverse = provider.matrix(destinations, origins)
+    assert np.allclose(back.km, reverse.km.T)
+    assert np.array_equal(back.minutes, reverse.minutes.T)
+    assert back.minutes[0].tolist() == [2, 1, 0, int(back.km[0, 3] / 40 * 60 + 0.5)]
+
+
+def test_road_graph_snaps_and_falls_back_to_straight_lines(tmp_path: Path) -> None:
+    provider = RoadGraphProvider(_graph(tmp_path / "graph.npz"), 40)
+    off_road = np.array([[0.001, 0.0]])
+    result = provider.matrix(off_road, np.array(_NODES[1:]))
+    access = distance_matrix_km(off_road, np.array(_NODES[:1]))[0, 0]
+    assert np.allclose(result.km[0, :2], [1 + access, 2 + access])
+    # node 3 cannot be reached over the graph
+    straight = distance_matrix_km(off_road, np.array(_NODES[3:]))[0, 0]
+    assert result.km[0, 2] == pytest.approx(straight)
+    assert result.minutes[0, 2] == int(straight / 40 * 60 + 0.5)
+
+
+def test_configured_provider(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    assert travel_cost_provider().key == f"haversine:{config.AVERAGE_SPEED_KMPH}"
+    monkeypatch.setattr(config, "TRAVEL_COST_PROVIDER", "road_graph")
+    monkeypatch.setattr(config, "ROAD_GRAPH_PATH", str(_graph(tmp_path / "g.npz")))
+    provider = travel_cost_provider()
+    assert isinstance(provider, RoadGraphProvider) and not provider.symmetric
+    assert travel_cost_provider() is provider
+    monkeypatch.setattr(config, "TRAVEL_COST_PROVIDER", "haversine")
+    assert isinstance(travel_cost_provider(), HaversineProvider)
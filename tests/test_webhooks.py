@@ -21,11 +21,11 @@ def test_webhook_valid(monkeypatch: pytest.MonkeyPatch) -> None:
     config.WEBHOOK_SECRET = "s"
     called = False
 
-    async def fake_replan() -> None:
+    def fake_replan() -> None:
         nonlocal called
         called = True
 
-    monkeypatch.setattr(api_module, "replan_incremental", fake_replan)
+    monkeypatch.setattr(api_module, "request_replan", fake_replan)
     client = TestClient(api_module.app)
     body: dict[str, object] = {"id": "1", "location": {}, "window": None, "size": 1}
     sig = _signature(body)
@@ -40,11 +40,11 @@ def test_webhook_invalid(monkeypatch: pytest.MonkeyPatch) -> None:
     config.WEBHOOK_SECRET = "s"
     called = False
 
-    async def fake_replan() -> None:
+    def fake_replan() -> None:
         nonlocal called
         called = True
 
-    monkeypatch.setattr(api_module, "replan_incremental", fake_replan)
+    monkeypatch.setattr(api_module, "request_replan", fake_replan)
     client = TestClient(api_module.app)
     body: dict[str, str] = {"id": "1"}
     resp = client.post(
@@ -52,3 +52,34 @@ def test_webhook_invalid(monkeypatch: pytest.MonkeyPatch) -> None:
     )
     assert resp.status_code == 401
     assert not called
+
+
+def test_pickup_created_inserts_into_latest_plan(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    config.WEBHOOK_SECRET = "s"
+    inserted: list[str] = []
+
+    async def fake_insert(task: object) -> bool:
+        inserted.append(getattr(task, "id"))
+        return True
+
+    def fake_replan() -> None:
+        raise AssertionError("full replan not expected")
+
+    monkeypatch.setattr(api_module, "get_latest_plan", lambda: object())
+    monkeypatch.setattr(api_module, "insert_new_task", fake_insert)
+    monkeypatch.setattr(api_module, "request_replan", fake_replan)
+    client = TestClient(api_module.app)
+    body: dict[str, object] = {
+        "id": "n1",
+        "location": {"lat": 0.0, "lon": 0.0},
+        "window": None,
+        "size": 1,
+    }
+    resp = client.post(
+        "/webhooks/pickup_created", json=body, headers={"X-Signature": _signature(body)}
+    )
+    assert resp.status_code == 200
+    assert resp.json()["inserted"] is True
+    assert inserted == ["n1"]
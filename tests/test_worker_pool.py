@@ -0,0 +1,63 @@
+import asyncio
+from concurrent.futures.process import BrokenProcessPool
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pytest
+
+from planner.worker_pool import SolverPool, SolverQueueFullError
+
+
+@pytest.mark.asyncio
+async def test_pool_runs_job() -> None:
+    pool = SolverPool(workers=1, queue_size=2)
+    try:
+        assert await pool.run(pow, 2, 10) == 1024
+        assert pool.pending() == 0
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_pool_queue_is_bounded() -> None:
+    pool = SolverPool(workers=1, queue_size=1)
+    try:
+        running = asyncio.create_task(pool.run(time.sleep, 0.5, job_id="slow"))
+        await asyncio.sleep(0)
+        with pytest.raises(SolverQueueFullError):
+            await pool.run(pow, 2, 2)
+        await running
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_pool_cancel_job() -> None:
+    pool = SolverPool(workers=1, queue_size=2)
+    try:
+        first = asyncio.create_task(pool.run(time.sleep, 0.5, job_id="a"))
+        queued = asyncio.create_task(pool.run(pow, 3, 2, job_id="b"))
+        await asyncio.sleep(0)
+        assert pool.cancel("b")
+        assert not pool.cancel("unknown")
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        await first
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_pool_recovers_from_crashed_worker() -> None:
+    pool = SolverPool(workers=1, queue_size=2)
+    try:
+        with pytest.raises(BrokenProcessPool):
+            await pool.run(os._exit, 1)
+        assert await pool.run(pow, 2, 3) == 8
+        assert pool.pending() == 0
+    finally:
+        pool.shutdown()